@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import json
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -60,6 +62,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RequestProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -72,13 +75,19 @@ TEMPLATES = [
         'DIRS': [
             BASE_DIR / 'templates'
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Plantillas compiladas una vez por proceso; en desarrollo el autoreload vacía la caché al editarlas
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -120,6 +129,18 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Las cuentas de cliente usan CLIENT_PASSWORD_HASHER (scrypt ajustado, ver core/hashers.py);
+# el resto de usuarios, el primero de la lista.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'core.hashers.ClientScryptPasswordHasher',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -154,3 +175,161 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Authentication settings
 LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = '/accounts/login/'
+
+# Cliente HTTP hacia la API de los servidores (pool de conexiones keep-alive)
+CLIENT_API_TIMEOUT = int(os.getenv('CLIENT_API_TIMEOUT', '30'))
+CLIENT_API_POOL_CONNECTIONS = int(os.getenv('CLIENT_API_POOL_CONNECTIONS', '1'))
+CLIENT_API_POOL_MAXSIZE = int(os.getenv('CLIENT_API_POOL_MAXSIZE', '10'))
+
+# Conexiones SSH hacia los servidores (transportes persistentes por host/puerto/usuario)
+CLIENT_SSH_TIMEOUT = int(os.getenv('CLIENT_SSH_TIMEOUT', '10'))
+CLIENT_SSH_KEEPALIVE = int(os.getenv('CLIENT_SSH_KEEPALIVE', '30'))
+CLIENT_SSH_COMMAND_TIMEOUT = int(os.getenv('CLIENT_SSH_COMMAND_TIMEOUT', '120'))
+CLIENT_SSH_IDLE_TIMEOUT = int(os.getenv('CLIENT_SSH_IDLE_TIMEOUT', '300'))
+
+# Acciones masivas sobre clientes (concurrencia total y por servidor)
+CLIENT_BULK_MAX_WORKERS = int(os.getenv('CLIENT_BULK_MAX_WORKERS', '32'))
+CLIENT_BULK_PER_SERVER = int(os.getenv('CLIENT_BULK_PER_SERVER', '8'))
+# Agrupar las acciones masivas en una sola petición por servidor (POST /clients/batch)
+CLIENT_API_BATCH_ENABLED = os.getenv('CLIENT_API_BATCH_ENABLED', 'False') == 'True'
+
+# Backends remotos por transporte (Server.transport): clase síncrona y asíncrona (core.services.backends)
+CLIENT_BACKENDS = {
+    'rest': {
+        'sync': 'core.services.client_api_service.ClientAPIService',
+        'async': 'core.services.async_client_api_service.AsyncClientAPIService',
+    },
+    'batched': {
+        'sync': 'core.services.client_api_service.BatchedClientAPIService',
+        'async': 'core.services.async_client_api_service.AsyncClientAPIService',
+    },
+    'ssh': {
+        'sync': 'core.services.client_ssh_service.ClientSSHService',
+        'async': 'core.services.async_client_ssh_service.AsyncClientSSHService',
+    },
+    'rest_legacy': {
+        'sync': 'core.services.client_api_service.LegacyClientAPIService',
+        'async': 'core.services.async_client_api_service.AsyncLegacyClientAPIService',
+    },
+}
+# Transporte 'batched': espera (segundos) para juntar operaciones y tamaño máximo del lote
+CLIENT_BATCH_WINDOW = float(os.getenv('CLIENT_BATCH_WINDOW', '0.05'))
+CLIENT_BATCH_MAX_SIZE = int(os.getenv('CLIENT_BATCH_MAX_SIZE', '50'))
+
+# Reconciliación (manage.py reconcile): operaciones remotas por lote al corregir un servidor
+RECONCILE_BATCH_SIZE = int(os.getenv('RECONCILE_BATCH_SIZE', '50'))
+
+# Asignación de puertos: vigencia (segundos) del bitmap en memoria y reintentos por conflicto
+PORT_ALLOCATOR_TTL = int(os.getenv('PORT_ALLOCATOR_TTL', '60'))
+PORT_ALLOCATOR_RETRIES = int(os.getenv('PORT_ALLOCATOR_RETRIES', '3'))
+
+# Caché compartida por web, worker y colector (estado de clientes y sellos de versión).
+# Por defecto en la base de datos (tabla creada con `createcachetable`); Redis también sirve.
+# Una caché por proceso (LocMemCache) no es válida: `check` falla (core.E001).
+#
+# Los fragmentos de plantilla ({% cache ... using='fragments' %}: filas de las listas y tarjetas
+# de puertos) van aparte, en memoria del proceso: su clave incluye todos los datos que muestran,
+# así que no hace falta compartirlos, y con la caché en BD cada fila costaría una consulta.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'cache_table'),
+    },
+    'fragments': {
+        'BACKEND': os.getenv('FRAGMENT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('FRAGMENT_CACHE_LOCATION', 'fragments'),
+    },
+}
+for alias in CACHES.values():
+    if alias['BACKEND'].endswith(('LocMemCache', 'DatabaseCache', 'FileBasedCache')):
+        # Entradas por cliente y por fila: el límite por defecto (300) se llenaría con una página
+        alias['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '20000'))}
+
+# Vigencia (segundos) de las estadísticas de uso del listado de servidores; 0 desactiva la caché
+SERVER_STATS_CACHE_TTL = int(os.getenv('SERVER_STATS_CACHE_TTL', '30'))
+
+# Ubicación automática de clientes (core.services.placement): estrategia por defecto
+# (least_loaded, bin_packing o affinity) y si se descartan los servidores que no respondieron al colector
+PLACEMENT_STRATEGY = os.getenv('PLACEMENT_STRATEGY', 'least_loaded')
+PLACEMENT_USE_STATUS = os.getenv('PLACEMENT_USE_STATUS', 'True') == 'True'
+
+# Clientes por página en el listado de clientes
+CLIENT_LIST_PAGE_SIZE = int(os.getenv('CLIENT_LIST_PAGE_SIZE', '50'))
+
+# Estado en ejecución de clientes/puertos (comando collect_status)
+CLIENT_STATUS_INTERVAL = int(os.getenv('CLIENT_STATUS_INTERVAL', '15'))
+CLIENT_STATUS_TTL = int(os.getenv('CLIENT_STATUS_TTL', '60'))
+
+# Canal SSE de estado (/status/stream/): frecuencia de lectura de la caché y duración máxima del stream
+STATUS_STREAM_INTERVAL = float(os.getenv('STATUS_STREAM_INTERVAL', '2'))
+STATUS_STREAM_HEARTBEAT = int(os.getenv('STATUS_STREAM_HEARTBEAT', '20'))
+STATUS_STREAM_MAX_AGE = int(os.getenv('STATUS_STREAM_MAX_AGE', '300'))
+STATUS_STREAM_RETRY_MS = int(os.getenv('STATUS_STREAM_RETRY_MS', '3000'))
+
+# Resiliencia de llamadas remotas (circuit breaker por servidor, timeouts adaptativos y reintentos)
+CIRCUIT_WINDOW = int(os.getenv('CIRCUIT_WINDOW', '20'))
+CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', '5'))
+CIRCUIT_FAILURE_RATE = float(os.getenv('CIRCUIT_FAILURE_RATE', '0.5'))
+CIRCUIT_OPEN_SECONDS = int(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
+ADAPTIVE_TIMEOUT_MIN = float(os.getenv('ADAPTIVE_TIMEOUT_MIN', '5'))
+ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv('ADAPTIVE_TIMEOUT_MULTIPLIER', '4'))
+REMOTE_RETRIES = int(os.getenv('REMOTE_RETRIES', '2'))
+REMOTE_RETRY_BACKOFF = float(os.getenv('REMOTE_RETRY_BACKOFF', '0.5'))
+
+# Cola de tareas remotas en BD (manage.py run_jobs)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+JOB_CLAIM_BATCH = int(os.getenv('JOB_CLAIM_BATCH', '10'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_BACKOFF = float(os.getenv('JOB_RETRY_BACKOFF', '5'))
+JOB_RETRY_BACKOFF_MAX = float(os.getenv('JOB_RETRY_BACKOFF_MAX', '300'))
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', '600'))
+JOB_REQUEUE_INTERVAL = float(os.getenv('JOB_REQUEUE_INTERVAL', '60'))
+
+# Hash de contraseñas de clientes (algoritmo de PASSWORD_HASHERS, p. ej. client_scrypt o argon2)
+CLIENT_PASSWORD_HASHER = os.getenv('CLIENT_PASSWORD_HASHER', 'client_scrypt')
+CLIENT_SCRYPT_WORK_FACTOR = int(os.getenv('CLIENT_SCRYPT_WORK_FACTOR', str(2 ** 14)))
+CLIENT_SCRYPT_BLOCK_SIZE = int(os.getenv('CLIENT_SCRYPT_BLOCK_SIZE', '8'))
+CLIENT_SCRYPT_PARALLELISM = int(os.getenv('CLIENT_SCRYPT_PARALLELISM', '1'))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))
+PASSWORD_HASH_POOL_THRESHOLD = int(os.getenv('PASSWORD_HASH_POOL_THRESHOLD', '32'))
+
+# Dashboard: tarjetas de puertos por cliente y selector de clientes para administradores
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '300'))
+CLIENT_PICKER_PAGE_SIZE = int(os.getenv('CLIENT_PICKER_PAGE_SIZE', '20'))
+
+# Métricas y logs: /metrics para Prometheus (token Bearer o sesión de administrador)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Puerto del listener de métricas de run_jobs y collect_status (0 = desactivado)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+# Dirección del listener; fuera de localhost exige METRICS_TOKEN
+METRICS_ADDRESS = os.getenv('METRICS_ADDRESS', '127.0.0.1')
+# text | json (un objeto por línea, con los campos de cada llamada remota)
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'text': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+        'json': {'()': 'core.logs.JSONFormatter'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': LOG_FORMAT},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': os.getenv('LOG_LEVEL', 'INFO'), 'propagate': False},
+    },
+}
+
+# Perfilado por petición (core.middleware): fracción de peticiones medidas (0 desactiva el muestreo;
+# ?_profile=1 sigue disponible para administradores) y presupuestos por vista ('*' para el resto).
+# PROFILING_BUDGETS admite JSON, p. ej. {"ClientListView": {"wall_ms": 300, "db_queries": 8}}
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_BUDGETS = json.loads(os.getenv('PROFILING_BUDGETS') or 'null') or {
+    '*': {'wall_ms': 1000, 'db_queries': 30, 'remote_calls': 5},
+    'HomeView': {'wall_ms': 200, 'db_queries': 6, 'remote_calls': 0},
+    'ClientListView': {'wall_ms': 300, 'db_queries': 8, 'remote_calls': 0},
+    'ServerListView': {'wall_ms': 200, 'db_queries': 6, 'remote_calls': 0},
+}
+PROFILING_DUMP_DIR = os.getenv('PROFILING_DUMP_DIR', os.path.join(tempfile.gettempdir(), 'unidades-moviles-profiles'))
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
-from .models import User
+from django.utils import timezone
+
+from .models import Job, User
 
 
 # @admin.register(Client)
@@ -16,5 +18,21 @@ class UserAdmin(admin.ModelAdmin):
     ordering = ('username',)
 
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'action', 'client_name', 'server', 'status', 'attempts', 'run_at', 'updated_at')
+    search_fields = ('client_name', 'idempotency_key')
+    list_filter = ('status', 'action', 'server')
+    readonly_fields = ('idempotency_key', 'locked_by', 'locked_at', 'created_at', 'updated_at')
+    actions = ['retry_jobs']
+
+    @admin.action(description="Reintentar tareas seleccionadas")
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=Job.STATUS_RUNNING).update(
+            status=Job.STATUS_PENDING, attempts=0, run_at=timezone.now(), last_error=''
+        )
+        self.message_user(request, f"{updated} tareas reencoladas.")
+
+
 # Desregistrar el modelo Group si no se utiliza
 admin.site.unregister(Group)
@@ -0,0 +1,144 @@
+"""
+Utilidades de caché compartidas por las vistas.
+
+Las claves se construyen con sellos de versión por ámbito ('servers', 'clients', 'ports', 'status',
+y por objeto: 'client:<pk>', 'server:<pk>', 'status:<pk>').
+Invalidar un ámbito es incrementar su versión: las entradas antiguas dejan de leerse
+y caducan solas por TTL, sin tener que borrar claves una a una.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import PortServer, Server
+
+SCOPES = ('servers', 'clients', 'ports')
+
+
+def get_versions(*scopes: str) -> list:
+    """Versiones actuales de los ámbitos, en una sola lectura de caché"""
+    return get_stamps(*scopes)[0]
+
+
+def get_stamps(*scopes: str) -> tuple:
+    """
+    Versiones de los ámbitos y el instante (epoch) del último cambio entre todos ellos,
+    en una sola lectura de caché. Los ámbitos sin sello se inicializan ahora.
+    """
+    keys = [f'version:{scope}' for scope in scopes] + [f'modified:{scope}' for scope in scopes]
+    found = cache.get_many(keys)
+    missing = [scope for scope in scopes if f'version:{scope}' not in found or f'modified:{scope}' not in found]
+    if missing:
+        now = int(time.time())
+        initial = {}
+        for scope in missing:
+            initial.setdefault(f'version:{scope}', found.get(f'version:{scope}', 1))
+            initial[f'modified:{scope}'] = now
+        cache.set_many(initial, timeout=None)
+        found.update(initial)
+    versions = [found[f'version:{scope}'] for scope in scopes]
+    last_modified = max((found[f'modified:{scope}'] for scope in scopes), default=None)
+    return versions, last_modified
+
+
+def bump_version(*scopes: str) -> None:
+    """
+    Invalida todas las entradas que dependen de los ámbitos indicados.
+    Dentro de una transacción se aplica al confirmarla, para no cachear datos sin commit.
+    """
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes) -> None:
+    now = int(time.time())
+    for scope in scopes:
+        key = f'version:{scope}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, timeout=None)
+    cache.set_many({f'modified:{scope}': now for scope in scopes}, timeout=None)
+
+
+def client_scope(pk) -> str:
+    return f'client:{pk}'
+
+
+def server_scope(pk) -> str:
+    return f'server:{pk}'
+
+
+def status_scope(pk) -> str:
+    return f'status:{pk}'
+
+
+def versioned_key(prefix: str, *scopes: str) -> str:
+    versions = '.'.join(str(version) for version in get_versions(*scopes))
+    return f'{prefix}:{versions}'
+
+
+def get_server_stats() -> dict:
+    """
+    Estadísticas de uso por servidor: {pk: {'clients_count': n, 'used_ports_count': m, 'total_ports': t}}.
+    Se calculan con una sola consulta agregada y se guardan SERVER_STATS_CACHE_TTL segundos.
+    """
+    def compute():
+        rows = Server.objects.with_usage().values(
+            'pk', 'clients_count', 'used_ports_count', 'initial_port', 'final_port'
+        )
+        return {
+            row['pk']: {
+                'clients_count': row['clients_count'],
+                'used_ports_count': row['used_ports_count'],
+                'total_ports': max(row['final_port'] - row['initial_port'] + 1, 0),
+            }
+            for row in rows
+        }
+
+    ttl = settings.SERVER_STATS_CACHE_TTL
+    if not ttl:
+        return compute()
+
+    key = versioned_key('server_stats', 'servers', 'clients', 'ports')
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute()
+        cache.set(key, stats, ttl)
+    return stats
+
+
+def get_client_ports(client) -> list:
+    """
+    View-model de las tarjetas de puertos del dashboard de un cliente (sin el estado en ejecución,
+    que cambia cada pocos segundos). Se invalida al cambiar sus puertos (ámbito client:<pk>)
+    o el host/rango de su servidor (server:<pk>); mientras tanto se sirve sin consultas a la BD.
+    """
+    def compute():
+        rows = (
+            PortServer.objects.filter(assigned_client_id=client.pk)
+            .order_by('port_number')
+            .values_list('port_number', 'server__host', 'server__initial_port', 'server__final_port')
+        )
+        return [
+            {
+                'port_number': port_number,
+                'host': host,
+                'client_name': client.username,
+                'server_name': f"{host} ({initial_port}-{final_port})",
+                'mobile_index': index,  # movil1, movil2, movil3, etc.
+            }
+            for index, (port_number, host, initial_port, final_port) in enumerate(rows, start=1)
+        ]
+
+    ttl = settings.DASHBOARD_CACHE_TTL
+    if not ttl:
+        return compute()
+
+    key = versioned_key(f'dashboard_ports:{client.pk}', client_scope(client.pk), server_scope(client.server_id))
+    ports = cache.get(key)
+    if ports is None:
+        ports = compute()
+        cache.set(key, ports, ttl)
+    return ports
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends cuyo contenido no ven los demás procesos
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """
+    El colector (collect_status) y los workers (run_jobs) escriben estado y sellos de versión
+    que la web debe leer: con una caché por proceso los clientes aparecerían siempre como
+    'unknown' y los listados no se invalidarían.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend in PER_PROCESS_CACHES:
+        return [Error(
+            f"La caché por defecto ({backend}) no se comparte entre procesos.",
+            hint="Usar django.core.cache.backends.db.DatabaseCache (con createcachetable) o RedisCache.",
+            id='core.E001',
+        )]
+    return []
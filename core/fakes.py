@@ -0,0 +1,179 @@
+"""
+Dobles locales de los servidores remotos, para medir y probar sin red.
+
+FakeFleet guarda en memoria los clientes de cada host y responde como lo harían
+la API REST (/api/clients...) y el comando manage_client por SSH:
+
+- mount(server): monta un adaptador de requests en la sesión compartida del servidor,
+  así las llamadas pasan por ClientAPIService, el circuit breaker y los reintentos reales.
+- ssh_exec(host): reemplazo de ClientSSHService._exec que interpreta el comando (o el lote).
+"""
+import json
+import re
+import shlex
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+from core.services import client_api_service
+
+MANAGE_CLIENT = '/usr/local/bin/manage_client'
+
+# (método, patrón de la ruta bajo /api) -> acción de manage_client
+ROUTES = [
+    ('POST', re.compile(r'^/clients/create$'), 'create'),
+    ('POST', re.compile(r'^/clients/batch$'), 'batch'),
+    ('GET', re.compile(r'^/clients$'), 'list'),
+    ('DELETE', re.compile(r'^/clients/(?P<client>[^/]+)$'), 'delete'),
+    ('POST', re.compile(r'^/clients/(?P<client>[^/]+)/ports/(?P<port>\d+)/restart$'), 'restart-port'),
+    ('POST', re.compile(r'^/clients/(?P<client>[^/]+)/(?P<action>start|stop|restart|extend)$'), None),
+]
+
+
+class FakeFleet:
+    """Estado remoto simulado: {host: {cliente: {'ports': [...], 'running': bool}}}"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.clients: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def apply(self, host: str, action: str, client: str = None, ports: List[int] = (), port: int = None
+              ) -> Tuple[bool, Any]:
+        """Ejecuta una operación y retorna (ok, mensaje o listado)"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            clients = self.clients.setdefault(host, {})
+
+            if action == 'list':
+                return True, {'clients': [
+                    {'client': name, 'running': state['running'],
+                     'ports': [{'port': p, 'running': state['running']} for p in state['ports']]}
+                    for name, state in sorted(clients.items())
+                ]}
+            if action == 'create':
+                if client in clients:
+                    return False, f"El cliente {client} ya existe"
+                clients[client] = {'ports': sorted(int(p) for p in ports), 'running': True}
+                return True, f"Cliente {client} creado"
+            if client not in clients:
+                return False, f"El cliente {client} no existe"
+            if action == 'delete':
+                del clients[client]
+            elif action in ('start', 'restart'):
+                clients[client]['running'] = True
+            elif action == 'stop':
+                clients[client]['running'] = False
+            elif action == 'extend':
+                clients[client]['ports'] = sorted(set(clients[client]['ports']) | {int(p) for p in ports})
+            elif action == 'restart-port':
+                if int(port) not in clients[client]['ports']:
+                    return False, f"El puerto {port} no pertenece a {client}"
+            else:
+                return False, f"Acción desconocida: {action}"
+            return True, f"{action} {client}: OK"
+
+    # ============================
+    # API REST
+    # ============================
+
+    def mount(self, server) -> None:
+        """Dirige las peticiones de la sesión compartida de `server` a este doble"""
+        client_api_service.get_session(server).mount(f"https://{server.host}/api", FakeAPIAdapter(self, server.host))
+
+    def handle_http(self, host: str, method: str, path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        for route_method, pattern, action in ROUTES:
+            match = pattern.match(path)
+            if route_method != method or not match:
+                continue
+            params = match.groupdict()
+            action = action or params['action']
+
+            if action == 'batch':
+                results = []
+                for operation in body.get('operations', []):
+                    ok, message = self.apply(
+                        host, operation['action'], operation['client'], operation.get('ports', []), operation.get('port')
+                    )
+                    results.append({'success': ok, 'message': message} if ok else {'success': False, 'detail': message})
+                return 200, {'results': results}
+
+            ok, result = self.apply(
+                host, action, params.get('client') or body.get('client'), body.get('ports', []), params.get('port')
+            )
+            if action == 'list':
+                return 200, result
+            return (200, {'success': True, 'message': result}) if ok else (400, {'detail': result})
+        return 404, {'detail': f"Ruta desconocida: {method} {path}"}
+
+    # ============================
+    # SSH (manage_client)
+    # ============================
+
+    def ssh_exec(self, host: str):
+        """Función con la firma de ClientSSHService._exec para el host indicado"""
+
+        def execute(full_command: str, timeout: float = None, action: str = 'exec') -> Tuple[int, str, str]:
+            # Los lotes encadenan "cmd 2>&1; printf '\n<MARCA> %d\n' $?" por operación
+            output, status, batch = [], 0, False
+            for segment in full_command.split('; '):
+                segment = segment.strip()
+                marker = re.search(r'(__\w+__)', segment) if segment.startswith('printf') else None
+                if marker:
+                    # El printf del lote termina bien aunque la operación haya fallado
+                    output.append(f"\n{marker.group(1)} {status}")
+                    batch = True
+                    continue
+                status, message = self._run_manage_client(host, shlex.split(segment.replace(' 2>&1', '')))
+                output.append(message)
+            text = '\n'.join(output).strip()
+            if batch:
+                return 0, text, ''
+            return (status, text, '') if status == 0 else (status, '', text)
+
+        return execute
+
+    def _run_manage_client(self, host: str, argv: List[str]) -> Tuple[int, str]:
+        if not argv or argv[0] != MANAGE_CLIENT or len(argv) < 2:
+            return 127, f"Comando desconocido: {' '.join(argv)}"
+        action, args = argv[1], argv[2:]
+        if action == 'list':
+            _, listing = self.apply(host, 'list')
+            return 0, json.dumps(listing)
+        client = args[0] if args else None
+        port = args[1] if action == 'restart-port' and len(args) > 1 else None
+        ok, message = self.apply(host, action, client, [int(p) for p in args[1:]] if port is None else [], port)
+        return (0, message) if ok else (1, message)
+
+
+class FakeAPIAdapter(BaseAdapter):
+    """Adaptador de transporte de requests que responde desde un FakeFleet, sin sockets"""
+
+    def __init__(self, fleet: FakeFleet, host: str):
+        super().__init__()
+        self.fleet = fleet
+        self.host = host
+
+    def send(self, request, **kwargs):
+        path = request.path_url.split('?', 1)[0]
+        path = path[len('/api'):] if path.startswith('/api') else path
+        body = json.loads(request.body) if request.body else {}
+        status, payload = self.fleet.handle_http(self.host, request.method, path, body)
+
+        response = Response()
+        response.status_code = status
+        response._content = json.dumps(payload).encode()
+        response.headers['Content-Type'] = 'application/json'
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
@@ -1,13 +1,20 @@
+import io
+
 from django import forms
 from .models import Server, User
+from .services import bulk_import, placement, port_allocator
 
 
 class ServerForm(forms.ModelForm):
     class Meta:
         model = Server
-        fields = ['host', 'api_key', 'initial_port', 'final_port']
+        fields = [
+            'host', 'api_key', 'initial_port', 'final_port', 'transport', 'supports_batch',
+            'ssh_port', 'ssh_username', 'ssh_password',
+        ]
         widgets = {
             'api_key': forms.PasswordInput(render_value=True),
+            'ssh_password': forms.PasswordInput(render_value=True),
         }
 
 
@@ -15,6 +22,15 @@ class ClientCreateForm(forms.ModelForm):
     username = forms.CharField(label="Usuario", max_length=150, help_text="Nombre de usuario para el panel")
     password = forms.CharField(label="Contraseña", widget=forms.PasswordInput, help_text="Contraseña para el panel")
     num_ports = forms.IntegerField(min_value=1, initial=1, label="Cantidad de Puertos", help_text="Número de puertos a asignar automáticamente")
+    contiguous_ports = forms.BooleanField(required=False, label="Puertos Consecutivos", help_text="Asignar un bloque de puertos consecutivos")
+    placement = forms.ChoiceField(
+        label="Ubicación",
+        choices=(('', 'Manual: usar el servidor elegido'),) + placement.STRATEGY_CHOICES,
+        required=False,
+        help_text="En modo automático el servidor se elige según la carga y los puertos libres de cada uno.",
+    )
+
+    field_order = ['username', 'password', 'server', 'placement', 'num_ports', 'contiguous_ports']
 
     class Meta:
         model = User
@@ -23,6 +39,9 @@ class ClientCreateForm(forms.ModelForm):
             'server': 'Seleccione el servidor donde se alojará este cliente.',
         }
 
+    # Servidores alternativos de la ubicación automática, en orden, por si falla la asignación
+    fallback_servers = ()
+
     def clean_username(self):
         username = self.cleaned_data.get('username')
         if User.objects.filter(username=username).exists():
@@ -34,9 +53,18 @@ class ClientCreateForm(forms.ModelForm):
         server = cleaned_data.get('server')
         num_ports = cleaned_data.get('num_ports')
 
-        if server and num_ports:
+        strategy = cleaned_data.get('placement')
+        if strategy and num_ports:
+            # Decisión en memoria sobre las estadísticas cacheadas: no recorre los puertos
+            ranked = placement.rank(num_ports, strategy, prefer=server.pk if server else None)
+            servers = Server.objects.in_bulk(ranked)
+            ranked = [servers[pk] for pk in ranked if pk in servers]
+            if not ranked:
+                raise forms.ValidationError(f"Ningún servidor disponible tiene {num_ports} puertos libres.")
+            cleaned_data['server'], self.fallback_servers = ranked[0], ranked[1:]
+        elif server and num_ports:
             # Check if server has enough available ports
-            available_count = server.ports.filter(is_available=True).count()
+            available_count = port_allocator.free_count(server)
             if available_count < num_ports:
                 raise forms.ValidationError(f"El servidor seleccionado solo tiene {available_count} puertos disponibles (se solicitaron {num_ports}).")
 
@@ -49,3 +77,22 @@ class ClientUpdateForm(forms.ModelForm):
         fields = ['server']
 
 
+
+
+class ClientImportForm(forms.Form):
+    file = forms.FileField(label="Archivo", help_text="CSV o JSON con username, server (id, o host si es único), num_ports y opcionalmente password")
+    contiguous_ports = forms.BooleanField(required=False, label="Puertos Consecutivos", help_text="Asignar un bloque de puertos consecutivos a cada cliente")
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        try:
+            content = upload.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise forms.ValidationError("El archivo debe estar codificado en UTF-8.")
+        try:
+            self.rows = bulk_import.parse_rows(io.StringIO(content, newline=''), bulk_import.detect_format(upload.name))
+        except bulk_import.BulkImportError as e:
+            raise forms.ValidationError(str(e))
+        if not self.rows:
+            raise forms.ValidationError("El archivo no contiene clientes.")
+        return upload
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import ScryptPasswordHasher
+
+
+class ClientScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    scrypt con parámetros propios (CLIENT_SCRYPT_*) para las cuentas de cliente.
+    Los parámetros quedan guardados en cada hash: cambiarlos no invalida contraseñas
+    existentes, se rehashean en el siguiente login.
+    """
+    algorithm = 'client_scrypt'
+    work_factor = settings.CLIENT_SCRYPT_WORK_FACTOR
+    block_size = settings.CLIENT_SCRYPT_BLOCK_SIZE
+    parallelism = settings.CLIENT_SCRYPT_PARALLELISM
@@ -0,0 +1,24 @@
+"""
+Formato de logs estructurados (LOG_FORMAT=json): un objeto JSON por línea con los campos
+estándar del registro y los que se pasan en `extra` (p. ej. los de core.services.metrics).
+"""
+import json
+import logging
+
+# Atributos propios de LogRecord: todo lo demás llegó por `extra`
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in _RESERVED})
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import get_template
+from django.test import RequestFactory, override_settings
+
+from core.models import Server, User
+
+FRAGMENT_CACHES = {
+    'sin caché de fragmentos': 'django.core.cache.backends.dummy.DummyCache',
+    'con caché de fragmentos': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+class Command(BaseCommand):
+    help = "Mide el tiempo de render de las listas de clientes y servidores con N filas (sin BD ni servidores remotos)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help="Filas por lista (por defecto 500)")
+        parser.add_argument('--ports', type=int, default=3, help="Puertos por cliente (por defecto 3)")
+        parser.add_argument('--repeat', type=int, default=10, help="Renders medidos por caso (por defecto 10)")
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = User(pk=1, username='bench', is_staff=True)
+
+        cases = {
+            'core/client_list.html': self._client_list_context(options['rows'], options['ports']),
+            'core/server_list.html': self._server_list_context(options['rows']),
+        }
+
+        for label, backend in FRAGMENT_CACHES.items():
+            caches = {
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench'},
+                'template_fragments': {
+                    'BACKEND': backend, 'LOCATION': 'bench-fragments', 'OPTIONS': {'MAX_ENTRIES': 10 * options['rows']},
+                },
+            }
+            with override_settings(CACHES=caches):
+                for template_name, context in cases.items():
+                    template = get_template(template_name)
+                    # Primer render fuera de la medida: compila la plantilla y llena la caché
+                    template.render(context, request)
+                    timings = []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        template.render(context, request)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    self.stdout.write(
+                        f"{template_name} ({options['rows']} filas, {label}): "
+                        f"media {statistics.mean(timings):.1f} ms · mediana {statistics.median(timings):.1f} ms · "
+                        f"máx {max(timings):.1f} ms"
+                    )
+
+    def _client_list_context(self, rows, ports):
+        clients = []
+        for index in range(rows):
+            client = User(pk=index + 1, username=f'cliente{index:04d}', role='client')
+            client.status = {'state': 'running', 'ports': {}}
+            client.ports_parsed = [
+                {'number': 10000 + index * ports + offset, 'state': 'running'} for offset in range(ports)
+            ]
+            clients.append(client)
+        page = Paginator(clients, rows).page(1)
+        return {
+            'clients': clients,
+            'page_obj': page,
+            'is_paginated': False,
+            'filters': '',
+            'query': '',
+            'selected_server': '',
+            'servers': [],
+        }
+
+    def _server_list_context(self, rows):
+        servers = []
+        for index in range(rows):
+            server = Server(pk=index + 1, host=f'10.0.{index // 256}.{index % 256}', initial_port=10000, final_port=10999)
+            server.clients_count = index % 50
+            server.used_ports_count = index % 1000
+            servers.append(server)
+        return {'servers': servers}
@@ -0,0 +1,216 @@
+import copy
+import json
+import statistics
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+
+from core import cache as versions
+from core.fakes import FakeFleet
+from core.models import Job, Server, User
+from core.services import backends, jobs, port_allocator, status_collector
+
+LOCMEM_CACHE = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'benchmark',
+    'OPTIONS': {'MAX_ENTRIES': 100000},
+}
+DATABASE_CACHE = {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'benchmark_cache',
+    'OPTIONS': {'MAX_ENTRIES': 100000},
+}
+# Backends que el benchmark puede vaciar sin tocar datos reales (en memoria o en la BD de prueba)
+DISPOSABLE_BACKENDS = ('LocMemCache', 'DatabaseCache', 'DummyCache')
+
+
+def bench_caches(locmem: bool) -> dict:
+    """
+    Cachés del benchmark: las configuradas, para que las consultas medidas sean las de producción.
+    Las que viven fuera del proceso y de la BD (Redis...) se sustituyen por DatabaseCache sobre
+    la BD de prueba, porque las medidas en frío las vacían. Con `locmem` todas van en memoria.
+    """
+    configured = copy.deepcopy(settings.CACHES)
+    for alias, config in configured.items():
+        if locmem:
+            configured[alias] = {**LOCMEM_CACHE, 'LOCATION': f'benchmark-{alias}'}
+        elif not config['BACKEND'].endswith(DISPOSABLE_BACKENDS):
+            configured[alias] = {**DATABASE_CACHE, 'LOCATION': f'benchmark_cache_{alias}'}
+    return configured
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide los caminos críticos (alta de servidores y clientes, tareas remotas, colector de estado y listados) "
+        "sobre una base de datos de prueba sembrada y servidores remotos simulados en memoria"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', type=int, default=5, help="Servidores a crear (por defecto 5)")
+        parser.add_argument('--range', type=int, default=1000, help="Puertos por servidor (por defecto 1000)")
+        parser.add_argument('--clients', type=int, default=500, help="Clientes sembrados (por defecto 500)")
+        parser.add_argument('--ports-per-client', type=int, default=3, help="Puertos por cliente (por defecto 3)")
+        parser.add_argument('--creates', type=int, default=20, help="Altas medidas con ClientCreateView (por defecto 20)")
+        parser.add_argument('--repeat', type=int, default=5, help="Repeticiones de cada medida (por defecto 5)")
+        parser.add_argument('--latency', type=float, default=0, help="Latencia simulada por llamada remota, en ms")
+        parser.add_argument(
+            '--locmem-cache', action='store_true',
+            help="Usar caché en memoria en lugar de la configurada (por defecto se mide con CACHES)",
+        )
+        parser.add_argument('--json', action='store_true', help="Salida en JSON para comparar entre ejecuciones")
+
+    def handle(self, *args, **options):
+        self.results = []
+        setup_test_environment()
+        # Base de datos de prueba desechable: el benchmark nunca toca los datos reales
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=bench_caches(options['locmem_cache'])):
+                # Tablas de las cachés en BD de la configuración del benchmark
+                call_command('createcachetable', verbosity=0)
+                self._clear_caches()
+                backends_used = ', '.join(
+                    f"{alias}={config['BACKEND'].rsplit('.', 1)[-1]}" for alias, config in settings.CACHES.items()
+                )
+                self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps([{**result, 'caches': backends_used} for result in self.results], indent=2))
+            return
+        self.stdout.write(f"Cachés: {backends_used}")
+        for result in self.results:
+            self.stdout.write(
+                f"{result['name']:<48} n={result['n']:<4} media {result['mean_ms']:8.1f} ms · "
+                f"p95 {result['p95_ms']:8.1f} ms · máx {result['max_ms']:8.1f} ms · consultas {result['queries']}"
+            )
+
+    @staticmethod
+    def _clear_caches():
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+    def _measure(self, name, fn, repeat, before=None):
+        """Ejecuta fn(i) `repeat` veces midiendo tiempo y consultas; `before(i)` no se mide"""
+        timings, queries = [], []
+        for index in range(repeat):
+            if before:
+                before(index)
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                fn(index)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context))
+
+        timings.sort()
+        self.results.append({
+            'name': name,
+            'n': repeat,
+            'mean_ms': round(statistics.mean(timings), 2),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+            'max_ms': round(timings[-1], 2),
+            'queries': max(queries),
+        })
+
+    def _run(self, options):
+        fleet = FakeFleet(latency=options['latency'] / 1000)
+        repeat = options['repeat']
+
+        # Servidores: Server.save (alta y cambio de rango)
+        servers = []
+        self._measure('Server.save (alta)', lambda i: servers.append(Server.objects.create(
+            host=f'bench-{i}.local', api_key='bench',
+            initial_port=10000, final_port=10000 + options['range'] - 1,
+        )), options['servers'])
+
+        def widen(i):
+            server = servers[i]
+            server.final_port += 10
+            server.save()
+        self._measure('Server.save (cambio de rango)', widen, len(servers))
+
+        for server in servers:
+            fleet.mount(server)
+
+        # Siembra de clientes: un hash compartido y un INSERT masivo de puertos por servidor
+        password_hash = make_password('bench')
+
+        def seed(i):
+            for position, server in enumerate(servers):
+                users = User.objects.bulk_create(
+                    User(username=f'bench{index:05d}', password=password_hash, role='client', server=server)
+                    for index in range(position, options['clients'], len(servers))
+                )
+                allocations = port_allocator.allocate_batch(
+                    server, [(user, options['ports_per_client']) for user in users]
+                )
+                for user, ports in zip(users, allocations):
+                    fleet.apply(server.host, 'create', user.username, ports)
+            versions.bump_version('clients')
+        self._measure(f"Siembra de {options['clients']} clientes (allocate_batch)", seed, 1)
+
+        admin = User.objects.create_superuser('bench-admin', 'bench@example.com', 'bench')
+        browser = Client()
+        browser.force_login(admin)
+
+        # Alta de clientes por la vista (hash, asignación de puertos y encolado)
+        def create(i):
+            response = browser.post('/clients/add/', {
+                'username': f'nuevo{i:05d}',
+                'password': 'bench-password',
+                'server': servers[i % len(servers)].pk,
+                'num_ports': options['ports_per_client'],
+            })
+            assert response.status_code == 302, response.status_code
+        self._measure('ClientCreateView (POST)', create, options['creates'])
+
+        # Creación remota de esas altas contra la API simulada
+        def run_next(i):
+            job = jobs.claim_next('benchmark')
+            assert job is not None and jobs.run_job(job), getattr(job, 'last_error', None)
+        pending = Job.objects.filter(status=Job.STATUS_PENDING).count()
+        self._measure('jobs.run_job (create por API)', run_next, pending)
+
+        self._measure('status_collector.collect_status', lambda i: status_collector.collect_status(), repeat)
+
+        # Listados: con la caché vacía y con los fragmentos y contadores ya en caché
+        client_user = User.objects.filter(role='client').first()
+        client_browser = Client()
+        client_browser.force_login(client_user)
+        pages = [
+            ('ClientListView', browser, '/clients/'),
+            ('ServerListView', browser, '/servers/'),
+            ('HomeView (admin)', browser, f'/?client_id={client_user.pk}'),
+            ('HomeView (cliente)', client_browser, '/'),
+        ]
+        for label, session, url in pages:
+            def get(i, session=session, url=url):
+                assert session.get(url).status_code == 200
+            self._measure(f'{label} (caché fría)', get, repeat, before=lambda i: self._clear_caches())
+            self._measure(f'{label} (caché caliente)', get, repeat)
+
+        # manage_client por SSH contra el doble (comando suelto y lote)
+        server = servers[0]
+        server.transport, server.ssh_username, server.ssh_password = Server.TRANSPORT_SSH, 'bench', 'bench'
+        server.save()
+        service = backends.get_backend(server)
+        service._exec = fleet.ssh_exec(server.host)
+        self._measure('SSH list_clients', lambda i: service.list_clients(), repeat)
+
+        names = list(User.objects.filter(server=server, role='client').values_list('username', flat=True)[:20])
+
+        def restart_batch(i):
+            with service.batch() as batch:
+                results = [batch.restart_client(name) for name in names]
+            assert all(result.ok for result in results)
+        self._measure(f'SSH lote de {len(names)} reinicios', restart_batch, repeat)
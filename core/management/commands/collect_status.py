@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import metrics, status_collector
+
+
+class Command(BaseCommand):
+    help = "Consulta periódicamente el estado de clientes y puertos en cada servidor y lo guarda en caché"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Ejecutar una sola pasada y salir")
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=settings.CLIENT_STATUS_INTERVAL,
+            help="Segundos entre pasadas (por defecto CLIENT_STATUS_INTERVAL)",
+        )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=settings.METRICS_PORT,
+            help="Puerto donde publicar /metrics de este proceso (por defecto METRICS_PORT; 0 lo desactiva)",
+        )
+
+    def handle(self, *args, **options):
+        if options['metrics_port'] and not options['once']:
+            try:
+                metrics.serve(options['metrics_port'], settings.METRICS_TOKEN, settings.METRICS_ADDRESS)
+            except ValueError as e:
+                raise CommandError(str(e))
+        while True:
+            started = time.monotonic()
+            summary = status_collector.collect_status()
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"Estado actualizado: {summary['ok']} servidores OK, {summary['error']} con error ({elapsed:.2f}s)"
+            )
+            if options['once']:
+                return
+            time.sleep(max(options['interval'] - elapsed, 0))
@@ -0,0 +1,36 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import bulk_import
+
+
+class Command(BaseCommand):
+    help = "Da de alta clientes en lote desde un CSV o JSON (username, server, num_ports[, password])"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Archivo a importar ('-' para leer de stdin)")
+        parser.add_argument('--format', choices=bulk_import.FORMATS, help="Formato del archivo (por defecto según la extensión)")
+        parser.add_argument('--contiguous', action='store_true', help="Asignar bloques de puertos consecutivos")
+        parser.add_argument(
+            '--no-remote',
+            action='store_true',
+            help="No crear los clientes en los servidores ahora; dejar las tareas para run_jobs",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or bulk_import.detect_format(path)
+
+        try:
+            if path == '-':
+                rows = bulk_import.parse_rows(sys.stdin, fmt)
+            else:
+                with open(path, encoding='utf-8-sig', newline='') as stream:
+                    rows = bulk_import.parse_rows(stream, fmt)
+        except (OSError, bulk_import.BulkImportError) as e:
+            raise CommandError(str(e))
+
+        for event in bulk_import.import_clients(rows, contiguous=options['contiguous'], remote=not options['no_remote']):
+            self.stdout.write(json.dumps(event, ensure_ascii=False))
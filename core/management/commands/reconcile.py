@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Server
+from core.services import reconciliation
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara los clientes y puertos de la base de datos con los de cada servidor e informa "
+        "huérfanos, clientes ausentes y puertos filtrados; con --fix los corrige "
+        "(los huérfanos solo se eliminan con --delete-orphans)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Aplicar las correcciones (por defecto solo informa)")
+        parser.add_argument(
+            '--delete-orphans', action='store_true',
+            help="Con --fix, eliminar también los clientes del servidor sin usuario local"
+        )
+        parser.add_argument('--server', type=int, action='append', dest='servers', help="Limitar a un servidor (repetible)")
+        parser.add_argument('--json', action='store_true', help="Informe en JSON")
+
+    def handle(self, *args, **options):
+        servers = Server.objects.all()
+        if options['servers']:
+            servers = servers.filter(pk__in=options['servers'])
+        if options['delete_orphans'] and not options['fix']:
+            raise CommandError("--delete-orphans requiere --fix")
+        reports = reconciliation.reconcile(servers, fix=options['fix'], delete_orphans=options['delete_orphans'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+
+        for report in reports:
+            if not report['ok']:
+                self.stdout.write(self.style.ERROR(f"{report['server']}: sin listado ({report['error']})"))
+                continue
+            if not reconciliation.has_drift(report):
+                self.stdout.write(self.style.SUCCESS(f"{report['server']}: sin diferencias"))
+                continue
+
+            self.stdout.write(self.style.WARNING(f"{report['server']}:"))
+            if report['orphans']:
+                self.stdout.write(f"  Huérfanos en el servidor: {', '.join(report['orphans'])}")
+            if report['missing']:
+                self.stdout.write(f"  Ausentes en el servidor: {', '.join(report['missing'])}")
+            for name, ports in report['leaked_ports'].items():
+                self.stdout.write(f"  Puertos filtrados de {name}: {', '.join(map(str, ports))}")
+            for name, ports in report['untracked_ports'].items():
+                self.stdout.write(f"  Puertos sin registrar de {name}: {', '.join(map(str, ports))}")
+            if report['unknown_ports']:
+                self.stdout.write(f"  Sin puertos en el listado (no se liberan): {', '.join(report['unknown_ports'])}")
+            for conflict in report['conflicts']:
+                owner = conflict['local'] or 'fuera del rango'
+                self.stdout.write(f"  Conflicto en el puerto {conflict['port']}: {conflict['remote']} en el servidor, {owner} en la BD")
+
+            if 'fixed_ports' in report:
+                fixed = report['fixed_ports']
+                self.stdout.write(f"  Corregido: {fixed['released']} puertos liberados, {fixed['claimed']} reclamados")
+            if 'local_error' in report:
+                self.stdout.write(self.style.ERROR(f"  Error corrigiendo la BD: {report['local_error']}"))
+            for result in report.get('remote_fixes', []):
+                outcome = 'OK' if result['ok'] else f"error: {result['error']}"
+                self.stdout.write(f"  {result['action']} {result['client']}: {outcome}")
+            if 'remote_error' in report:
+                self.stdout.write(self.style.ERROR(f"  Error corrigiendo el servidor: {report['remote_error']}"))
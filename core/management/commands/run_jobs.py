@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import jobs, metrics
+
+
+class Command(BaseCommand):
+    help = "Ejecuta la cola de tareas remotas (crear, eliminar y extender clientes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.JOB_WORKERS,
+            help="Hilos que consumen la cola en paralelo (por defecto JOB_WORKERS)",
+        )
+        parser.add_argument('--once', action='store_true', help="Procesar las tareas pendientes y salir")
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help="Segundos entre consultas cuando la cola está vacía (por defecto JOB_POLL_INTERVAL)",
+        )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=settings.METRICS_PORT,
+            help="Puerto donde publicar /metrics de este proceso (por defecto METRICS_PORT; 0 lo desactiva)",
+        )
+
+    def handle(self, *args, **options):
+        if options['metrics_port'] and not options['once']:
+            try:
+                metrics.serve(options['metrics_port'], settings.METRICS_TOKEN, settings.METRICS_ADDRESS)
+            except ValueError as e:
+                raise CommandError(str(e))
+        self.stdout.write(f"Procesando tareas con {options['workers']} workers")
+        jobs.run_workers(workers=options['workers'], once=options['once'], interval=options['interval'])
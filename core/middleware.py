@@ -0,0 +1,143 @@
+"""
+Perfilado por petición apto para producción (DEBUG desactivado, WSGI o ASGI).
+
+Para una fracción PROFILING_SAMPLE_RATE de las peticiones registra por vista: tiempo total,
+consultas y tiempo de BD, llamadas remotas y su tiempo, y tiempo de render de plantillas.
+Cada muestra alimenta view_duration_seconds en /metrics y un registro en 'core.profiling';
+si supera su presupuesto (PROFILING_BUDGETS) se registra como WARNING.
+
+Un administrador puede añadir ?_profile=1 a cualquier URL para medir esa petición y guardar
+un volcado de cProfile en PROFILING_DUMP_DIR (se abre con snakeviz o pstats).
+En respuestas en streaming el tiempo total llega hasta que empieza el envío.
+
+El tiempo de plantillas solo se mide en vistas que retornan TemplateResponse (las genéricas
+de Django); las que llaman a render() lo informan como 0 y su render cuenta en el total.
+"""
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from core import profiling
+from core.services import metrics
+
+logger = logging.getLogger('core.profiling')
+
+PROFILE_PARAM = '_profile'
+# Nombre de las peticiones que no resolvieron a una vista (404): nunca se usa la ruta
+UNRESOLVED_VIEW = 'unresolved'
+
+
+class RequestProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _sampled(self) -> bool:
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        dump = PROFILE_PARAM in request.GET and request.user.is_staff
+        if not dump and not self._sampled():
+            return self.get_response(request)
+
+        profile = profiling.start()
+        profiler = cProfile.Profile() if dump else None
+        try:
+            if profiler:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+        finally:
+            profiling.stop()
+        self._finish(request, response, profile, profiler)
+        return response
+
+    async def __acall__(self, request):
+        dump = PROFILE_PARAM in request.GET and (await request.auser()).is_staff
+        if not dump and not self._sampled():
+            return await self.get_response(request)
+
+        profile = profiling.start()
+        profiler = cProfile.Profile() if dump else None
+        try:
+            if profiler:
+                # cProfile solo ve su propio hilo: la cadena se ejecuta en uno, donde ASGI
+                # corre también las vistas síncronas (thread_sensitive)
+                response = await sync_to_async(profiler.runcall)(async_to_sync(self.get_response), request)
+            else:
+                response = await self.get_response(request)
+        finally:
+            profiling.stop()
+        await sync_to_async(self._finish)(request, response, profile, profiler)
+        return response
+
+    def process_template_response(self, request, response):
+        # El render ocurre justo después de este hook; el callback marca su final
+        profile = profiling.current()
+        if profile is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: profile.add('template_time', time.perf_counter() - started)
+            )
+        return response
+
+    @staticmethod
+    def _view_name(request) -> str:
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return UNRESOLVED_VIEW
+        return getattr(match.func, 'view_class', match.func).__name__
+
+    @staticmethod
+    def _dump_path(view: str) -> str:
+        directory = os.path.realpath(settings.PROFILING_DUMP_DIR)
+        name = re.sub(r'[^A-Za-z0-9_.-]', '_', view).lstrip('.') or UNRESOLVED_VIEW
+        path = os.path.realpath(os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof"))
+        if os.path.dirname(path) != directory:
+            raise ValueError(f"Volcado de perfil fuera de PROFILING_DUMP_DIR: {path}")
+        return path
+
+    def _finish(self, request, response, profile, profiler) -> None:
+        summary = profile.summary()
+        view = summary['view'] = self._view_name(request)
+        summary.update(method=request.method, path=request.path, status=response.status_code)
+        metrics.VIEW_DURATION.observe(summary['wall_ms'] / 1000, view=view)
+
+        if profiler is not None:
+            os.makedirs(settings.PROFILING_DUMP_DIR, exist_ok=True)
+            summary['profile_path'] = self._dump_path(view)
+            profiler.dump_stats(summary['profile_path'])
+
+        budgets = settings.PROFILING_BUDGETS
+        budget = budgets.get(view, budgets.get('*', {}))
+        exceeded = [field for field, limit in budget.items() if summary.get(field, 0) > limit]
+        for field in exceeded:
+            metrics.VIEW_BUDGET_VIOLATIONS.inc(view=view, budget=field)
+
+        costs = (
+            f"{summary['wall_ms']} ms, {summary['db_queries']} consultas ({summary['db_ms']} ms), "
+            f"{summary['remote_calls']} llamadas remotas ({summary['remote_ms']} ms), "
+            f"plantillas {summary['template_ms']} ms"
+        )
+        if exceeded:
+            logger.warning(
+                f"{view} superó su presupuesto ({', '.join(exceeded)}): {costs}",
+                extra={'event': 'request_budget', 'exceeded': exceeded, **summary},
+            )
+        else:
+            logger.info(f"{view}: {costs}", extra={'event': 'request_profile', **summary})
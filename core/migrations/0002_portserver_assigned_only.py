@@ -0,0 +1,48 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def delete_free_ports(apps, schema_editor):
+    """Los puertos libres pasan a ser implícitos: se eliminan sus filas"""
+    PortServer = apps.get_model('core', 'PortServer')
+    PortServer.objects.filter(
+        models.Q(is_available=True) | models.Q(assigned_client__isnull=True)
+    ).delete()
+
+
+def restore_free_ports(apps, schema_editor):
+    """Vuelve a materializar una fila por cada puerto libre del rango"""
+    Server = apps.get_model('core', 'Server')
+    PortServer = apps.get_model('core', 'PortServer')
+    PortServer.objects.update(is_available=False)
+    for server in Server.objects.all():
+        used = set(PortServer.objects.filter(server=server).values_list('port_number', flat=True))
+        PortServer.objects.bulk_create(
+            (
+                PortServer(server=server, port_number=port, is_available=True)
+                for port in range(server.initial_port, server.final_port + 1)
+                if port not in used
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_free_ports, restore_free_ports),
+        migrations.RemoveField(
+            model_name='portserver',
+            name='is_available',
+        ),
+        migrations.AlterField(
+            model_name='portserver',
+            name='assigned_client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assigned_ports', to=settings.AUTH_USER_MODEL, verbose_name='Cliente Asignado'),
+        ),
+    ]
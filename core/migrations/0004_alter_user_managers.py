@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:25
+
+import core.models.users
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_job'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', core.models.users.UserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='server',
+            name='ssh_password',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Contraseña SSH'),
+        ),
+        migrations.AddField(
+            model_name='server',
+            name='ssh_port',
+            field=models.PositiveIntegerField(default=22, verbose_name='Puerto SSH'),
+        ),
+        migrations.AddField(
+            model_name='server',
+            name='ssh_username',
+            field=models.CharField(blank=True, max_length=150, verbose_name='Usuario SSH'),
+        ),
+        migrations.AddField(
+            model_name='server',
+            name='transport',
+            field=models.CharField(choices=[('rest', 'API REST'), ('batched', 'API REST agrupada en lotes'), ('ssh', 'SSH (manage_client)'), ('rest_legacy', 'API REST antigua (/restart-port/)')], default='rest', help_text='Cómo se envían las operaciones sobre los clientes de este servidor', max_length=20, verbose_name='Transporte'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_job_cancelled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='server',
+            name='supports_batch',
+            field=models.BooleanField(default=False, help_text='La API del servidor expone POST /clients/batch; si no, los lotes se envían operación a operación', verbose_name='Admite lotes'),
+        ),
+    ]
@@ -1,2 +1,3 @@
 from .servers import * # noqa
-from .users import * # noqa
\ No newline at end of file
+from .users import * # noqa
+from .jobs import * # noqa
@@ -0,0 +1,65 @@
+from django.db import models
+
+
+class Job(models.Model):
+    """
+    Operación remota pendiente (crear, eliminar o extender un cliente).
+    La vista la encola en la misma transacción que los cambios locales y un worker
+    (`manage.py run_jobs`) la ejecuta fuera de la petición HTTP.
+    """
+
+    ACTION_CREATE = 'create'
+    ACTION_DELETE = 'delete'
+    ACTION_EXTEND = 'extend'
+    ACTION_CHOICES = (
+        (ACTION_CREATE, 'Crear cliente'),
+        (ACTION_DELETE, 'Eliminar cliente'),
+        (ACTION_EXTEND, 'Extender puertos'),
+    )
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En ejecución'),
+        (STATUS_DONE, 'Completado'),
+        (STATUS_FAILED, 'Fallido'),
+        (STATUS_CANCELLED, 'Cancelado'),
+    )
+
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES, verbose_name="Acción")
+    server = models.ForeignKey(
+        "core.Server",
+        on_delete=models.CASCADE,
+        related_name="jobs",
+        verbose_name="Servidor"
+    )
+    # El nombre se guarda aparte: en una eliminación el usuario ya no existe al ejecutar el job
+    client_name = models.CharField(max_length=150, verbose_name="Cliente")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Datos")
+    idempotency_key = models.CharField(max_length=255, unique=True, verbose_name="Clave de idempotencia")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Estado")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Intentos")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="Intentos máximos")
+    run_at = models.DateTimeField(verbose_name="Ejecutar desde")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Worker")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Tomado en")
+    last_error = models.TextField(blank=True, verbose_name="Último error")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Creado")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Actualizado")
+
+    class Meta:
+        verbose_name = "Tarea"
+        verbose_name_plural = "Tareas"
+        ordering = ['run_at', 'pk']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='core_job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.client_name} ({self.get_status_display()})"
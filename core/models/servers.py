@@ -1,77 +1,195 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Coalesce
+
+
+class ServerQuerySet(models.QuerySet):
+    def with_usage(self):
+        """
+        Anota clients_count y used_ports_count con subconsultas correlacionadas:
+        una sola consulta para todo el listado, sin multiplicar filas clientes x puertos.
+        """
+        from .users import User
+
+        clients = (
+            User.objects.filter(server=models.OuterRef('pk'))
+            .order_by()
+            .values('server')
+            .annotate(total=models.Count('pk'))
+            .values('total')
+        )
+        ports = (
+            PortServer.objects.filter(server=models.OuterRef('pk'))
+            .order_by()
+            .values('server')
+            .annotate(total=models.Count('pk'))
+            .values('total')
+        )
+        return self.annotate(
+            clients_count=Coalesce(models.Subquery(clients), 0),
+            used_ports_count=Coalesce(models.Subquery(ports), 0),
+        )
 
 
 class Server(models.Model):
+    # Transporte de las operaciones remotas (ver core.services.backends)
+    TRANSPORT_REST = 'rest'
+    TRANSPORT_BATCHED = 'batched'
+    TRANSPORT_SSH = 'ssh'
+    TRANSPORT_REST_LEGACY = 'rest_legacy'
+    TRANSPORT_CHOICES = (
+        (TRANSPORT_REST, 'API REST'),
+        (TRANSPORT_BATCHED, 'API REST agrupada en lotes'),
+        (TRANSPORT_SSH, 'SSH (manage_client)'),
+        (TRANSPORT_REST_LEGACY, 'API REST antigua (/restart-port/)'),
+    )
+
     host = models.CharField(max_length=255, verbose_name="Host")
     api_key = models.CharField(max_length=255, verbose_name="Clave API", help_text="Clave API para autenticación")
     initial_port = models.IntegerField(verbose_name="Puerto Inicial", help_text="Inicio del rango de puertos")
     final_port = models.IntegerField(verbose_name="Puerto Final", help_text="Fin del rango de puertos")
+    transport = models.CharField(
+        max_length=20, choices=TRANSPORT_CHOICES, default=TRANSPORT_REST, verbose_name="Transporte",
+        help_text="Cómo se envían las operaciones sobre los clientes de este servidor",
+    )
+    ssh_port = models.PositiveIntegerField(default=22, verbose_name="Puerto SSH")
+    ssh_username = models.CharField(max_length=150, blank=True, verbose_name="Usuario SSH")
+    ssh_password = models.CharField(max_length=255, blank=True, verbose_name="Contraseña SSH")
+    supports_batch = models.BooleanField(
+        default=False, verbose_name="Admite lotes",
+        help_text="La API del servidor expone POST /clients/batch; si no, los lotes se envían operación a operación",
+    )
+
+    objects = ServerQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Servidor"
         verbose_name_plural = "Servidores"
 
+    # Campos cuyo valor original se recuerda para detectar cambios al guardar
+    TRACKED_FIELDS = (
+        'host', 'api_key', 'initial_port', 'final_port', 'transport', 'ssh_port', 'ssh_username', 'ssh_password',
+        'supports_batch',
+    )
+    # Campos que determinan cómo se conecta el backend remoto del servidor
+    CONNECTION_FIELDS = (
+        'host', 'api_key', 'transport', 'ssh_port', 'ssh_username', 'ssh_password', 'supports_batch',
+    )
+    # Campos que solo reconstruyen el backend, sin cerrar sesiones ni transportes abiertos
+    BACKEND_ONLY_FIELDS = ('transport', 'supports_batch')
+
     def __str__(self):
         return f"{self.host} ({self.initial_port}-{self.final_port})"
 
-    @property
-    def get_used_ports_count(self):
-        return self.ports.filter(is_available=False).count()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_values()
+        return instance
+
+    def _remember_values(self):
+        self._loaded_values = {
+            name: getattr(self, name)
+            for name in self.TRACKED_FIELDS
+            if name in self.__dict__
+        }
+
+    def get_changed_fields(self):
+        """Campos rastreados que cambiaron desde que se cargó/guardó la instancia"""
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None:
+            return set(self.TRACKED_FIELDS)
+        return {name for name, value in loaded.items() if getattr(self, name) != value}
 
     @property
-    def get_usage_percent(self):
-        total = self.ports.count()
-        if total == 0:
-            return 0
-        return int((self.get_used_ports_count / total) * 100)
+    def range_changed(self):
+        return bool({'initial_port', 'final_port'} & self.get_changed_fields())
+
+    def get_ports_outside_range(self, initial_port, final_port):
+        """Puertos asignados que quedarían fuera del rango indicado"""
+        return list(
+            self.ports.exclude(port_number__range=(initial_port, final_port))
+            .order_by('port_number')
+            .values_list('port_number', flat=True)
+        )
+
+    def clean(self):
+        super().clean()
+        if self.transport == self.TRANSPORT_SSH and not (self.ssh_username and self.ssh_password):
+            raise ValidationError("El transporte SSH requiere usuario y contraseña SSH.")
+
+        if self.initial_port is None or self.final_port is None:
+            return
+
+        if self.initial_port > self.final_port:
+            raise ValidationError({'final_port': "El puerto final debe ser mayor o igual al puerto inicial."})
+
+        # Solo se consulta PortServer si el rango cambió sobre un servidor existente:
+        # editar host o api_key no toca la tabla de puertos.
+        if self.pk and self.range_changed:
+            outside = self.get_ports_outside_range(self.initial_port, self.final_port)
+            if outside:
+                shown = ', '.join(str(p) for p in outside[:10])
+                more = f" y {len(outside) - 10} más" if len(outside) > 10 else ""
+                raise ValidationError(
+                    f"No se puede reducir el rango: hay {len(outside)} puertos asignados fuera del nuevo rango ({shown}{more})."
+                )
 
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
         super().save(*args, **kwargs)
-        # Generate ports if new or range changed (simplified: always check/generate missing)
-        self.generate_ports()
+        self._remember_values()
+
+    @property
+    def total_ports(self):
+        return self.final_port - self.initial_port + 1
+
+    @property
+    def get_clients_count(self):
+        if hasattr(self, 'clients_count'):
+            return self.clients_count
+        return self.clients.count()
 
-    def generate_ports(self):
-        """Genera registros PortServer para el rango definido"""
-        existing_ports = set(self.ports.values_list('port_number', flat=True))
-        new_ports = []
-        for port in range(self.initial_port, self.final_port + 1):
-            if port not in existing_ports:
-                new_ports.append(PortServer(server=self, port_number=port))
+    @property
+    def get_used_ports_count(self):
+        # Usa la anotación de with_usage() si existe para no repetir la consulta
+        if hasattr(self, 'used_ports_count'):
+            return self.used_ports_count
+        return self.ports.count()
 
-        if new_ports:
-            PortServer.objects.bulk_create(new_ports)
+    @property
+    def get_usage_percent(self):
+        total = self.total_ports
+        if total <= 0:
+            return 0
+        return int((self.get_used_ports_count / total) * 100)
 
     def check_ports_availability(self, ports_to_check):
         """
-        Verifica si los puertos están libres en la tabla PortServer.
+        Verifica si los puertos están libres: dentro del rango y sin fila en PortServer.
         """
         for port in ports_to_check:
             # Check range
             if not (self.initial_port <= port <= self.final_port):
                 return False, f"El puerto {port} está fuera del rango permitido ({self.initial_port}-{self.final_port})"
 
-            # Check availability in DB
-            port_obj = self.ports.filter(port_number=port).first()
-            if not port_obj:
-                # Should not happen if generate_ports worked, but safe check
-                return False, f"El puerto {port} no está gestionado por este servidor."
-
-            if not port_obj.is_available:
-                return False, f"El puerto {port} ya está ocupado."
+        # Check availability in DB (solo existen filas para puertos asignados)
+        taken = sorted(self.ports.filter(port_number__in=ports_to_check).values_list('port_number', flat=True))
+        if taken:
+            return False, f"El puerto {taken[0]} ya está ocupado."
 
         return True, None
 
 
 class PortServer(models.Model):
+    """
+    Puerto asignado a un cliente.
+    Solo se guardan los puertos en uso: los libres son el resto del rango del servidor.
+    """
     server = models.ForeignKey(Server, on_delete=models.CASCADE, related_name='ports')
     port_number = models.IntegerField(verbose_name="Número de Puerto")
-    is_available = models.BooleanField(default=True, verbose_name="Disponible")
     assigned_client = models.ForeignKey(
         'User',
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
+        on_delete=models.CASCADE,
         related_name='assigned_ports',
         verbose_name="Cliente Asignado"
     )
@@ -82,5 +200,4 @@ class PortServer(models.Model):
         unique_together = ('server', 'port_number')
 
     def __str__(self):
-        status = "Libre" if self.is_available else "Ocupado"
-        return f"{self.server.host}:{self.port_number} ({status})"
+        return f"{self.server.host}:{self.port_number}"
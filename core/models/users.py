@@ -1,6 +1,18 @@
 
+from django.conf import settings
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.hashers import acheck_password, check_password, make_password
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
+
+
+class UserManager(BaseUserManager):
+    def _create_user_object(self, username, email, password, **extra_fields):
+        if extra_fields.get('role') != 'client':
+            return super()._create_user_object(username, email, password, **extra_fields)
+        # Sin contraseña el padre no hashea; set_password aplica el hasher de clientes
+        user = super()._create_user_object(username, email, None, **extra_fields)
+        user.set_password(password)
+        return user
 
 
 class User(AbstractUser):
@@ -16,6 +28,8 @@ class User(AbstractUser):
 
     # email = models.EmailField(max_length=250, unique=True, verbose_name='Email')
 
+    objects = UserManager()
+
     role = models.CharField(max_length=50, choices=ROLE_CHOICES, null=True, blank=True, verbose_name='Rol')
 
     server = models.ForeignKey(
@@ -34,6 +48,36 @@ class User(AbstractUser):
     def __str__(self) -> str:
         return self.username
 
+    def set_password(self, raw_password):
+        if not self.is_client:
+            return super().set_password(raw_password)
+        # Cuentas de cliente: hasher propio, más barato que el PBKDF2 por defecto
+        self.password = make_password(raw_password, hasher=settings.CLIENT_PASSWORD_HASHER)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        if not self.is_client:
+            return super().check_password(raw_password)
+
+        def setter(raw_password):
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=["password"])
+
+        # preferred: los hashes con otro algoritmo se migran al de clientes en el login
+        return check_password(raw_password, self.password, setter, preferred=settings.CLIENT_PASSWORD_HASHER)
+
+    async def acheck_password(self, raw_password):
+        if not self.is_client:
+            return await super().acheck_password(raw_password)
+
+        async def setter(raw_password):
+            self.set_password(raw_password)
+            self._password = None
+            await self.asave(update_fields=["password"])
+
+        return await acheck_password(raw_password, self.password, setter, preferred=settings.CLIENT_PASSWORD_HASHER)
+
     @property
     def is_client(self):
         return self.role == 'client'
@@ -0,0 +1,81 @@
+"""
+Costes de la petición en curso para RequestProfilingMiddleware.
+
+El perfil vive en una ContextVar: llega a las vistas síncronas que ASGI ejecuta en hilos
+(sync_to_async copia el contexto) y a los hilos de bulk_actions, que lo propagan.
+Fuera de una petición muestreada las funciones record_* no hacen nada.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+_current: ContextVar[Optional['RequestProfile']] = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.view = None
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.remote_calls = 0
+        self.remote_time = 0.0
+        self.template_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, field: str, seconds: float, count_field: str = None) -> None:
+        # Varias consultas/llamadas pueden llegar a la vez desde los hilos de bulk_actions
+        with self._lock:
+            setattr(self, field, getattr(self, field) + seconds)
+            if count_field:
+                setattr(self, count_field, getattr(self, count_field) + 1)
+
+    def summary(self) -> dict:
+        return {
+            'view': self.view,
+            'wall_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'remote_calls': self.remote_calls,
+            'remote_ms': round(self.remote_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+        }
+
+
+def start() -> RequestProfile:
+    profile = RequestProfile()
+    _current.set(profile)
+    return profile
+
+
+def stop() -> None:
+    _current.set(None)
+
+
+def current() -> Optional[RequestProfile]:
+    return _current.get()
+
+
+def record_remote(seconds: float) -> None:
+    profile = _current.get()
+    if profile is not None:
+        profile.add('remote_time', seconds, 'remote_calls')
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """execute_wrapper instalado en cada conexión: cuenta y mide las consultas de la petición"""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add('db_time', time.perf_counter() - started, 'db_queries')
+
+
+def install_query_wrapper(sender, connection, **kwargs) -> None:
+    """Receptor de connection_created"""
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import threading
+from typing import List, Dict, Any, Tuple
+
+import httpx
+from django.conf import settings
+
+from core.models import Server
+from core.services import metrics, resilience
+from core.services.client_api_service import APIException
+
+logger = logging.getLogger(__name__)
+
+# Clientes HTTP asíncronos compartidos: (server.pk, api_key, event loop) -> httpx.AsyncClient
+# Un AsyncClient queda ligado al event loop donde se creó, por eso forma parte de la clave.
+_clients: Dict[Tuple[Any, str, asyncio.AbstractEventLoop], httpx.AsyncClient] = {}
+_clients_lock = threading.Lock()
+
+
+class _ServerError(Exception):
+    """Respuesta 5xx: cuenta como fallo del servidor para el circuit breaker"""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+TRANSIENT_ERRORS = (httpx.TransportError, _ServerError)
+
+
+def _build_client(api_key: str) -> httpx.AsyncClient:
+    """Crea un cliente con pool de conexiones keep-alive hacia un servidor"""
+    return httpx.AsyncClient(
+        headers={
+            'X-API-Key': api_key,
+            'Content-Type': 'application/json',
+            'User-Agent': 'TuApp/1.0',
+        },
+        limits=httpx.Limits(
+            max_connections=settings.CLIENT_API_POOL_MAXSIZE,
+            max_keepalive_connections=settings.CLIENT_API_POOL_MAXSIZE,
+        ),
+        timeout=settings.CLIENT_API_TIMEOUT,
+    )
+
+
+def get_async_client(server: Server) -> httpx.AsyncClient:
+    """Retorna el cliente HTTP asíncrono compartido del servidor para el event loop actual"""
+    loop = asyncio.get_running_loop()
+    api_key = getattr(server, 'api_key', 'super_secret_key')
+    key = (server.pk, api_key, loop)
+    with _clients_lock:
+        # Descartar clientes de event loops ya cerrados
+        for stale in [k for k in _clients if k[2].is_closed()]:
+            del _clients[stale]
+        client = _clients.get(key)
+        if client is None:
+            client = _build_client(api_key)
+            _clients[key] = client
+    return client
+
+
+def invalidate_clients(server_pk) -> None:
+    """
+    Descarta los clientes asíncronos de un servidor (p. ej. al editar host o api_key).
+    Cada uno se cierra en su propio event loop, que puede ser de otro hilo: se programa
+    aclose() en él para liberar sus conexiones keep-alive.
+    """
+    with _clients_lock:
+        stale = [(key[2], _clients.pop(key)) for key in [k for k in _clients if k[0] == server_pk]]
+    for loop, client in stale:
+        if loop.is_closed():
+            continue
+        try:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        except RuntimeError:
+            # El event loop se cerró entre la comprobación y la llamada
+            pass
+
+
+class AsyncClientAPIService:
+    """
+    Variante asíncrona de ClientAPIService sobre httpx.AsyncClient.
+    Expone los mismos métodos como corrutinas.
+    """
+
+    def __init__(self, server: Server):
+        self.server = server
+        self.base_url = f"https://{server.host}/api"
+
+    async def _make_request(self, method: str, endpoint: str, data: dict = None, action: str = None) -> Dict[str, Any]:
+        """
+        Realiza una petición HTTP a la API sin bloquear el event loop.
+        Retorna el mismo formato que ClientAPIService._make_request.
+        """
+        url = f"{self.base_url}{endpoint}"
+        client = get_async_client(self.server)
+
+        async def send(timeout):
+            response = await client.request(method, url, json=data, timeout=timeout)
+            if response.status_code >= 500:
+                raise _ServerError(response)
+            return response
+
+        try:
+            async with metrics.atrack('api', self.server, action or method) as call:
+                try:
+                    response = await resilience.acall(
+                        self.server, action or method, send, TRANSIENT_ERRORS, settings.CLIENT_API_TIMEOUT
+                    )
+                except _ServerError as e:
+                    response = e.response
+                if not response.is_success:
+                    call.fail(f"HTTP {response.status_code}")
+
+            if response.status_code == 401:
+                raise APIException("API Key inválida")
+
+            if not response.is_success:
+                error_detail = "Error desconocido"
+                try:
+                    error_data = response.json()
+                    error_detail = error_data.get('detail', error_detail)
+                except Exception:
+                    error_detail = response.text or f"HTTP {response.status_code}"
+
+                raise APIException(f"Error en API: {error_detail}")
+
+            api_response = response.json()
+
+            return {
+                "status": "success" if api_response.get('success', True) else "error",
+                "message": api_response.get('message', 'Operación completada'),
+                "data": api_response
+            }
+
+        except resilience.CircuitOpenError:
+            raise APIException(f"Servidor {self.server.host} no disponible temporalmente")
+        except httpx.ConnectError as e:
+            raise APIException(f"No se pudo conectar a la API: {e}")
+        except httpx.TimeoutException:
+            raise APIException("Timeout conectando a la API")
+        except APIException:
+            raise
+        except Exception as e:
+            raise APIException(f"Error inesperado: {str(e)}")
+
+    # ============================
+    # IMPLEMENTACIÓN DE MÉTODOS
+    # ============================
+
+    async def create_client(self, client_name: str, ports: List[int]) -> Dict[str, Any]:
+        """POST /clients/create"""
+        return await self._make_request('POST', '/clients/create', {'client': client_name, 'ports': ports}, action='create')
+
+    async def delete_client(self, client_name: str) -> Dict[str, Any]:
+        """DELETE /clients/{client_name}"""
+        return await self._make_request('DELETE', f'/clients/{client_name}', action='delete')
+
+    async def start_client(self, client_name: str) -> Dict[str, Any]:
+        """POST /clients/{client_name}/start"""
+        return await self._make_request('POST', f'/clients/{client_name}/start', action='start')
+
+    async def stop_client(self, client_name: str) -> Dict[str, Any]:
+        """POST /clients/{client_name}/stop"""
+        return await self._make_request('POST', f'/clients/{client_name}/stop', action='stop')
+
+    async def restart_client(self, client_name: str) -> Dict[str, Any]:
+        """POST /clients/{client_name}/restart"""
+        return await self._make_request('POST', f'/clients/{client_name}/restart', action='restart')
+
+    async def restart_port(self, client_name: str, port: int) -> Dict[str, Any]:
+        """POST /clients/{client_name}/ports/{port}/restart"""
+        return await self._make_request('POST', f'/clients/{client_name}/ports/{port}/restart', action='restart-port')
+
+    async def extend_client(self, client_name: str, ports: List[int]) -> Dict[str, Any]:
+        """POST /clients/{client_name}/extend"""
+        return await self._make_request('POST', f'/clients/{client_name}/extend', {'ports': ports}, action='extend')
+
+    async def list_clients(self) -> Dict[str, Any]:
+        """GET /clients"""
+        return await self._make_request('GET', '/clients', action='list')
+
+
+class AsyncLegacyClientAPIService(AsyncClientAPIService):
+    """Variante asíncrona de LegacyClientAPIService (reinicio de puertos en /restart-port/)"""
+
+    async def restart_port(self, client_name: str, port: int) -> Dict[str, Any]:
+        """POST /clients/{client_name}/restart-port/{port}"""
+        return await self._make_request('POST', f'/clients/{client_name}/restart-port/{port}', action='restart-port')
+
+
+def get_async_api_service(server) -> AsyncClientAPIService:
+    """Factory function para crear el servicio API asíncrono"""
+    return AsyncClientAPIService(server)
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import shlex
+import threading
+import time
+from typing import List, Dict, Any, Tuple
+
+import asyncssh
+from django.conf import settings
+
+from core.services import metrics, resilience
+from core.services.client_ssh_service import SSHException, SSHTransportError
+
+logger = logging.getLogger(__name__)
+
+# Conexiones asyncssh compartidas: (host, puerto, usuario, event loop) -> SSHClientConnection
+_connections: Dict[Tuple[str, int, str, asyncio.AbstractEventLoop], asyncssh.SSHClientConnection] = {}
+_connections_lock = threading.Lock()
+
+
+def invalidate_connections(host: str) -> None:
+    """Cierra las conexiones asíncronas abiertas hacia un host"""
+    with _connections_lock:
+        keys = [k for k in _connections if k[0] == host]
+        connections = [(k[3], _connections.pop(k)) for k in keys]
+    for loop, conn in connections:
+        # Puede llamarse desde un hilo síncrono: cerrar dentro de su event loop
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(conn.close)
+
+
+class AsyncClientSSHService:
+    """
+    Variante asíncrona de ClientSSHService sobre asyncssh.
+    Cada comando abre un canal nuevo sobre una conexión persistente por event loop.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.host = server.host
+        self.port = server.ssh_port
+        self.user = server.ssh_username
+        self.password = server.ssh_password
+        self.key_path = None
+        self.command_path = "/usr/local/bin/manage_client"
+
+    async def _connect(self) -> asyncssh.SSHClientConnection:
+        connect_kwargs = {
+            'host': self.host,
+            'port': self.port,
+            'username': self.user,
+            'known_hosts': None,
+            'connect_timeout': settings.CLIENT_SSH_TIMEOUT,
+            'keepalive_interval': settings.CLIENT_SSH_KEEPALIVE,
+        }
+
+        if self.key_path:
+            connect_kwargs['client_keys'] = [self.key_path]
+        elif self.password:
+            connect_kwargs['password'] = self.password
+        else:
+            raise SSHException("No se han configurado credenciales SSH (Password o Key)")
+
+        try:
+            started = time.perf_counter()
+            conn = await asyncssh.connect(**connect_kwargs)
+            metrics.observe_ssh_connect(self.server, time.perf_counter() - started)
+            return conn
+        except (OSError, asyncssh.Error) as e:
+            logger.error(f"Error conectando por SSH: {str(e)}")
+            raise SSHTransportError(f"Error de conexión SSH: {str(e)}")
+
+    async def _get_connection(self) -> asyncssh.SSHClientConnection:
+        key = (self.host, self.port, self.user, asyncio.get_running_loop())
+        with _connections_lock:
+            conn = _connections.get(key)
+        if conn is not None and not conn.is_closed():
+            return conn
+
+        conn = await self._connect()
+        with _connections_lock:
+            previous = _connections.get(key)
+            if previous is not None and not previous.is_closed():
+                # Otra corrutina conectó primero: reutilizar la suya
+                conn.close()
+                return previous
+            _connections[key] = conn
+        return conn
+
+    async def _discard_connection(self) -> None:
+        key = (self.host, self.port, self.user, asyncio.get_running_loop())
+        with _connections_lock:
+            conn = _connections.pop(key, None)
+        if conn is not None:
+            conn.close()
+
+    async def _run_command(self, args: List[str]) -> Dict[str, Any]:
+        """
+        Ejecuta manage_client con los argumentos dados sin bloquear el event loop.
+        Retorna el mismo formato que ClientSSHService._run_command.
+        """
+        safe_args = [shlex.quote(str(arg)) for arg in args]
+        full_command = f"{self.command_path} {' '.join(safe_args)}"
+        action = str(args[0])
+        logger.info(f"Ejecutando SSH: {full_command}")
+
+        async def execute(timeout):
+            for attempt in range(2):
+                conn = await self._get_connection()
+                try:
+                    started = time.perf_counter()
+                    result = await asyncio.wait_for(conn.run(full_command, check=False), timeout)
+                    metrics.observe_ssh_exec(self.server, action, time.perf_counter() - started)
+                    return result
+                except asyncssh.ChannelOpenError:
+                    # Conexión caída entre usos: reconectar una sola vez
+                    await self._discard_connection()
+                    if attempt:
+                        raise SSHTransportError("No se pudo abrir un canal SSH")
+                except (OSError, asyncssh.Error, asyncio.TimeoutError) as e:
+                    await self._discard_connection()
+                    raise SSHTransportError(f"Error inesperado: {str(e)}")
+
+        try:
+            async with metrics.atrack('ssh', self.server, action) as call:
+                result = await resilience.acall(
+                    self.server, action, execute, (SSHTransportError,), settings.CLIENT_SSH_COMMAND_TIMEOUT
+                )
+                if result.exit_status != 0:
+                    call.fail(f"exit {result.exit_status}")
+        except resilience.CircuitOpenError:
+            raise SSHException(f"Servidor {self.host} no disponible temporalmente")
+
+        output = (result.stdout or '').strip()
+        error = (result.stderr or '').strip()
+
+        if result.exit_status != 0:
+            logger.error(f"Error SSH ({result.exit_status}): {error}")
+            raise SSHException(f"Error ejecutando comando: {error or output}")
+
+        logger.debug(f"Resultado SSH: {output}")
+        return {
+            "status": "success",
+            "message": output,
+            "data": {"output": output}
+        }
+
+    # ============================
+    # IMPLEMENTACIÓN DE MÉTODOS
+    # ============================
+
+    async def create_client(self, client_name: str, ports: List[int]) -> Dict[str, Any]:
+        """manage_client create <name> <p1> <p2> ..."""
+        return await self._run_command(["create", client_name] + ports)
+
+    async def delete_client(self, client_name: str) -> Dict[str, Any]:
+        """manage_client delete <name>"""
+        return await self._run_command(["delete", client_name])
+
+    async def start_client(self, client_name: str) -> Dict[str, Any]:
+        """manage_client start <name>"""
+        return await self._run_command(["start", client_name])
+
+    async def stop_client(self, client_name: str) -> Dict[str, Any]:
+        """manage_client stop <name>"""
+        return await self._run_command(["stop", client_name])
+
+    async def restart_client(self, client_name: str) -> Dict[str, Any]:
+        """manage_client restart <name>"""
+        return await self._run_command(["restart", client_name])
+
+    async def restart_port(self, client_name: str, port: int) -> Dict[str, Any]:
+        """manage_client restart-port <name> <port>"""
+        return await self._run_command(["restart-port", client_name, port])
+
+    async def extend_client(self, client_name: str, ports: List[int]) -> Dict[str, Any]:
+        """manage_client extend <name> <p1> <p2> ..."""
+        return await self._run_command(["extend", client_name] + ports)
+
+    async def list_clients(self) -> Dict[str, Any]:
+        """manage_client list --json"""
+        response = await self._run_command(["list", "--json"])
+        try:
+            response["data"] = json.loads(response["message"] or "{}")
+        except ValueError:
+            raise SSHException("Respuesta inválida de manage_client list")
+        return response
+
+
+def get_async_ssh_service(server) -> AsyncClientSSHService:
+    return AsyncClientSSHService(server)
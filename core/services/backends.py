@@ -0,0 +1,123 @@
+"""
+Backends remotos de los servidores: una interfaz común y un registro por transporte.
+
+Cada Server elige en `transport` cómo se gestionan sus clientes (API REST, REST agrupada
+en lotes, SSH...). CLIENT_BACKENDS asocia cada transporte a su clase síncrona y asíncrona,
+así un servidor cambia de transporte desde el admin sin tocar el código que lo usa:
+
+    backends.get_backend(server).restart_client('cliente1')
+    await backends.get_async_backend(server).restart_client('cliente1')
+
+Las instancias se cachean por servidor y se reconstruyen si cambian sus datos de conexión.
+El pool de conexiones, los timeouts, la resiliencia y las métricas siguen en cada servicio.
+"""
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class ClientBackend(ABC):
+    """
+    Operaciones sobre los clientes de un servidor. Todas retornan
+    {"status", "message", "data"} y lanzan la excepción propia del transporte si fallan.
+    Las variantes asíncronas exponen los mismos métodos como corrutinas.
+    """
+
+    def __init__(self, server):
+        self.server = server
+
+    @abstractmethod
+    def create_client(self, client_name: str, ports: List[int]) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def delete_client(self, client_name: str) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def start_client(self, client_name: str) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def stop_client(self, client_name: str) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def restart_client(self, client_name: str) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def restart_port(self, client_name: str, port: int) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def extend_client(self, client_name: str, ports: List[int]) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def list_clients(self) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def batch(self):
+        """Lote de operaciones (BaseClientBatch) enviado en una sola llamada remota"""
+
+
+class UnknownTransport(Exception):
+    """El servidor usa un transporte que no está en CLIENT_BACKENDS"""
+    pass
+
+
+# Instancias por servidor: (server.pk, 'sync' | 'async') -> (datos de conexión, backend)
+_instances: Dict[Tuple[Any, str], Tuple[Tuple, Any]] = {}
+_instances_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_backend_class(transport: str, mode: str = 'sync'):
+    """Clase registrada para el transporte ('sync' o 'async')"""
+    try:
+        return import_string(settings.CLIENT_BACKENDS[transport][mode])
+    except KeyError:
+        raise UnknownTransport(f"Transporte desconocido: {transport}")
+
+
+def transports() -> List[str]:
+    return list(settings.CLIENT_BACKENDS)
+
+
+def _connection_key(server) -> Tuple:
+    return tuple(getattr(server, name, None) for name in server.CONNECTION_FIELDS)
+
+
+def _get(server, mode: str):
+    key = (server.pk, mode)
+    connection = _connection_key(server)
+    with _instances_lock:
+        cached = _instances.get(key)
+        if cached is not None and cached[0] == connection:
+            return cached[1]
+        backend = get_backend_class(server.transport, mode)(server)
+        _instances[key] = (connection, backend)
+    return backend
+
+
+def get_backend(server) -> ClientBackend:
+    """Backend síncrono del servidor según su transporte, compartido entre hilos"""
+    return _get(server, 'sync')
+
+
+def get_async_backend(server):
+    """Backend asíncrono del servidor según su transporte"""
+    return _get(server, 'async')
+
+
+def invalidate(server_pk) -> None:
+    """Descarta los backends cacheados de un servidor (p. ej. al editarlo o eliminarlo)"""
+    with _instances_lock:
+        for key in [k for k in _instances if k[0] == server_pk]:
+            del _instances[key]
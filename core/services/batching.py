@@ -0,0 +1,161 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class BatchResult:
+    """
+    Resultado diferido de una operación encolada en un lote.
+    Se resuelve cuando el lote se envía al servidor.
+    """
+
+    def __init__(self, operation: Dict[str, Any]):
+        self.operation = operation
+        self._done = False
+        self._response = None
+        self._error = None
+
+    def set_response(self, response: Dict[str, Any]) -> None:
+        self._response = response
+        self._done = True
+
+    def set_error(self, error: Exception) -> None:
+        self._error = error
+        self._done = True
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def ok(self) -> bool:
+        return self._done and self._error is None
+
+    @property
+    def error(self):
+        return self._error
+
+    def get(self) -> Dict[str, Any]:
+        """Retorna la respuesta de la operación o relanza su error"""
+        if not self._done:
+            raise RuntimeError("El lote todavía no se ha enviado")
+        if self._error is not None:
+            raise self._error
+        return self._response
+
+
+class BaseClientBatch(ABC):
+    """
+    Acumula operaciones de clientes para un mismo servidor y las envía juntas.
+    Expone los mismos métodos que los servicios; cada uno retorna un BatchResult.
+
+    Uso:
+        with service.batch() as batch:
+            a = batch.restart_client('cliente1')
+            b = batch.restart_port('cliente2', 9001)
+        a.get(), b.get()
+    """
+
+    # Acción de una operación -> método del servicio, para enviarlas una a una
+    METHODS = {
+        'create': 'create_client',
+        'delete': 'delete_client',
+        'start': 'start_client',
+        'stop': 'stop_client',
+        'restart': 'restart_client',
+        'restart-port': 'restart_port',
+        'extend': 'extend_client',
+    }
+
+    def __init__(self, service):
+        self.service = service
+        self._pending: List[BatchResult] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _queue(self, action: str, client_name: str, **extra) -> BatchResult:
+        result = BatchResult({'action': action, 'client': client_name, **extra})
+        self._pending.append(result)
+        return result
+
+    def _send_each(self, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Envía las operaciones una a una con el servicio, para servidores sin endpoint de lotes"""
+        outcomes = []
+        for operation in operations:
+            args = [operation['client']]
+            if 'port' in operation:
+                args.append(operation['port'])
+            if 'ports' in operation:
+                args.append(operation['ports'])
+            try:
+                outcomes.append({'ok': True, 'response': getattr(self.service, self.METHODS[operation['action']])(*args)})
+            except Exception as e:
+                outcomes.append({'ok': False, 'error': e})
+        return outcomes
+
+    @abstractmethod
+    def _send(self, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Envía las operaciones en una sola llamada remota.
+        Debe retornar un dict por operación, en orden, con 'ok' y 'response' o 'error'.
+        """
+
+    def flush(self) -> List[BatchResult]:
+        """Envía las operaciones pendientes y resuelve sus BatchResult"""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return []
+
+        try:
+            outcomes = self._send([result.operation for result in pending])
+        except Exception as e:
+            # Fallo de la llamada completa: todas las operaciones comparten el error
+            for result in pending:
+                result.set_error(e)
+            return pending
+
+        for result, outcome in zip(pending, outcomes):
+            if outcome['ok']:
+                result.set_response(outcome['response'])
+            else:
+                result.set_error(outcome['error'])
+        for result in pending[len(outcomes):]:
+            result.set_error(RuntimeError("El servidor no devolvió resultado para la operación"))
+
+        return pending
+
+    # ============================
+    # OPERACIONES ENCOLABLES
+    # ============================
+
+    def create_client(self, client_name: str, ports: List[int]) -> BatchResult:
+        return self._queue('create', client_name, ports=ports)
+
+    def delete_client(self, client_name: str) -> BatchResult:
+        return self._queue('delete', client_name)
+
+    def start_client(self, client_name: str) -> BatchResult:
+        return self._queue('start', client_name)
+
+    def stop_client(self, client_name: str) -> BatchResult:
+        return self._queue('stop', client_name)
+
+    def restart_client(self, client_name: str) -> BatchResult:
+        return self._queue('restart', client_name)
+
+    def restart_port(self, client_name: str, port: int) -> BatchResult:
+        return self._queue('restart-port', client_name, port=port)
+
+    def extend_client(self, client_name: str, ports: List[int]) -> BatchResult:
+        return self._queue('extend', client_name, ports=ports)
@@ -0,0 +1,179 @@
+import contextvars
+import logging
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from django.conf import settings
+
+from core.services import backends
+
+logger = logging.getLogger(__name__)
+
+# Acciones masivas permitidas -> método del servicio
+BULK_ACTIONS = {
+    'start': 'start_client',
+    'stop': 'stop_client',
+    'restart': 'restart_client',
+}
+
+
+def run_per_server(tasks: Iterable[Tuple[Any, Callable[[], Any]]],
+                   max_workers: int = None,
+                   per_server_limit: int = None) -> List[Dict[str, Any]]:
+    """
+    Ejecuta tareas remotas en paralelo con concurrencia acotada.
+
+    Args:
+        tasks: pares (server, función sin argumentos)
+        max_workers: hilos totales (por defecto CLIENT_BULK_MAX_WORKERS)
+        per_server_limit: tareas simultáneas por servidor (por defecto CLIENT_BULK_PER_SERVER)
+
+    Returns:
+        list: un dict por tarea, en el mismo orden, con 'ok' y 'result' o 'error'
+    """
+    tasks = list(tasks)
+    results = [None] * len(tasks)
+    for index, outcome in iter_per_server(tasks, max_workers, per_server_limit):
+        results[index] = outcome
+    return results
+
+
+def iter_per_server(tasks: Iterable[Tuple[Any, Callable[[], Any]]],
+                    max_workers: int = None,
+                    per_server_limit: int = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Igual que run_per_server, pero entrega (índice de la tarea, resultado)
+    a medida que cada tarea termina, para informar progreso.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return
+
+    max_workers = max_workers or settings.CLIENT_BULK_MAX_WORKERS
+    per_server_limit = per_server_limit or settings.CLIENT_BULK_PER_SERVER
+    # Cola de tareas por servidor: solo hay `per_server_limit` enviadas al pool a la vez, y cada
+    # una que termina envía la siguiente de su servidor. Así ningún hilo queda bloqueado esperando
+    # a un servidor lento mientras otros servidores tienen trabajo. Los envíos se hacen desde este
+    # bucle, no desde los hilos del pool: el executor sigue abierto mientras se consume.
+    queued: Dict[Any, deque] = {}
+    for index, (server, _) in enumerate(tasks):
+        queued.setdefault(server.pk, deque()).append(index)
+    finished = queue.SimpleQueue()
+    # Cada tarea hereda el contexto de quien la lanza (p. ej. el perfil de la petición)
+    context = contextvars.copy_context()
+
+    def _run(index):
+        server, fn = tasks[index]
+        try:
+            outcome = {'ok': True, 'result': fn()}
+        except Exception as e:
+            logger.warning(f"Tarea remota fallida en {server.host}: {e}")
+            outcome = {'ok': False, 'error': e}
+        finished.put((index, outcome))
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+        for pending in queued.values():
+            for _ in range(min(per_server_limit, len(pending))):
+                executor.submit(context.copy().run, _run, pending.popleft())
+        # Si quien consume abandona la iteración no se envían más tareas
+        for _ in range(len(tasks)):
+            index, outcome = finished.get()
+            pending = queued[tasks[index][0].pk]
+            if pending:
+                executor.submit(context.copy().run, _run, pending.popleft())
+            yield index, outcome
+
+
+def bulk_client_action(clients: Iterable, action: str) -> List[Dict[str, Any]]:
+    """
+    Ejecuta start/stop/restart sobre varios clientes a la vez.
+
+    Args:
+        clients: usuarios cliente (con server cargado vía select_related)
+        action: 'start', 'stop' o 'restart'
+
+    Returns:
+        list: resultado por cliente con 'client', 'server', 'status' y 'message'
+    """
+    if action not in BULK_ACTIONS:
+        raise ValueError(f"Acción desconocida: {action}")
+
+    results = []
+    by_server = {}
+    for client in clients:
+        if not client.server:
+            results.append({
+                'client': client.username,
+                'server': None,
+                'status': 'skipped',
+                'message': 'Sin servidor asignado',
+            })
+            continue
+        by_server.setdefault(client.server.pk, (client.server, []))[1].append(client)
+
+    if settings.CLIENT_API_BATCH_ENABLED:
+        outcomes = _run_batched(by_server.values(), action)
+    else:
+        outcomes = _run_individually(by_server.values(), action)
+
+    for client, server, outcome in outcomes:
+        if outcome['ok']:
+            results.append({
+                'client': client.username,
+                'server': server.host,
+                'status': 'success',
+                'message': outcome['result'].get('message', ''),
+            })
+        else:
+            results.append({
+                'client': client.username,
+                'server': server.host,
+                'status': 'error',
+                'message': str(outcome['error']),
+            })
+
+    return results
+
+
+def _run_individually(groups, action):
+    """Una petición por cliente, en paralelo y acotada por servidor"""
+    tasks = []
+    for server, clients in groups:
+        service = backends.get_backend(server)
+        method = getattr(service, BULK_ACTIONS[action])
+        for client in clients:
+            tasks.append((client, server, lambda method=method, name=client.username: method(name)))
+
+    outcomes = run_per_server((server, fn) for _, server, fn in tasks)
+    return [(client, server, outcome) for (client, server, _), outcome in zip(tasks, outcomes)]
+
+
+def _run_batched(groups, action):
+    """Un lote por servidor; los servidores se procesan en paralelo"""
+    groups = list(groups)
+
+    def _flush(server, clients):
+        batch = backends.get_backend(server).batch()
+        pending = [getattr(batch, BULK_ACTIONS[action])(client.username) for client in clients]
+        batch.flush()
+        return pending
+
+    outcomes = run_per_server(
+        (server, lambda server=server, clients=clients: _flush(server, clients))
+        for server, clients in groups
+    )
+
+    results = []
+    for (server, clients), outcome in zip(groups, outcomes):
+        for index, client in enumerate(clients):
+            if not outcome['ok']:
+                results.append((client, server, outcome))
+                continue
+            pending = outcome['result'][index]
+            if pending.ok:
+                results.append((client, server, {'ok': True, 'result': pending.get()}))
+            else:
+                results.append((client, server, {'ok': False, 'error': pending.error}))
+    return results
@@ -0,0 +1,235 @@
+"""
+Alta masiva de clientes desde CSV o JSON.
+
+Cada fila trae (username, server, num_ports[, password]). `server` es el id del servidor,
+su host si no hay otro con el mismo, o "host (inicial-final)" como se muestra en el admin.
+Por servidor se hace una sola transacción: usuarios con bulk_create, puertos con un INSERT
+masivo y tareas de creación remota en la cola; si falla, las filas de ese servidor se reintentan
+de a una y solo se rechazan las que no caben. Después las tareas se ejecutan en paralelo
+(acotado por servidor) y el progreso se entrega como una secuencia de eventos.
+"""
+import csv
+import json
+import logging
+import secrets
+import time
+from typing import Any, Dict, Iterable, Iterator, List
+
+from django.db import connection, transaction
+
+from core import cache
+from core.models import Job, Server, User
+from core.services import bulk_actions, jobs, passwords, port_allocator
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'json')
+
+
+class BulkImportError(ValueError):
+    """El archivo no se puede leer como CSV o JSON de clientes"""
+    pass
+
+
+def detect_format(filename: str) -> str:
+    return 'json' if filename.lower().endswith('.json') else 'csv'
+
+
+def parse_rows(stream, fmt: str) -> List[Dict[str, Any]]:
+    """
+    Lee las filas de un stream de texto sin validarlas.
+    CSV: cabecera username,server,num_ports[,password]. JSON: lista de objetos con esas claves.
+    """
+    if fmt not in FORMATS:
+        raise BulkImportError(f"Formato no soportado: {fmt}")
+
+    try:
+        if fmt == 'json':
+            records = json.load(stream)
+            if isinstance(records, dict):
+                records = records.get('clients', [])
+            if not isinstance(records, list):
+                raise BulkImportError("El JSON debe ser una lista de clientes")
+        else:
+            records = list(csv.DictReader(stream))
+    except (ValueError, csv.Error) as e:
+        raise BulkImportError(f"Archivo inválido: {e}")
+
+    return [
+        {
+            'line': line,
+            'username': str(record.get('username') or '').strip(),
+            'server': str(record.get('server') or '').strip(),
+            'num_ports': record.get('num_ports'),
+            'password': record.get('password') or '',
+        }
+        for line, record in enumerate(records, start=1)
+        if isinstance(record, dict)
+    ]
+
+
+def _validate(rows: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Completa cada fila con su Server y cantidad de puertos, o le asigna 'error'.
+    Servidores y usuarios existentes se resuelven con una consulta cada uno.
+    """
+    servers = {}
+    ambiguous = set()
+    for server in Server.objects.all():
+        servers[str(server.pk)] = server
+        servers[str(server)] = server
+        # El host no es único: si se repite solo sirven el id o "host (inicial-final)"
+        if server.host in servers:
+            ambiguous.add(server.host)
+        servers[server.host] = server
+    for host in ambiguous:
+        del servers[host]
+
+    existing = set(
+        User.objects.filter(username__in=[row['username'] for row in rows]).values_list('username', flat=True)
+    )
+    seen = set()
+
+    for row in rows:
+        username = row['username']
+        server = servers.get(row['server'])
+        try:
+            num_ports = int(row['num_ports'])
+        except (TypeError, ValueError):
+            num_ports = 0
+
+        if not username:
+            row['error'] = "Falta el nombre de usuario"
+        elif username in existing or username in seen:
+            row['error'] = "Este nombre de usuario ya está en uso."
+        elif row['server'] in ambiguous:
+            row['error'] = f"Hay varios servidores con el host {row['server']}: indicar su id o \"host (inicial-final)\""
+        elif server is None:
+            row['error'] = f"Servidor desconocido: {row['server'] or '(vacío)'}"
+        elif num_ports < 1:
+            row['error'] = "num_ports debe ser un entero mayor que 0"
+        else:
+            row['server'] = server
+            row['num_ports'] = num_ports
+        seen.add(username)
+        yield row
+
+
+def _hash_passwords(rows: List[Dict[str, Any]]) -> None:
+    """
+    Hashea las contraseñas (en paralelo, en un pool de procesos) antes de abrir las transacciones.
+    Las filas sin contraseña reciben una aleatoria que se informa en el progreso.
+    """
+    for row in rows:
+        if not row['password']:
+            row['password'] = row['generated_password'] = secrets.token_urlsafe(9)
+    hashes = passwords.hash_client_passwords([row['password'] for row in rows])
+    for row, password_hash in zip(rows, hashes):
+        row['password_hash'] = password_hash
+
+
+def _provision_server(server: Server, rows: List[Dict[str, Any]], contiguous: bool) -> List[Job]:
+    """Usuarios, puertos y tareas remotas de un servidor en una sola transacción"""
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(username=row['username'], password=row['password_hash'], role='client', server=server)
+                for row in rows
+            )
+            allocations = port_allocator.allocate_batch(
+                server, [(user, row['num_ports']) for user, row in zip(users, rows)], contiguous
+            )
+            created_jobs = jobs.enqueue_many(
+                Job.ACTION_CREATE, server, [(user, {'ports': ports}) for user, ports in zip(users, allocations)]
+            )
+            # bulk_create no emite post_save
+            cache.bump_version('clients')
+    except Exception:
+        # La transacción se revirtió: el bitmap en memoria ya no refleja la BD
+        port_allocator.invalidate(server.pk)
+        raise
+
+    for row, ports in zip(rows, allocations):
+        row['ports'] = ports
+    return created_jobs
+
+
+def _run_job_inline(pk):
+    """Ejecuta una tarea en este proceso salvo que un worker ya la haya tomado"""
+    try:
+        job = jobs.claim(pk, jobs.make_worker_id('import'))
+        if job is None:
+            return None
+        jobs.run_job(job)
+        return job
+    finally:
+        connection.close()
+
+
+def import_clients(rows: Iterable[Dict[str, Any]], contiguous: bool = False,
+                   remote: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Da de alta los clientes y entrega eventos de progreso:
+
+    - error: fila rechazada (validación o falta de puertos en el servidor)
+    - created: usuario y puertos guardados (incluye la contraseña si se generó)
+    - provisioned: resultado de la creación remota ('ok' o 'queued' si queda para los workers)
+    - done: resumen final
+
+    Con remote=False las tareas quedan en la cola para `run_jobs`.
+    """
+    started = time.monotonic()
+    summary = {'created': 0, 'provisioned': 0, 'queued': 0, 'errors': 0}
+
+    by_server: Dict[int, List[Dict[str, Any]]] = {}
+    for row in _validate(list(rows)):
+        if 'error' in row:
+            summary['errors'] += 1
+            yield {'event': 'error', 'line': row['line'], 'username': row['username'], 'message': row['error']}
+            continue
+        by_server.setdefault(row['server'].pk, []).append(row)
+
+    _hash_passwords([row for server_rows in by_server.values() for row in server_rows])
+
+    pending = []
+    for server_rows in by_server.values():
+        server = server_rows[0]['server']
+        try:
+            provisioned = list(zip(server_rows, _provision_server(server, server_rows, contiguous)))
+        except Exception as e:
+            # Alguna fila no cabe (o choca con otra alta): se reintentan de a una
+            logger.warning(f"Importación en bloque fallida en {server.host}, se procesa fila a fila: {e}")
+            provisioned = []
+            for row in server_rows:
+                try:
+                    provisioned.extend(zip([row], _provision_server(server, [row], contiguous)))
+                except Exception as row_error:
+                    summary['errors'] += 1
+                    yield {'event': 'error', 'line': row['line'], 'username': row['username'], 'message': str(row_error)}
+
+        for row, job in provisioned:
+            summary['created'] += 1
+            event = {'event': 'created', 'username': row['username'], 'server': server.host, 'ports': row['ports']}
+            if 'generated_password' in row:
+                event['password'] = row['generated_password']
+            yield event
+            pending.append((server, row['username'], job.pk))
+
+    if remote:
+        tasks = [(server, lambda pk=pk: _run_job_inline(pk)) for server, _, pk in pending]
+        for index, outcome in bulk_actions.iter_per_server(tasks):
+            server, username, _ = pending[index]
+            job = outcome.get('result')
+            if outcome['ok'] and job is not None and job.status == Job.STATUS_DONE:
+                summary['provisioned'] += 1
+                yield {'event': 'provisioned', 'username': username, 'server': server.host, 'status': 'ok'}
+            else:
+                summary['queued'] += 1
+                message = job.last_error if job is not None else str(outcome.get('error', 'Tomada por un worker'))
+                yield {'event': 'provisioned', 'username': username, 'server': server.host,
+                       'status': 'queued', 'message': message}
+    else:
+        summary['queued'] += len(pending)
+
+    summary['elapsed'] = round(time.monotonic() - started, 2)
+    yield {'event': 'done', **summary}
@@ -1,49 +1,122 @@
 import requests
 import logging
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Tuple
+
+from django.conf import settings
+from requests.adapters import HTTPAdapter
 
 from core.models import Server
+from core.services import metrics, resilience
+from core.services.backends import ClientBackend
+from core.services.batching import BaseClientBatch, BatchResult
 
 logger = logging.getLogger(__name__)
 
+# Sesiones HTTP compartidas por servidor: (server.pk, api_key) -> requests.Session
+_sessions: Dict[Tuple[Any, str], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
 
 class APIException(Exception):
     """Excepción para errores de API"""
     pass
 
 
-class ClientAPIService:
+class _ServerError(Exception):
+    """Respuesta 5xx: cuenta como fallo del servidor para el circuit breaker"""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+# Errores que indican un servidor caído o saturado (se reintentan si la acción es idempotente)
+TRANSIENT_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, _ServerError)
+
+
+def _build_session(api_key: str) -> requests.Session:
+    """Crea una sesión con pool de conexiones keep-alive hacia un servidor"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=settings.CLIENT_API_POOL_CONNECTIONS,
+        pool_maxsize=settings.CLIENT_API_POOL_MAXSIZE,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'X-API-Key': api_key,
+        'Content-Type': 'application/json',
+        'User-Agent': 'TuApp/1.0',
+        'Connection': 'keep-alive',
+    })
+    return session
+
+
+def get_session(server: Server) -> requests.Session:
+    """
+    Retorna la sesión HTTP compartida del servidor.
+    Se reutiliza entre peticiones para evitar el handshake TCP/TLS en cada acción.
+    """
+    api_key = getattr(server, 'api_key', 'super_secret_key')
+    key = (server.pk, api_key)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _build_session(api_key)
+            _sessions[key] = session
+    return session
+
+
+def invalidate_sessions(server_pk) -> None:
+    """Cierra y descarta las sesiones de un servidor (p. ej. al editar host o api_key)"""
+    with _sessions_lock:
+        keys = [key for key in _sessions if key[0] == server_pk]
+        sessions = [_sessions.pop(key) for key in keys]
+    for session in sessions:
+        session.close()
+
+
+class ClientAPIService(ClientBackend):
     """
     Servicio para gestionar clientes mediante API REST.
     """
 
     def __init__(self, server: Server):
-        self.server = server
+        super().__init__(server)
         self.base_url = f"https://{server.host}/api"
         self.api_key = getattr(server, 'api_key', 'super_secret_key')
-        self.timeout = 30
+        self.timeout = settings.CLIENT_API_TIMEOUT
+        self.session = get_session(server)
 
-    def _make_request(self, method: str, endpoint: str, data: dict = None) -> Dict[str, Any]:
+    def _make_request(self, method: str, endpoint: str, data: dict = None, action: str = None) -> Dict[str, Any]:
         """
         Realiza una petición HTTP a la API.
         Retorna un diccionario similar al SSH para mantener consistencia.
+        `action` identifica la operación para el timeout adaptativo y los reintentos.
         """
         url = f"{self.base_url}{endpoint}"
-        headers = {
-            'X-API-Key': self.api_key,
-            'Content-Type': 'application/json',
-            'User-Agent': 'TuApp/1.0',
-        }
 
-        print(url)
-        try:
-            response = requests.request(
+        def send(timeout):
+            response = self.session.request(
                 method=method,
                 url=url,
                 json=data,
-                headers=headers,
-                timeout=self.timeout
+                timeout=timeout
             )
+            if response.status_code >= 500:
+                raise _ServerError(response)
+            return response
+
+        logger.debug(f"{method} {url}")
+        try:
+            with metrics.track('api', self.server, action or method) as call:
+                try:
+                    response = resilience.call(self.server, action or method, send, TRANSIENT_ERRORS, self.timeout)
+                except _ServerError as e:
+                    response = e.response
+                if not response.ok:
+                    call.fail(f"HTTP {response.status_code}")
 
             if response.status_code == 401:
                 raise APIException("API Key inválida")
@@ -53,8 +126,7 @@ class ClientAPIService:
                 try:
                     error_data = response.json()
                     error_detail = error_data.get('detail', error_detail)
-                except Exception as e:
-                    print(e)
+                except Exception:
                     error_detail = response.text or f"HTTP {response.status_code}"
 
                 raise APIException(f"Error en API: {error_detail}")
@@ -68,12 +140,13 @@ class ClientAPIService:
                 "data": api_response
             }
 
+        except resilience.CircuitOpenError:
+            raise APIException(f"Servidor {self.server.host} no disponible temporalmente")
         except requests.exceptions.ConnectionError as e:
             raise APIException(f"No se pudo conectar a la API: {e}")
         except requests.exceptions.Timeout:
             raise APIException("Timeout conectando a la API")
-        except APIException as e:
-            print(e)
+        except APIException:
             raise
         except Exception as e:
             raise APIException(f"Error inesperado: {str(e)}")
@@ -91,42 +164,42 @@ class ClientAPIService:
             'client': client_name,
             'ports': ports
         }
-        return self._make_request('POST', '/clients/create', data)
+        return self._make_request('POST', '/clients/create', data, action='create')
 
     def delete_client(self, client_name: str) -> Dict[str, Any]:
         """
         ELIMINAR CLIENTE
         DELETE /clients/{client_name}
         """
-        return self._make_request('DELETE', f'/clients/{client_name}')
+        return self._make_request('DELETE', f'/clients/{client_name}', action='delete')
 
     def start_client(self, client_name: str) -> Dict[str, Any]:
         """
         INICIAR CLIENTE
         POST /clients/{client_name}/start
         """
-        return self._make_request('POST', f'/clients/{client_name}/start')
+        return self._make_request('POST', f'/clients/{client_name}/start', action='start')
 
     def stop_client(self, client_name: str) -> Dict[str, Any]:
         """
         DETENER CLIENTE
         POST /clients/{client_name}/stop
         """
-        return self._make_request('POST', f'/clients/{client_name}/stop')
+        return self._make_request('POST', f'/clients/{client_name}/stop', action='stop')
 
     def restart_client(self, client_name: str) -> Dict[str, Any]:
         """
         REINICIAR CLIENTE
         POST /clients/{client_name}/restart
         """
-        return self._make_request('POST', f'/clients/{client_name}/restart')
+        return self._make_request('POST', f'/clients/{client_name}/restart', action='restart')
 
     def restart_port(self, client_name: str, port: int) -> Dict[str, Any]:
         """
         REINICIAR PUERTO ESPECIFICO
         POST /clients/{client_name}/ports/{port}/restart
         """
-        return self._make_request('POST', f'/clients/{client_name}/ports/{port}/restart')
+        return self._make_request('POST', f'/clients/{client_name}/ports/{port}/restart', action='restart-port')
 
     def extend_client(self, client_name: str, ports: List[int]) -> Dict[str, Any]:
         """
@@ -134,7 +207,143 @@ class ClientAPIService:
         POST /clients/{client_name}/extend
         """
         data = {'ports': ports}
-        return self._make_request('POST', f'/clients/{client_name}/extend', data)
+        return self._make_request('POST', f'/clients/{client_name}/extend', data, action='extend')
+
+    def list_clients(self) -> Dict[str, Any]:
+        """
+        LISTAR CLIENTES Y ESTADO
+        GET /clients
+        """
+        return self._make_request('GET', '/clients', action='list')
+
+    def batch(self) -> 'ClientAPIBatch':
+        """Retorna un lote para enviar varias operaciones en una sola petición"""
+        return ClientAPIBatch(self)
+
+
+class ClientAPIBatch(BaseClientBatch):
+    """
+    Lote de operaciones enviado como una sola petición.
+    POST /clients/batch  {"operations": [{"action": ..., "client": ..., ...}, ...]}
+    La API responde {"results": [...]} en el mismo orden que las operaciones.
+    Si el servidor no tiene `supports_batch`, las operaciones se envían una a una.
+    """
+
+    def _send(self, operations):
+        if not self.service.server.supports_batch:
+            return self._send_each(operations)
+
+        response = self.service._make_request('POST', '/clients/batch', {'operations': operations}, action='batch')
+        results = response['data'].get('results', [])
+        if len(results) != len(operations):
+            # Sin correspondencia fiable entre resultados y operaciones, no se atribuye ninguno
+            raise APIException(f"El lote devolvió {len(results)} resultados para {len(operations)} operaciones")
+        outcomes = []
+        for item in results:
+            if item.get('success', True):
+                outcomes.append({
+                    'ok': True,
+                    'response': {
+                        "status": "success",
+                        "message": item.get('message', 'Operación completada'),
+                        "data": item,
+                    },
+                })
+            else:
+                detail = item.get('detail') or item.get('message') or "Error desconocido"
+                outcomes.append({'ok': False, 'error': APIException(f"Error en API: {detail}")})
+        return outcomes
+
+
+class LegacyClientAPIService(ClientAPIService):
+    """
+    Versión antigua de la API (srv4): reinicia puertos en /clients/{cliente}/restart-port/{puerto}.
+    El resto de rutas coincide con la actual.
+    """
+
+    def restart_port(self, client_name: str, port: int) -> Dict[str, Any]:
+        """
+        REINICIAR PUERTO ESPECIFICO
+        POST /clients/{client_name}/restart-port/{port}
+        """
+        return self._make_request('POST', f'/clients/{client_name}/restart-port/{port}', action='restart-port')
+
+
+class BatchedClientAPIService(ClientAPIService):
+    """
+    API REST que agrupa las operaciones sueltas en lotes.
+    La primera operación abre un lote y, si hay otras operaciones en curso, espera hasta
+    CLIENT_BATCH_WINDOW segundos (o a que el lote se llene); las que llegan mientras tanto desde
+    otros hilos (workers, acciones masivas) viajan en la misma petición POST /clients/batch.
+    Una operación sin concurrencia se envía enseguida. Sin `supports_batch` en el servidor se
+    comporta como ClientAPIService. list_clients y los lotes explícitos (batch()) no se agrupan.
+    """
+
+    def __init__(self, server: Server):
+        super().__init__(server)
+        self._lock = threading.Lock()
+        self._open = None  # (lote abierto, evento de envío, evento de lote lleno)
+        self._in_flight = 0
+
+    def _submit(self, method: str, *args) -> Dict[str, Any]:
+        if not self.server.supports_batch:
+            return getattr(super(), method)(*args)
+
+        with self._lock:
+            self._in_flight += 1
+            leader = self._open is None
+            if leader:
+                self._open = (ClientAPIBatch(self), threading.Event(), threading.Event())
+                # Solo merece la pena esperar si hay otras operaciones en curso
+                wait = self._in_flight > 1
+            batch, sent, full = self._open
+            result: BatchResult = getattr(batch, method)(*args)
+            if len(batch) >= settings.CLIENT_BATCH_MAX_SIZE:
+                # Lote lleno: las siguientes operaciones abren otro
+                self._open = None
+                full.set()
+
+        try:
+            if leader:
+                self._send_open(batch, sent, full, wait)
+            else:
+                sent.wait()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        return result.get()
+
+    def _send_open(self, batch: ClientAPIBatch, sent: threading.Event, full: threading.Event, wait: bool) -> None:
+        if wait:
+            full.wait(settings.CLIENT_BATCH_WINDOW)
+        with self._lock:
+            if self._open is not None and self._open[0] is batch:
+                self._open = None
+        try:
+            batch.flush()
+        finally:
+            sent.set()
+
+    def create_client(self, client_name: str, ports: List[int]) -> Dict[str, Any]:
+        return self._submit('create_client', client_name, ports)
+
+    def delete_client(self, client_name: str) -> Dict[str, Any]:
+        return self._submit('delete_client', client_name)
+
+    def start_client(self, client_name: str) -> Dict[str, Any]:
+        return self._submit('start_client', client_name)
+
+    def stop_client(self, client_name: str) -> Dict[str, Any]:
+        return self._submit('stop_client', client_name)
+
+    def restart_client(self, client_name: str) -> Dict[str, Any]:
+        return self._submit('restart_client', client_name)
+
+    def restart_port(self, client_name: str, port: int) -> Dict[str, Any]:
+        return self._submit('restart_port', client_name, port)
+
+    def extend_client(self, client_name: str, ports: List[int]) -> Dict[str, Any]:
+        return self._submit('extend_client', client_name, ports)
 
 
 def get_api_service(server) -> ClientAPIService:
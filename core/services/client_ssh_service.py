@@ -1,27 +1,129 @@
 import paramiko
+import hashlib
 import logging
-from typing import List, Dict, Any
+import socket
+import threading
+import time
+from typing import List, Dict, Any, Tuple
+
+from django.conf import settings
+
+from core.services import metrics, resilience
+from core.services.backends import ClientBackend
+from core.services.batching import BaseClientBatch
 
 logger = logging.getLogger(__name__)
 
 
+class _PooledTransport:
+    """Conexión SSH autenticada que se reutiliza entre comandos"""
+
+    def __init__(self, client: paramiko.SSHClient):
+        self.client = client
+        self.transport = client.get_transport()
+        self.last_used = time.monotonic()
+
+    def is_alive(self) -> bool:
+        return self.transport is not None and self.transport.is_active()
+
+    def close(self) -> None:
+        try:
+            self.client.close()
+        except Exception:
+            logger.debug("Error cerrando conexión SSH", exc_info=True)
+
+
+# Pool de transportes por proceso: (host, puerto, usuario, huella de la contraseña) -> _PooledTransport.
+# La huella separa las credenciales: un proceso que no recibió la señal de guardado del servidor
+# (otro worker) no reutiliza un transporte autenticado con la contraseña anterior.
+_pool: Dict[Tuple[str, int, str, str], _PooledTransport] = {}
+_pool_lock = threading.Lock()
+_connect_locks: Dict[Tuple[str, int, str, str], threading.Lock] = {}
+_reaper_started = False
+
+
+def _credential_hash(password) -> str:
+    return hashlib.sha256((password or '').encode()).hexdigest()[:16]
+
+
+def _evict(keys) -> List[_PooledTransport]:
+    """Saca del pool y cierra los transportes; debe llamarse con _pool_lock tomado"""
+    entries = [_pool.pop(key) for key in keys if key in _pool]
+    for key in keys:
+        # Un lock tomado pertenece a un handshake en curso: se conserva
+        lock = _connect_locks.get(key)
+        if lock is not None and not lock.locked():
+            del _connect_locks[key]
+    return entries
+
+
+def _reap_idle_transports() -> None:
+    """Cierra los transportes inactivos o caídos del pool"""
+    now = time.monotonic()
+    with _pool_lock:
+        stale = [
+            key for key, entry in _pool.items()
+            if not entry.is_alive() or now - entry.last_used > settings.CLIENT_SSH_IDLE_TIMEOUT
+        ]
+        entries = _evict(stale)
+    for entry in entries:
+        entry.close()
+
+
+def _reaper_loop() -> None:
+    while True:
+        time.sleep(max(settings.CLIENT_SSH_IDLE_TIMEOUT / 2, 1))
+        try:
+            _reap_idle_transports()
+        except Exception:
+            logger.exception("Error cerrando transportes SSH inactivos")
+
+
+def _start_reaper() -> None:
+    """
+    Cierra periódicamente los transportes inactivos aunque el proceso deje de usar SSH
+    (un worker sin tareas no volvería a pasar por _get_transport). Debe llamarse con _pool_lock tomado.
+    """
+    global _reaper_started
+    if not _reaper_started:
+        _reaper_started = True
+        threading.Thread(target=_reaper_loop, name='ssh-reaper', daemon=True).start()
+
+
+def invalidate_connections(host: str) -> None:
+    """Cierra los transportes abiertos hacia un host (p. ej. al editar el servidor)"""
+    with _pool_lock:
+        entries = _evict([key for key in set(_pool) | set(_connect_locks) if key[0] == host])
+    for entry in entries:
+        entry.close()
+
+
 class SSHException(Exception):
     """Excepción para errores de SSH"""
     pass
 
 
-class ClientSSHService:
+class SSHTransportError(SSHException):
+    """Fallo de conexión o de transporte SSH (servidor caído o inalcanzable)"""
+    pass
+
+
+# Errores que cuentan como fallo del servidor para el circuit breaker
+TRANSIENT_ERRORS = (SSHTransportError, paramiko.SSHException, EOFError, OSError)
+
+
+class ClientSSHService(ClientBackend):
     """
     Servicio para gestionar clientes mediante comandos SSH directos.
     Comando base: /usr/local/bin/manage_client
     """
 
     def __init__(self, server):
-        self.server = server
+        super().__init__(server)
         self.host = server.host
-        self.port = getattr(server, 'ssh_port', 22)  # Default to 22 if not in model yet, but I added it
-        self.user = server.username
-        self.password = server.password
+        self.port = server.ssh_port
+        self.user = server.ssh_username
+        self.password = server.ssh_password
         self.key_path = None  # Could add this to model later
         self.command_path = "/usr/local/bin/manage_client"
 
@@ -35,7 +137,7 @@ class ClientSSHService:
                 'hostname': self.host,
                 'port': self.port,
                 'username': self.user,
-                'timeout': 10
+                'timeout': settings.CLIENT_SSH_TIMEOUT
             }
 
             if self.key_path:
@@ -47,42 +149,144 @@ class ClientSSHService:
 
             client.connect(**connect_kwargs)
             return client
+        except SSHException:
+            raise
         except Exception as e:
             logger.error(f"Error conectando por SSH: {str(e)}")
-            raise SSHException(f"Error de conexión SSH: {str(e)}")
+            raise SSHTransportError(f"Error de conexión SSH: {str(e)}")
 
-    def _run_command(self, args: List[str]) -> Dict[str, Any]:
+    def _get_transport(self) -> paramiko.Transport:
         """
-        Ejecuta el comando manage_client con los argumentos dados.
-        Retorna un diccionario similar al de la API para mantener consistencia.
+        Retorna un transporte autenticado del pool, reconectando si está caído.
+        Solo un hilo por destino realiza el handshake; el resto reutiliza el resultado.
+        """
+        _reap_idle_transports()
+        key = self._pool_key()
+
+        with _pool_lock:
+            connect_lock = _connect_locks.setdefault(key, threading.Lock())
+
+        with connect_lock:
+            with _pool_lock:
+                entry = _pool.get(key)
+            if entry is None or not entry.is_alive():
+                if entry is not None:
+                    entry.close()
+                started = time.perf_counter()
+                entry = _PooledTransport(self._get_connection())
+                metrics.observe_ssh_connect(self.server, time.perf_counter() - started)
+                entry.transport.set_keepalive(settings.CLIENT_SSH_KEEPALIVE)
+                with _pool_lock:
+                    previous = _pool.get(key)
+                    if previous is not None and previous.is_alive():
+                        # Otro hilo conectó con un lock ya podado del pool: reutilizar el suyo
+                        stale, entry = entry, previous
+                    else:
+                        stale = None
+                        _pool[key] = entry
+                        _start_reaper()
+                if stale is not None:
+                    stale.close()
+            entry.last_used = time.monotonic()
+            return entry.transport
+
+    def _pool_key(self) -> Tuple[str, int, str, str]:
+        return self.host, self.port, self.user, _credential_hash(self.password)
+
+    def _discard_transport(self) -> None:
+        with _pool_lock:
+            entry = _pool.pop(self._pool_key(), None)
+        if entry is not None:
+            entry.close()
+
+    def _exec(self, full_command: str, timeout: float = None, action: str = 'exec') -> Tuple[int, str, str]:
+        """
+        Ejecuta un comando en un canal nuevo sobre el transporte compartido.
+        Si el transporte murió entre usos se reconecta una sola vez.
+        `timeout` limita la espera de la salida del comando.
+        """
+        for attempt in range(2):
+            transport = self._get_transport()
+            try:
+                channel = transport.open_session(timeout=settings.CLIENT_SSH_TIMEOUT)
+            except (paramiko.SSHException, EOFError, OSError):
+                self._discard_transport()
+                if attempt:
+                    raise
+                continue
+
+            try:
+                started = time.perf_counter()
+                channel.settimeout(timeout)
+                channel.exec_command(full_command)
+                output, error = self._read_output(channel, timeout)
+                exit_status = channel.recv_exit_status()
+                # Tiempo del comando en el servidor, sin el handshake (ssh_connect_duration_seconds)
+                metrics.observe_ssh_exec(self.server, action, time.perf_counter() - started)
+                return exit_status, output, error
+            finally:
+                channel.close()
+
+    @staticmethod
+    def _read_output(channel, timeout: float = None) -> Tuple[str, str]:
+        """
+        Lee stdout y stderr a la vez. Leerlos uno tras otro puede bloquear: si el comando
+        llena la ventana del canal escribiendo en stderr, nunca cierra stdout.
         """
+        errors = []
+
+        def read_stderr():
+            try:
+                errors.append(channel.makefile_stderr('rb').read())
+            except Exception as e:
+                errors.append(e)
+
+        reader = threading.Thread(target=read_stderr, name='ssh-stderr', daemon=True)
+        reader.start()
+        output = channel.makefile('rb').read().decode().strip()
+        reader.join(timeout)
+        if not errors:
+            raise socket.timeout("Tiempo agotado leyendo stderr")
+        if isinstance(errors[0], Exception):
+            raise errors[0]
+        return output, errors[0].decode().strip()
+
+    def _build_command(self, args: List[str]) -> str:
         import shlex
         # Escapar argumentos para evitar problemas con espacios o caracteres especiales
         safe_args = [shlex.quote(str(arg)) for arg in args]
-        full_command = f"{self.command_path} {' '.join(safe_args)}"
-        logger.info(f"Ejecutando SSH: {full_command}")
+        return f"{self.command_path} {' '.join(safe_args)}"
 
-        client = None
+    def _call(self, action: str, full_command: str) -> Tuple[int, str, str]:
+        """Ejecuta el comando bajo el circuit breaker y los reintentos del servidor"""
         try:
-            client = self._get_connection()
-            stdin, stdout, stderr = client.exec_command(full_command)
+            with metrics.track('ssh', self.server, action) as call:
+                result = resilience.call(
+                    self.server, action, lambda timeout: self._exec(full_command, timeout, action),
+                    TRANSIENT_ERRORS, settings.CLIENT_SSH_COMMAND_TIMEOUT,
+                )
+                if result[0] != 0:
+                    call.fail(f"exit {result[0]}")
+            return result
+        except resilience.CircuitOpenError:
+            raise SSHException(f"Servidor {self.host} no disponible temporalmente")
+
+    def _run_command(self, args: List[str]) -> Dict[str, Any]:
+        """
+        Ejecuta el comando manage_client con los argumentos dados.
+        Retorna un diccionario similar al de la API para mantener consistencia.
+        """
+        full_command = self._build_command(args)
+        logger.info(f"Ejecutando SSH: {full_command}")
 
-            exit_status = stdout.channel.recv_exit_status()
-            output = stdout.read().decode().strip()
-            error = stderr.read().decode().strip()
+        try:
+            exit_status, output, error = self._call(str(args[0]), full_command)
 
             if exit_status != 0:
-                logger.error(f"Error SSH ({exit_status}): {error}")
-                print(f"DEBUG SSH ERROR: Command '{full_command}' failed with status {exit_status}")
-                print(f"STDERR: {error}")
-                print(f"STDOUT: {output}")
+                logger.error(f"Error SSH ({exit_status}) en '{full_command}': {error or output}")
                 raise SSHException(f"Error ejecutando comando: {error or output}")
 
-            # Log para debug (temporal)
-            print(f"DEBUG SSH SUCCESS: Command '{full_command}' returned status 0")
-            print(f"Remote Output: {output}")
-
-            logger.info(f"Resultado SSH: {output}")
+            logger.debug(f"Resultado SSH: {output}")
             return {
                 "status": "success",
                 "message": output,
@@ -94,9 +298,6 @@ class ClientSSHService:
         except Exception as e:
             logger.exception("Error inesperado en ejecución SSH")
             raise SSHException(f"Error inesperado: {str(e)}")
-        finally:
-            if client:
-                client.close()
 
     # ============================
     # IMPLEMENTACIÓN DE MÉTODOS
@@ -153,8 +354,72 @@ class ClientSSHService:
         args = ["extend", client_name] + ports
         return self._run_command(args)
 
-# Instancia global para uso fácil
-# Instancia factory
+    def list_clients(self) -> Dict[str, Any]:
+        """
+        LISTAR CLIENTES Y ESTADO
+        Comando: manage_client list --json
+        """
+        import json
+        response = self._run_command(["list", "--json"])
+        try:
+            response["data"] = json.loads(response["message"] or "{}")
+        except ValueError:
+            raise SSHException("Respuesta inválida de manage_client list")
+        return response
+
+    def batch(self) -> 'ClientSSHBatch':
+        """Retorna un lote para ejecutar varias operaciones en una sola invocación SSH"""
+        return ClientSSHBatch(self)
+
+
+class ClientSSHBatch(BaseClientBatch):
+    """
+    Lote de operaciones ejecutado en un solo canal SSH.
+    Cada manage_client se ejecuta en secuencia y su código de salida se marca en stdout.
+    """
+
+    MARKER = '__MANAGE_CLIENT_STATUS__'
+
+    @staticmethod
+    def _operation_args(operation: Dict[str, Any]) -> List[Any]:
+        args = [operation['action'], operation['client']]
+        if 'port' in operation:
+            args.append(operation['port'])
+        args.extend(operation.get('ports', []))
+        return args
+
+    def _send(self, operations):
+        commands = [
+            f"{self.service._build_command(self._operation_args(op))} 2>&1; printf '\\n{self.MARKER} %d\\n' $?"
+            for op in operations
+        ]
+        script = '; '.join(commands)
+        logger.info(f"Ejecutando lote SSH de {len(operations)} operaciones en {self.service.host}")
+
+        try:
+            _, output, error = self.service._call('batch', script)
+        except SSHException:
+            raise
+        except Exception as e:
+            raise SSHException(f"Error inesperado: {str(e)}")
+
+        outcomes = []
+        lines = []
+        for line in output.splitlines():
+            if not line.startswith(self.MARKER):
+                lines.append(line)
+                continue
+            status = int(line.split()[-1])
+            message = '\n'.join(lines).strip()
+            lines = []
+            if status == 0:
+                outcomes.append({
+                    'ok': True,
+                    'response': {"status": "success", "message": message, "data": {"output": message}},
+                })
+            else:
+                outcomes.append({'ok': False, 'error': SSHException(f"Error ejecutando comando: {message or error}")})
+        return outcomes
 
 
 def get_ssh_service(server) -> ClientSSHService:
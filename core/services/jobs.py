@@ -0,0 +1,262 @@
+"""
+Cola de tareas persistente en la base de datos (SQLite o Postgres, sin broker externo).
+
+Las vistas encolan la operación remota en la misma transacción que los cambios locales,
+de modo que la petición HTTP solo confirma la asignación y responde. Los workers
+(`manage.py run_jobs`) toman las tareas con un UPDATE condicional, las ejecutan contra
+el servidor y las reintentan con backoff exponencial hasta `max_attempts`.
+
+Las tareas de un mismo cliente se ejecutan de una en una y en orden de encolado: una tarea
+no se toma mientras su cliente tenga otra anterior pendiente o en ejecución. Si un intento
+falla, se consulta el listado del servidor por si la operación ya se aplicó (un timeout tras
+crear el cliente, por ejemplo) antes de reintentarla.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from core.models import Job
+from core.services import backends, status_cache
+
+logger = logging.getLogger(__name__)
+
+# Acción -> llamada al servicio remoto
+HANDLERS = {
+    Job.ACTION_CREATE: lambda service, job: service.create_client(job.client_name, job.payload['ports']),
+    Job.ACTION_DELETE: lambda service, job: service.delete_client(job.client_name),
+    Job.ACTION_EXTEND: lambda service, job: service.extend_client(job.client_name, job.payload['ports']),
+}
+
+
+def _default_key(action: str, client, server, payload: Dict[str, Any]) -> str:
+    # El pk distingue un cliente recreado con el mismo nombre; los puertos, dos extensiones distintas
+    ports = ','.join(str(port) for port in payload.get('ports', []))
+    return f"{action}:{server.pk}:{client.username}:{client.pk}:{ports}"
+
+
+def enqueue(action: str, client, server=None, payload: Optional[Dict[str, Any]] = None,
+            idempotency_key: Optional[str] = None) -> Job:
+    """
+    Encola una operación remota sobre `client` dentro de la transacción actual.
+    Si ya existe una tarea con la misma clave de idempotencia se retorna esa.
+    En eliminaciones debe llamarse antes de borrar el usuario (se usa su pk en la clave)
+    y cancela las altas y extensiones del cliente que sigan pendientes.
+    """
+    server = server or client.server
+    payload = payload or {}
+    key = idempotency_key or _default_key(action, client, server, payload)
+    if action == Job.ACTION_DELETE:
+        cancelled = Job.objects.filter(
+            server=server, client_name=client.username, status=Job.STATUS_PENDING,
+            action__in=(Job.ACTION_CREATE, Job.ACTION_EXTEND),
+        ).update(status=Job.STATUS_CANCELLED, last_error='Cancelada: el cliente se eliminó')
+        if cancelled:
+            logger.info(f"{cancelled} tareas pendientes de {client.username} canceladas por su eliminación")
+    job, created = Job.objects.get_or_create(
+        idempotency_key=key,
+        defaults={
+            'action': action,
+            'server': server,
+            'client_name': client.username,
+            'payload': payload,
+            'max_attempts': settings.JOB_MAX_ATTEMPTS,
+            'run_at': timezone.now(),
+        },
+    )
+    if not created:
+        logger.info(f"Tarea {key} ya encolada (#{job.pk}), se reutiliza")
+    return job
+
+
+def enqueue_many(action: str, server, items: List[Tuple[Any, Dict[str, Any]]]) -> List[Job]:
+    """
+    Encola varias operaciones del mismo servidor con un solo INSERT.
+    Pensado para clientes recién creados (sus claves no pueden existir todavía).
+
+    Args:
+        items: pares (cliente, payload)
+    """
+    now = timezone.now()
+    return Job.objects.bulk_create(
+        Job(
+            action=action,
+            server=server,
+            client_name=client.username,
+            payload=payload,
+            idempotency_key=_default_key(action, client, server, payload),
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+            run_at=now,
+        )
+        for client, payload in items
+    )
+
+
+def requeue_stale() -> int:
+    """Devuelve a la cola las tareas de workers que murieron a mitad de ejecución"""
+    limit = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    return Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=limit).update(
+        status=Job.STATUS_PENDING, locked_by='', locked_at=None
+    )
+
+
+def _first_of_client():
+    """Excluye las tareas cuyo cliente tiene otra anterior pendiente o en ejecución"""
+    return ~Exists(Job.objects.filter(
+        server=OuterRef('server'),
+        client_name=OuterRef('client_name'),
+        status__in=(Job.STATUS_PENDING, Job.STATUS_RUNNING),
+        pk__lt=OuterRef('pk'),
+    ))
+
+
+def claim_next(worker_id: str) -> Optional[Job]:
+    """
+    Toma la siguiente tarea lista. El UPDATE filtrado por estado actúa como
+    compare-and-set: si otro worker la tomó primero no actualiza filas y se prueba la siguiente.
+    """
+    candidates = list(
+        Job.objects.filter(_first_of_client(), status=Job.STATUS_PENDING, run_at__lte=timezone.now())
+        .order_by('run_at', 'pk')
+        .values_list('pk', flat=True)[:settings.JOB_CLAIM_BATCH]
+    )
+    for pk in candidates:
+        job = claim(pk, worker_id)
+        if job is not None:
+            return job
+    return None
+
+
+def claim(pk, worker_id: str) -> Optional[Job]:
+    """
+    Toma una tarea concreta si sigue pendiente y es la primera de su cliente; None si otro
+    worker la tomó o debe esperar. La condición va en el mismo UPDATE: dos tareas del mismo
+    cliente nunca están en ejecución a la vez.
+    """
+    claimed = Job.objects.filter(_first_of_client(), pk=pk, status=Job.STATUS_PENDING).update(
+        status=Job.STATUS_RUNNING,
+        locked_by=worker_id,
+        locked_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return None
+    return Job.objects.select_related('server').get(pk=pk)
+
+
+def _retry_delay(attempts: int) -> float:
+    delay = min(settings.JOB_RETRY_BACKOFF * (2 ** (attempts - 1)), settings.JOB_RETRY_BACKOFF_MAX)
+    return random.uniform(delay / 2, delay)
+
+
+def _already_applied(service, job: Job) -> bool:
+    """
+    Comprueba en el listado del servidor si la operación ya tiene efecto: el cliente existe
+    con los puertos pedidos (crear, extender) o ya no existe (eliminar).
+    """
+    try:
+        clients = status_cache.normalize_listing(service.list_clients()['data'])
+    except Exception as e:
+        logger.warning(f"No se pudo verificar la tarea #{job.pk} en {job.server.host}: {e}")
+        return False
+    if job.action == Job.ACTION_DELETE:
+        return job.client_name not in clients
+    remote = clients.get(job.client_name)
+    return remote is not None and set(job.payload['ports']) <= set(remote['ports'])
+
+
+def run_job(job: Job) -> bool:
+    """Ejecuta una tarea ya tomada y registra el resultado. Retorna True si terminó bien."""
+    service = backends.get_backend(job.server)
+    try:
+        response = HANDLERS[job.action](service, job)
+    except Exception as e:
+        if _already_applied(service, job):
+            # Un intento anterior llegó al servidor aunque no obtuvo respuesta
+            logger.info(f"Tarea #{job.pk} ({job.action} {job.client_name}) ya aplicada en el servidor: {e}")
+            Job.objects.filter(pk=job.pk).update(status=Job.STATUS_DONE, last_error='', locked_by='', locked_at=None)
+            job.status, job.last_error = Job.STATUS_DONE, ''
+            return True
+        finished = job.attempts >= job.max_attempts
+        updates = {'last_error': str(e), 'locked_by': '', 'locked_at': None}
+        if finished:
+            updates['status'] = Job.STATUS_FAILED
+            logger.error(f"Tarea #{job.pk} ({job.action} {job.client_name}) falló definitivamente tras {job.attempts} intentos: {e}")
+        else:
+            updates['status'] = Job.STATUS_PENDING
+            updates['run_at'] = timezone.now() + timedelta(seconds=_retry_delay(job.attempts))
+            logger.warning(f"Tarea #{job.pk} ({job.action} {job.client_name}) falló (intento {job.attempts}), se reintentará: {e}")
+        Job.objects.filter(pk=job.pk).update(**updates)
+        job.status, job.last_error = updates['status'], updates['last_error']
+        return False
+
+    logger.info(f"Tarea #{job.pk} ({job.action} {job.client_name}) completada: {response.get('message')}")
+    Job.objects.filter(pk=job.pk).update(status=Job.STATUS_DONE, last_error='', locked_by='', locked_at=None)
+    job.status, job.last_error = Job.STATUS_DONE, ''
+    return True
+
+
+def make_worker_id(name) -> str:
+    """Identificador de worker único entre procesos y máquinas"""
+    return f"{socket.gethostname()}:{os.getpid()}:{name}"
+
+
+def _worker_loop(worker_id: str, stop: threading.Event, once: bool, interval: float) -> None:
+    next_requeue = 0.0
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            # Recupera periódicamente las tareas de workers caídos (de este u otros procesos)
+            if time.monotonic() >= next_requeue:
+                requeued = requeue_stale()
+                if requeued:
+                    logger.warning(f"{requeued} tareas bloqueadas devueltas a la cola")
+                next_requeue = time.monotonic() + settings.JOB_REQUEUE_INTERVAL
+            job = claim_next(worker_id)
+            if job is None:
+                if once:
+                    return
+                stop.wait(interval)
+                continue
+            run_job(job)
+    finally:
+        close_old_connections()
+
+
+def run_workers(workers: int = 1, once: bool = False, interval: float = None,
+                stop: Optional[threading.Event] = None) -> None:
+    """
+    Ejecuta `workers` hilos que consumen la cola. Con `once` terminan al vaciarla.
+    Varios procesos pueden ejecutarse a la vez: cada tarea la toma un solo worker.
+    """
+    interval = settings.JOB_POLL_INTERVAL if interval is None else interval
+    stop = stop or threading.Event()
+
+    threads: List[threading.Thread] = [
+        threading.Thread(
+            target=_worker_loop,
+            args=(make_worker_id(index), stop, once, interval),
+            name=f"job-worker-{index}",
+            daemon=True,
+        )
+        for index in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,271 @@
+"""
+Métricas de las llamadas remotas (API REST y SSH), en memoria del proceso.
+
+- remote_call_duration_seconds: histograma por transporte, servidor, acción y resultado.
+- remote_call_errors_total: errores por transporte, servidor, acción y clase de excepción.
+- remote_calls_in_flight: llamadas en curso por transporte y servidor.
+- ssh_connect_duration_seconds / ssh_exec_duration_seconds: handshake SSH frente a ejecución
+  de manage_client, para separar la red del tiempo del comando en el servidor.
+- view_duration_seconds / view_budget_violations_total: peticiones muestreadas por
+  RequestProfilingMiddleware y presupuestos superados.
+
+Se exponen en formato de texto de Prometheus y cada llamada deja además un registro
+estructurado en el logger 'core.remote'. Los valores viven en memoria de cada proceso: la web
+los publica en /metrics y los procesos sin HTTP (run_jobs, collect_status) abren su propio
+listener con serve() en METRICS_ADDRESS:METRICS_PORT. Prometheus debe scrapear cada proceso por
+separado.
+"""
+import hmac
+import ipaddress
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterable, List, Tuple
+
+from core import profiling
+
+logger = logging.getLogger('core.remote')
+
+# Límites superiores (segundos) de los buckets de los histogramas
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Metric(ABC):
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _label_text(self, key: Tuple[str, ...], extra: Iterable[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in pairs) + '}'
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        pass
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        return [f'{self.name}{self._label_text(key)} {value}' for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def observe(self, seconds: float, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            counts, total, observed = self._values.get(key, ([0] * len(BUCKETS), 0.0, 0))
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + seconds, observed + 1)
+
+    def samples(self):
+        lines = []
+        for key, (counts, total, observed) in sorted(self._values.items()):
+            for bound, count in zip(BUCKETS, counts):
+                lines.append(f'{self.name}_bucket{self._label_text(key, [("le", str(bound))])} {count}')
+            lines.append(f'{self.name}_bucket{self._label_text(key, [("le", "+Inf")])} {observed}')
+            lines.append(f'{self.name}_sum{self._label_text(key)} {total}')
+            lines.append(f'{self.name}_count{self._label_text(key)} {observed}')
+        return lines
+
+
+REMOTE_DURATION = Histogram(
+    'remote_call_duration_seconds', "Duración de las llamadas remotas (incluye reintentos)",
+    ('transport', 'server', 'action', 'outcome'),
+)
+REMOTE_ERRORS = Counter(
+    'remote_call_errors_total', "Llamadas remotas fallidas por clase de error",
+    ('transport', 'server', 'action', 'error'),
+)
+REMOTE_IN_FLIGHT = Gauge(
+    'remote_calls_in_flight', "Llamadas remotas en curso", ('transport', 'server'),
+)
+SSH_CONNECT = Histogram(
+    'ssh_connect_duration_seconds', "Duración del handshake y la autenticación SSH", ('server',),
+)
+SSH_EXEC = Histogram(
+    'ssh_exec_duration_seconds', "Duración de manage_client sobre un canal ya abierto", ('server', 'action'),
+)
+
+VIEW_DURATION = Histogram(
+    'view_duration_seconds', "Duración de las peticiones muestreadas por vista", ('view',),
+)
+VIEW_BUDGET_VIOLATIONS = Counter(
+    'view_budget_violations_total', "Peticiones que superaron un presupuesto de PROFILING_BUDGETS", ('view', 'budget'),
+)
+
+REGISTRY = [REMOTE_DURATION, REMOTE_ERRORS, REMOTE_IN_FLIGHT, SSH_CONNECT, SSH_EXEC, VIEW_DURATION, VIEW_BUDGET_VIOLATIONS]
+
+
+class _Call:
+    """Llamada en curso: permite marcar un fallo que no llega como excepción (p. ej. HTTP 4xx)"""
+
+    def __init__(self, transport: str, server, action: str):
+        self.transport = transport
+        self.server = server.host
+        self.action = action
+        self.error = None
+        self.started = time.perf_counter()
+
+    def fail(self, error: str) -> None:
+        self.error = error
+
+    def start(self) -> None:
+        REMOTE_IN_FLIGHT.inc(transport=self.transport, server=self.server)
+
+    def finish(self, exception: BaseException = None) -> None:
+        elapsed = time.perf_counter() - self.started
+        REMOTE_IN_FLIGHT.dec(transport=self.transport, server=self.server)
+        profiling.record_remote(elapsed)
+        if exception is not None:
+            self.error = type(exception).__name__
+        outcome = 'error' if self.error else 'ok'
+        REMOTE_DURATION.observe(elapsed, transport=self.transport, server=self.server, action=self.action,
+                                outcome=outcome)
+        if self.error:
+            REMOTE_ERRORS.inc(transport=self.transport, server=self.server, action=self.action, error=self.error)
+
+        logger.log(
+            logging.WARNING if self.error else logging.INFO,
+            f"{self.transport} {self.action} en {self.server}: {outcome} ({elapsed * 1000:.1f} ms)",
+            extra={
+                'event': 'remote_call',
+                'transport': self.transport,
+                'server': self.server,
+                'action': self.action,
+                'outcome': outcome,
+                'error': self.error,
+                'duration_ms': round(elapsed * 1000, 2),
+            },
+        )
+
+
+@contextmanager
+def track(transport: str, server, action: str):
+    """Mide una llamada remota: duración, errores, llamadas en curso y registro estructurado"""
+    call = _Call(transport, server, action)
+    call.start()
+    try:
+        yield call
+    except BaseException as e:
+        call.finish(e)
+        raise
+    call.finish()
+
+
+@asynccontextmanager
+async def atrack(transport: str, server, action: str):
+    """Variante de track() para corrutinas"""
+    call = _Call(transport, server, action)
+    call.start()
+    try:
+        yield call
+    except BaseException as e:
+        call.finish(e)
+        raise
+    call.finish()
+
+
+def observe_ssh_connect(server, seconds: float) -> None:
+    SSH_CONNECT.observe(seconds, server=server.host)
+
+
+def observe_ssh_exec(server, action: str, seconds: float) -> None:
+    SSH_EXEC.observe(seconds, server=server.host, action=action)
+
+
+def render() -> str:
+    """Todas las métricas en formato de texto de Prometheus (versión 0.0.4)"""
+    lines = []
+    with _lock:
+        for metric in REGISTRY:
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    token = ''
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        authorization = self.headers.get('Authorization', '')
+        if self.token and not hmac.compare_digest(authorization, f'Bearer {self.token}'):
+            self.send_error(403)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # El scraper consulta cada pocos segundos: no llenar el log
+        pass
+
+
+def _is_loopback(address: str) -> bool:
+    if address == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(port: int, token: str = '', address: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """
+    Publica las métricas del proceso en http://<address>:<port>/metrics desde un hilo daemon.
+    Con `token` exige `Authorization: Bearer <token>`, como /metrics en la web. Solo se permite
+    escuchar sin token en una dirección local.
+
+    Raises:
+        ValueError: si `address` no es local y no hay token
+    """
+    if not token and not _is_loopback(address):
+        raise ValueError(f"Las métricas en {address} requieren METRICS_TOKEN; sin token solo se publican en 127.0.0.1")
+    handler = type('MetricsHandler', (_MetricsHandler,), {'token': token})
+    server = ThreadingHTTPServer((address, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"Métricas del proceso en {address}:{server.server_address[1]}/metrics")
+    return server
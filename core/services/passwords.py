@@ -0,0 +1,56 @@
+"""
+Hash de contraseñas de cuentas de cliente con CLIENT_PASSWORD_HASHER.
+
+El hash es CPU puro: se calcula antes de abrir transacciones y, en altas masivas,
+se reparte entre un pool de procesos para usar todos los núcleos.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Sequence
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hash_client_password(raw_password: str) -> str:
+    return make_password(raw_password, hasher=settings.CLIENT_PASSWORD_HASHER)
+
+
+def _setup_worker() -> None:
+    # Con forkserver/spawn el proceso hijo arranca sin Django configurado
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver evita hacer fork() de un proceso con hilos (servidor ASGI, workers)
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=context,
+                initializer=_setup_worker,
+            )
+        return _pool
+
+
+def hash_client_passwords(raw_passwords: Sequence[str]) -> List[str]:
+    """
+    Hashea varias contraseñas. Por debajo de PASSWORD_HASH_POOL_THRESHOLD se hace en
+    este proceso (arrancar el pool cuesta más que el hash); por encima, en el pool.
+    """
+    raw_passwords = list(raw_passwords)
+    if len(raw_passwords) < settings.PASSWORD_HASH_POOL_THRESHOLD or settings.PASSWORD_HASH_WORKERS < 2:
+        return [hash_client_password(raw) for raw in raw_passwords]
+
+    chunksize = max(len(raw_passwords) // (settings.PASSWORD_HASH_WORKERS * 4), 1)
+    return list(_get_pool().map(hash_client_password, raw_passwords, chunksize=chunksize))
@@ -0,0 +1,98 @@
+"""
+Planificador de ubicación: elige el servidor donde alojar un cliente nuevo.
+
+Decide en memoria a partir de las estadísticas cacheadas de cada servidor (cache.get_server_stats:
+puertos totales, usados y clientes, una consulta agregada para toda la flota) y, si existe,
+del estado en ejecución del colector: los servidores que no respondieron se descartan y los
+puertos en ejecución desempatan. Nunca recorre los puertos de cada servidor.
+
+Estrategias (PLACEMENT_STRATEGY por defecto):
+- least_loaded: el de menor ocupación de puertos; reparte la carga entre servidores.
+- bin_packing: el que queda más lleno sin pasarse; deja servidores libres para clientes grandes.
+- affinity: el servidor preferido (el actual del cliente o el elegido) si cabe; si no, least_loaded.
+"""
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+
+from core import cache
+from core.services import status_cache
+
+STRATEGY_LEAST_LOADED = 'least_loaded'
+STRATEGY_BIN_PACKING = 'bin_packing'
+STRATEGY_AFFINITY = 'affinity'
+STRATEGY_CHOICES = (
+    (STRATEGY_LEAST_LOADED, 'Automático: servidor menos cargado'),
+    (STRATEGY_BIN_PACKING, 'Automático: completar servidores'),
+    (STRATEGY_AFFINITY, 'Automático: preferir el servidor elegido'),
+)
+
+
+def capacity() -> List[Dict[str, Any]]:
+    """
+    Capacidad de cada servidor: puertos totales, usados y libres, clientes, puertos en
+    ejecución y si respondió al colector. Sin estado reciente se asume alcanzable.
+    """
+    stats = cache.get_server_stats()
+    statuses = status_cache.get_servers_status(stats) if settings.PLACEMENT_USE_STATUS else {}
+    servers = []
+    for pk, usage in stats.items():
+        status = statuses.get(pk)
+        running = 0
+        if status:
+            running = sum(
+                state == status_cache.RUNNING
+                for client in status['clients'].values()
+                for state in client['ports'].values()
+            )
+        servers.append({
+            'pk': pk,
+            'total_ports': usage['total_ports'],
+            'used_ports': usage['used_ports_count'],
+            'free_ports': max(usage['total_ports'] - usage['used_ports_count'], 0),
+            'clients': usage['clients_count'],
+            'running_ports': running,
+            'reachable': status['reachable'] if status else True,
+        })
+    return servers
+
+
+def _load(server: Dict[str, Any]) -> float:
+    return server['used_ports'] / server['total_ports'] if server['total_ports'] else 1.0
+
+
+def _least_loaded(servers, prefer):
+    return sorted(servers, key=lambda s: (_load(s), s['running_ports'], s['clients'], s['pk']))
+
+
+def _bin_packing(servers, prefer):
+    # Mejor ajuste: el que menos puertos libres deja tras la asignación
+    return sorted(servers, key=lambda s: (s['free_ports'], -_load(s), s['pk']))
+
+
+def _affinity(servers, prefer):
+    ranked = _least_loaded(servers, prefer)
+    return sorted(ranked, key=lambda s: s['pk'] != prefer)
+
+
+STRATEGIES: Dict[str, Callable] = {
+    STRATEGY_LEAST_LOADED: _least_loaded,
+    STRATEGY_BIN_PACKING: _bin_packing,
+    STRATEGY_AFFINITY: _affinity,
+}
+
+
+def rank(num_ports: int, strategy: str = None, prefer: Optional[Any] = None) -> List[Any]:
+    """
+    pks de los servidores donde caben `num_ports` puertos, del más al menos conveniente
+    (vacía si no cabe en ninguno). `prefer` es el pk del servidor preferido (affinity).
+    """
+    strategy = strategy or settings.PLACEMENT_STRATEGY
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Estrategia de ubicación desconocida: {strategy}")
+    candidates = [
+        server for server in capacity()
+        if server['reachable'] and server['free_ports'] >= num_ports
+    ]
+    return [server['pk'] for server in STRATEGIES[strategy](candidates, prefer)]
+
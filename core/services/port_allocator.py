@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from core import cache
+from core.models import PortServer, Server
+
+logger = logging.getLogger(__name__)
+
+
+class PortAllocationError(ValueError):
+    """No hay suficientes puertos libres para la asignación solicitada"""
+    pass
+
+
+class PortBitmap:
+    """
+    Bitmap de puertos libres de un servidor.
+    El bit i representa el puerto initial_port + i (1 = libre).
+    Se usa un entero de Python: las operaciones de bits sobre 10k+ puertos se hacen en C.
+    """
+
+    def __init__(self, initial_port: int, final_port: int, used_ports: Iterable[int] = ()):
+        self.initial_port = initial_port
+        self.final_port = final_port
+        self._bits = (1 << max(final_port - initial_port + 1, 0)) - 1
+        self.mark_used(p for p in used_ports if initial_port <= p <= final_port)
+
+    @property
+    def free_count(self) -> int:
+        return self._bits.bit_count()
+
+    def _offset(self, port: int) -> int:
+        if not (self.initial_port <= port <= self.final_port):
+            raise ValueError(f"El puerto {port} está fuera del rango ({self.initial_port}-{self.final_port})")
+        return port - self.initial_port
+
+    def is_free(self, port: int) -> bool:
+        return bool(self._bits >> self._offset(port) & 1)
+
+    def mark_free(self, ports: Iterable[int]) -> None:
+        for port in ports:
+            self._bits |= 1 << self._offset(port)
+
+    def mark_used(self, ports: Iterable[int]) -> None:
+        for port in ports:
+            self._bits &= ~(1 << self._offset(port))
+
+    def take(self, count: int) -> List[int]:
+        """Reserva los `count` puertos libres más bajos"""
+        if count > self.free_count:
+            raise PortAllocationError(f"No hay suficientes puertos disponibles. Solicitados: {count}, Disponibles: {self.free_count}")
+
+        ports = []
+        bits = self._bits
+        for _ in range(count):
+            lowest = bits & -bits
+            ports.append(self.initial_port + lowest.bit_length() - 1)
+            bits ^= lowest
+        self._bits = bits
+        return ports
+
+    def take_contiguous(self, count: int) -> List[int]:
+        """Reserva el primer bloque de `count` puertos libres consecutivos"""
+        # Tras el bucle, el bit i queda en 1 solo si los bits i..i+count-1 estaban libres.
+        # Cada paso duplica la longitud cubierta: O(log count) operaciones sobre el bitmap.
+        runs = self._bits
+        covered = 1
+        while covered < count and runs:
+            step = min(covered, count - covered)
+            runs &= runs >> step
+            covered += step
+
+        if not runs:
+            raise PortAllocationError(f"No hay {count} puertos consecutivos disponibles.")
+
+        start = (runs & -runs).bit_length() - 1
+        ports = [self.initial_port + start + i for i in range(count)]
+        self.mark_used(ports)
+        return ports
+
+
+# Bitmaps por proceso: server.pk -> (PortBitmap, instante de construcción)
+_bitmaps: Dict[int, tuple] = {}
+_bitmaps_lock = threading.Lock()
+
+
+def _build_bitmap(server: Server) -> PortBitmap:
+    used_ports = server.ports.values_list('port_number', flat=True)
+    return PortBitmap(server.initial_port, server.final_port, used_ports)
+
+
+def _get_bitmap(server: Server) -> PortBitmap:
+    """
+    Retorna el bitmap del servidor, reconstruyéndolo desde PortServer si no existe,
+    si cambió el rango o si superó PORT_ALLOCATOR_TTL (cambios hechos por otros procesos).
+    Debe llamarse con _bitmaps_lock adquirido.
+    """
+    entry = _bitmaps.get(server.pk)
+    if entry is not None:
+        bitmap, built_at = entry
+        fresh = time.monotonic() - built_at < settings.PORT_ALLOCATOR_TTL
+        same_range = (bitmap.initial_port, bitmap.final_port) == (server.initial_port, server.final_port)
+        if fresh and same_range:
+            return bitmap
+
+    bitmap = _build_bitmap(server)
+    _bitmaps[server.pk] = (bitmap, time.monotonic())
+    return bitmap
+
+
+def invalidate(server_pk) -> None:
+    """Descarta el bitmap de un servidor para reconstruirlo en el próximo uso"""
+    with _bitmaps_lock:
+        _bitmaps.pop(server_pk, None)
+
+
+def free_count(server: Server) -> int:
+    """Cantidad de puertos libres del servidor según el bitmap en memoria"""
+    with _bitmaps_lock:
+        return _get_bitmap(server).free_count
+
+
+def allocate_ports(server: Server, client, count: int, contiguous: bool = False) -> List[int]:
+    """
+    Asigna `count` puertos libres del servidor al cliente.
+
+    Los puertos se eligen en el bitmap en memoria y se persisten con un único INSERT
+    masivo, sin bloquear filas con select_for_update. La restricción única
+    (server, port_number) detecta si otro proceso tomó alguno de los puertos;
+    en ese caso se reconstruye el bitmap y se reintenta.
+
+    Returns:
+        list: números de puerto asignados, ordenados
+
+    Raises:
+        PortAllocationError: si no hay suficientes puertos libres
+    """
+    return allocate_batch(server, [(client, count)], contiguous)[0]
+
+
+def allocate_batch(server: Server, requests: List[Tuple[Any, int]], contiguous: bool = False) -> List[List[int]]:
+    """
+    Asigna puertos a varios clientes del mismo servidor con un solo INSERT.
+    Si algún cliente no cabe no se asigna nada (todo o nada).
+
+    Args:
+        requests: pares (cliente, cantidad de puertos)
+
+    Returns:
+        list: puertos asignados a cada cliente, en el mismo orden que `requests`
+    """
+    for attempt in range(settings.PORT_ALLOCATOR_RETRIES):
+        with _bitmaps_lock:
+            bitmap = _get_bitmap(server)
+            allocations = []
+            try:
+                for _, count in requests:
+                    allocations.append(bitmap.take_contiguous(count) if contiguous else bitmap.take(count))
+            except PortAllocationError:
+                for ports in allocations:
+                    bitmap.mark_free(ports)
+                raise
+
+        try:
+            with transaction.atomic():
+                PortServer.objects.bulk_create(
+                    PortServer(server=server, port_number=port, assigned_client=client)
+                    for (client, _), ports in zip(requests, allocations)
+                    for port in ports
+                )
+            cache.bump_version('ports', *(cache.client_scope(client.pk) for client, _ in requests))
+        except IntegrityError:
+            logger.info(f"Conflicto asignando puertos en {server.host}; reconstruyendo bitmap (intento {attempt + 1})")
+            invalidate(server.pk)
+            continue
+
+        return [sorted(ports) for ports in allocations]
+
+    raise PortAllocationError("No se pudieron asignar puertos por concurrencia; intente nuevamente.")
+
+
+def release_ports(server: Server, ports: Iterable[int]) -> None:
+    """Marca puertos como libres en el bitmap (la BD ya debe estar actualizada)"""
+    ports = list(ports)
+    with _bitmaps_lock:
+        entry = _bitmaps.get(server.pk)
+        if entry is None:
+            return
+        bitmap = entry[0]
+        bitmap.mark_free(p for p in ports if bitmap.initial_port <= p <= bitmap.final_port)
+
+
+def release_client_ports(client) -> List[int]:
+    """Libera en BD y en el bitmap todos los puertos asignados a un cliente"""
+    if not client.server:
+        return []
+    ports = list(client.assigned_ports.values_list('port_number', flat=True))
+    client.assigned_ports.all().delete()
+    cache.bump_version('ports', cache.client_scope(client.pk))
+    release_ports(client.server, ports)
+    return ports
@@ -0,0 +1,245 @@
+"""
+Reconciliación entre la base de datos y el estado real de cada servidor.
+
+Los cambios locales y las operaciones remotas pueden divergir (una eliminación remota que
+falló, un alta que quedó a medias, una extensión perdida). reconcile():
+
+1. Lee User/PortServer y las tareas en curso (tres consultas para toda la flota), después
+   lista los clientes de todos los servidores en paralelo (una llamada por servidor) y por
+   último consulta las tareas encoladas mientras tanto.
+2. Compara cada listado con el estado local en memoria.
+3. Con `fix`, corrige en lotes: libera o reclama puertos en la BD y recrea los clientes
+   ausentes con lotes de RECONCILE_BATCH_SIZE operaciones por servidor. Los huérfanos solo
+   se eliminan si además se pide `delete_orphans`.
+
+Diferencias detectadas por servidor:
+- orphans: clientes remotos sin usuario local (se eliminan con `delete_orphans`).
+- missing: usuarios locales que el servidor no tiene (se recrean con sus puertos).
+- leaked_ports: puertos reservados en la BD que el cliente no usa en el servidor (se liberan).
+- untracked_ports: puertos que el cliente usa en el servidor y la BD cree libres (se reclaman).
+- conflicts: puertos remotos que la BD asigna a otro cliente (solo se informan).
+- unknown_ports: clientes listados sin puertos; sus puertos se desconocen y no se liberan.
+
+Los clientes con tareas pendientes o en ejecución se omiten: su diferencia es esperada. También
+los que recibieron tareas durante la pasada (una tarea que termina entre la lectura local y el
+listado dejaría ambas vistas desfasadas).
+"""
+import logging
+from typing import Any, Dict, Iterable, List
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import cache
+from core.models import Job, PortServer, Server, User
+from core.services import backends, bulk_actions, port_allocator, status_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _fetch_listings(servers: List[Server]) -> List[Dict[str, Any]]:
+    outcomes = bulk_actions.run_per_server(
+        ((server, backends.get_backend(server).list_clients) for server in servers),
+        per_server_limit=1,
+    )
+    listings = []
+    for server, outcome in zip(servers, outcomes):
+        if outcome['ok']:
+            clients = status_cache.normalize_listing(outcome['result']['data'])
+            # El listado sirve también como pasada del colector de estado
+            status_cache.store_server_status(server.pk, clients)
+            listings.append({'ok': True, 'clients': clients})
+        else:
+            listings.append({'ok': False, 'error': str(outcome['error'])})
+    return listings
+
+
+def _mark_recent_jobs(local: Dict[Any, Dict[str, Any]], since) -> None:
+    """
+    Marca como ocupados los clientes con tareas encoladas desde `since`. Las que ya estaban
+    pendientes o en ejecución al leer el estado local figuran en `busy` aunque terminen después.
+    """
+    recent = Job.objects.filter(server__in=list(local), created_at__gte=since).values_list('server_id', 'client_name')
+    for server_id, client_name in recent:
+        local[server_id]['busy'].add(client_name)
+
+
+def _load_local(servers: List[Server]) -> Dict[Any, Dict[str, Any]]:
+    """{server.pk: {'users': {nombre: pk}, 'ports': {puerto: nombre}, 'busy': {nombres}}}"""
+    local = {server.pk: {'users': {}, 'ports': {}, 'busy': set()} for server in servers}
+    users = User.objects.filter(role='client', server__in=servers).values_list('server_id', 'username', 'pk')
+    for server_id, username, pk in users:
+        local[server_id]['users'][username] = pk
+    ports = PortServer.objects.filter(server__in=servers).values_list(
+        'server_id', 'port_number', 'assigned_client__username'
+    )
+    for server_id, port, username in ports:
+        local[server_id]['ports'][port] = username
+    busy = Job.objects.filter(
+        server__in=servers, status__in=(Job.STATUS_PENDING, Job.STATUS_RUNNING)
+    ).values_list('server_id', 'client_name')
+    for server_id, client_name in busy:
+        local[server_id]['busy'].add(client_name)
+    return local
+
+
+def diff_server(server: Server, remote: Dict[str, Dict[str, Any]], local: Dict[str, Any]) -> Dict[str, Any]:
+    """Diferencias entre el listado remoto normalizado y el estado local de un servidor"""
+    busy = local['busy']
+    local_ports: Dict[str, set] = {}
+    for port, username in local['ports'].items():
+        local_ports.setdefault(username, set()).add(port)
+
+    report = {
+        'server': server.host,
+        'server_id': server.pk,
+        'ok': True,
+        'orphans': sorted(name for name in remote if name not in local['users'] and name not in busy),
+        'missing': sorted(name for name in local['users'] if name not in remote and name not in busy),
+        'leaked_ports': {},
+        'untracked_ports': {},
+        'conflicts': [],
+        'unknown_ports': [],
+    }
+
+    for name in sorted(set(remote) & set(local['users']) - busy):
+        remote_ports = set(remote[name]['ports'])
+        if not remote_ports:
+            # Listado sin el campo `ports` o vacío: no prueba que los puertos locales sobren
+            report['unknown_ports'].append(name)
+            continue
+        assigned = local_ports.get(name, set())
+        leaked = assigned - remote_ports
+        if leaked:
+            report['leaked_ports'][name] = sorted(leaked)
+        untracked = []
+        for port in sorted(remote_ports - assigned):
+            owner = local['ports'].get(port)
+            if owner is not None:
+                report['conflicts'].append({'port': port, 'remote': name, 'local': owner})
+            elif server.initial_port <= port <= server.final_port:
+                untracked.append(port)
+            else:
+                report['conflicts'].append({'port': port, 'remote': name, 'local': None})
+        if untracked:
+            report['untracked_ports'][name] = untracked
+
+    # Puertos de usuarios que el servidor no tiene: se conservan para recrearlos
+    report['missing_ports'] = {name: sorted(local_ports.get(name, ())) for name in report['missing']}
+    return report
+
+
+def has_drift(report: Dict[str, Any]) -> bool:
+    return any(report.get(kind) for kind in (
+        'orphans', 'missing', 'leaked_ports', 'untracked_ports', 'conflicts', 'unknown_ports'
+    ))
+
+
+def _fix_local(server: Server, report: Dict[str, Any], users: Dict[str, Any]) -> None:
+    """Libera los puertos filtrados y reclama los no registrados en una transacción"""
+    leaked = [port for ports in report['leaked_ports'].values() for port in ports]
+    # Cada puerto solo se libera si sigue siendo del cliente con el que se comparó
+    leaked_filter = Q()
+    for name, ports in report['leaked_ports'].items():
+        leaked_filter |= Q(assigned_client_id=users[name], port_number__in=ports)
+    claimed = [
+        PortServer(server=server, port_number=port, assigned_client_id=users[name])
+        for name, ports in report['untracked_ports'].items()
+        for port in ports
+    ]
+    if not leaked and not claimed:
+        return
+
+    affected = set(report['leaked_ports']) | set(report['untracked_ports'])
+    try:
+        with transaction.atomic():
+            released = 0
+            if leaked:
+                released, _ = PortServer.objects.filter(leaked_filter, server=server).delete()
+            PortServer.objects.bulk_create(claimed)
+    except IntegrityError as e:
+        # Otro proceso asignó alguno de los puertos entre la lectura y la corrección
+        report['local_error'] = str(e)
+        logger.warning(f"Reconciliación local de {server.host} abortada: {e}")
+        return
+    finally:
+        port_allocator.invalidate(server.pk)
+
+    cache.bump_version('ports', *(cache.client_scope(users[name]) for name in affected))
+    report['fixed_ports'] = {'released': released, 'claimed': len(claimed)}
+
+
+def _fix_remote(server: Server, report: Dict[str, Any], delete_orphans: bool) -> List[Dict[str, Any]]:
+    """Recrea los clientes ausentes y, si se pide, elimina huérfanos, en lotes; un resultado por operación"""
+    operations = [('delete_client', name, ()) for name in report['orphans']] if delete_orphans else []
+    operations += [
+        ('create_client', name, (report['missing_ports'][name],))
+        for name in report['missing'] if report['missing_ports'][name]
+    ]
+    results = []
+    size = settings.RECONCILE_BATCH_SIZE
+    service = backends.get_backend(server)
+    for start in range(0, len(operations), size):
+        chunk = operations[start:start + size]
+        with service.batch() as batch:
+            pending = [getattr(batch, method)(name, *args) for method, name, args in chunk]
+        for (method, name, _), result in zip(chunk, pending):
+            results.append({
+                'action': method.split('_')[0],
+                'client': name,
+                'ok': result.ok,
+                'error': None if result.ok else str(result.error),
+            })
+    return results
+
+
+def reconcile(servers: Iterable[Server] = None, fix: bool = False,
+              delete_orphans: bool = False) -> List[Dict[str, Any]]:
+    """
+    Compara el estado local con el de cada servidor y, con `fix`, lo corrige.
+    `delete_orphans` elimina además los clientes remotos sin usuario local (requiere `fix`).
+
+    Returns:
+        list: un informe por servidor (ver el docstring del módulo)
+    """
+    servers = list(servers if servers is not None else Server.objects.all())
+    # Primero el estado local y después los listados; lo que cambie entre ambos se omite
+    started = timezone.now()
+    local = _load_local(servers)
+    listings = _fetch_listings(servers)
+    _mark_recent_jobs(local, started)
+
+    reports = []
+    for server, listing in zip(servers, listings):
+        if not listing['ok']:
+            reports.append({'server': server.host, 'server_id': server.pk, 'ok': False, 'error': listing['error']})
+            continue
+        report = diff_server(server, listing['clients'], local[server.pk])
+        if has_drift(report):
+            logger.warning(
+                f"Diferencias en {server.host}: {len(report['orphans'])} huérfanos, "
+                f"{len(report['missing'])} ausentes, {sum(map(len, report['leaked_ports'].values()))} puertos "
+                f"filtrados, {sum(map(len, report['untracked_ports'].values()))} sin registrar, "
+                f"{len(report['conflicts'])} conflictos"
+            )
+        if fix:
+            _fix_local(server, report, local[server.pk]['users'])
+        reports.append(report)
+
+    if fix:
+        # Las correcciones remotas de cada servidor van en paralelo, como los listados
+        targets = [(server, report) for server, report in zip(servers, reports)
+                   if report['ok'] and ((delete_orphans and report['orphans']) or report['missing'])]
+        outcomes = bulk_actions.run_per_server(
+            ((server, lambda server=server, report=report: _fix_remote(server, report, delete_orphans))
+             for server, report in targets),
+            per_server_limit=1,
+        )
+        for (server, report), outcome in zip(targets, outcomes):
+            if outcome['ok']:
+                report['remote_fixes'] = outcome['result']
+            else:
+                report['remote_error'] = str(outcome['error'])
+    return reports
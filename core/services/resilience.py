@@ -0,0 +1,224 @@
+"""
+Políticas de resiliencia compartidas por los backends API y SSH (síncronos y asíncronos).
+
+- Circuit breaker por servidor (cerrado / abierto / semiabierto) según la tasa de fallos
+  de las últimas llamadas: un servidor caído responde al instante en lugar de agotar el timeout.
+- Timeout adaptativo por servidor y acción a partir del percentil de latencia observado.
+- Reintentos con backoff exponencial y jitter solo para acciones idempotentes.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Tuple, Type
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Acciones seguras de reintentar (repetirlas no cambia el resultado)
+IDEMPOTENT_ACTIONS = frozenset({'start', 'stop', 'restart', 'restart-port', 'list'})
+
+
+class CircuitOpenError(Exception):
+    """El circuito del servidor está abierto: no se intenta la llamada"""
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self):
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._results = deque(maxlen=settings.CIRCUIT_WINDOW)
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Autoriza la llamada o lanza CircuitOpenError"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < settings.CIRCUIT_OPEN_SECONDS:
+                    raise CircuitOpenError()
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+
+            if self.state == HALF_OPEN:
+                # Solo una llamada de prueba a la vez mientras está semiabierto
+                if self._trial_in_flight:
+                    raise CircuitOpenError()
+                self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._results.clear()
+                self._trial_in_flight = False
+            self._results.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._results.append(False)
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            failures = self._results.count(False)
+            if len(self._results) >= settings.CIRCUIT_MIN_CALLS and \
+                    failures / len(self._results) >= settings.CIRCUIT_FAILURE_RATE:
+                self._open()
+
+    def abandon(self) -> None:
+        """La llamada se interrumpió sin resultado (p. ej. cancelada): libera la prueba sin contarla"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Latencias recientes de una acción en un servidor"""
+
+    def __init__(self):
+        self._samples = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(int(len(samples) * pct / 100), len(samples) - 1)
+        return samples[index]
+
+    def timeout(self, max_timeout: float) -> float:
+        """
+        Timeout = p95 x multiplicador, acotado a [ADAPTIVE_TIMEOUT_MIN, max_timeout].
+        Sin muestras suficientes se usa el máximo configurado.
+        """
+        with self._lock:
+            enough = len(self._samples) >= settings.CIRCUIT_MIN_CALLS
+        if not enough:
+            return max_timeout
+        p95 = self.percentile(95)
+        return min(max(p95 * settings.ADAPTIVE_TIMEOUT_MULTIPLIER, settings.ADAPTIVE_TIMEOUT_MIN), max_timeout)
+
+
+_breakers: Dict[Any, CircuitBreaker] = {}
+_latencies: Dict[Tuple[Any, str], LatencyTracker] = {}
+_registry_lock = threading.Lock()
+
+
+def _server_key(server):
+    return server.pk or server.host
+
+
+def get_breaker(server) -> CircuitBreaker:
+    with _registry_lock:
+        return _breakers.setdefault(_server_key(server), CircuitBreaker())
+
+
+def get_latency(server, action: str) -> LatencyTracker:
+    with _registry_lock:
+        return _latencies.setdefault((_server_key(server), action), LatencyTracker())
+
+
+def _backoff(attempt: int) -> float:
+    # Backoff exponencial con jitter completo
+    return random.uniform(0, settings.REMOTE_RETRY_BACKOFF * (2 ** attempt))
+
+
+def _timeout(latency: LatencyTracker, action: str, max_timeout: float) -> float:
+    # Acortar create/extend podría cortar una operación que sí se completó en el servidor
+    # y el reintento de la cola la duplicaría: solo las idempotentes usan el timeout adaptativo
+    if action not in IDEMPOTENT_ACTIONS:
+        return max_timeout
+    return latency.timeout(max_timeout)
+
+
+def _record_failure(breaker: CircuitBreaker, latency: LatencyTracker, elapsed: float, timeout: float) -> None:
+    breaker.record_failure()
+    # Un intento fallido cuenta como si hubiera agotado su timeout: si el servidor se volvió
+    # lento, el p95 sube y el timeout adaptativo se ensancha en lugar de quedarse corto para siempre
+    latency.record(max(elapsed, timeout))
+
+
+def call(server, action: str, fn: Callable[[float], Any], transient: Tuple[Type[BaseException], ...],
+         max_timeout: float) -> Any:
+    """
+    Ejecuta fn(timeout) aplicando circuit breaker, timeout adaptativo y reintentos.
+    Solo las excepciones `transient` cuentan como fallo del servidor y se reintentan
+    (si la acción es idempotente); el resto se propaga sin tocar el circuito.
+    """
+    breaker = get_breaker(server)
+    latency = get_latency(server, action)
+    attempts = 1 + (settings.REMOTE_RETRIES if action in IDEMPOTENT_ACTIONS else 0)
+
+    for attempt in range(attempts):
+        breaker.before_call()
+        timeout = _timeout(latency, action, max_timeout)
+        started = time.monotonic()
+        try:
+            result = fn(timeout)
+        except transient as e:
+            _record_failure(breaker, latency, time.monotonic() - started, timeout)
+            if attempt + 1 >= attempts:
+                raise
+            logger.info(f"Reintentando {action} en {server.host} tras error transitorio: {e}")
+            time.sleep(_backoff(attempt))
+            continue
+        except Exception:
+            # Error de aplicación: el servidor respondió, el circuito no se ve afectado
+            breaker.record_success()
+            raise
+        except BaseException:
+            breaker.abandon()
+            raise
+        breaker.record_success()
+        latency.record(time.monotonic() - started)
+        return result
+
+
+async def acall(server, action: str, fn, transient: Tuple[Type[BaseException], ...],
+                max_timeout: float) -> Any:
+    """Versión asíncrona de call(): fn(timeout) debe retornar una corrutina"""
+    breaker = get_breaker(server)
+    latency = get_latency(server, action)
+    attempts = 1 + (settings.REMOTE_RETRIES if action in IDEMPOTENT_ACTIONS else 0)
+
+    for attempt in range(attempts):
+        breaker.before_call()
+        timeout = _timeout(latency, action, max_timeout)
+        started = time.monotonic()
+        try:
+            result = await fn(timeout)
+        except transient as e:
+            _record_failure(breaker, latency, time.monotonic() - started, timeout)
+            if attempt + 1 >= attempts:
+                raise
+            logger.info(f"Reintentando {action} en {server.host} tras error transitorio: {e}")
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        except Exception:
+            breaker.record_success()
+            raise
+        except BaseException:
+            # Cancelación o salida del proceso: no dice nada del servidor
+            breaker.abandon()
+            raise
+        breaker.record_success()
+        latency.record(time.monotonic() - started)
+        return result
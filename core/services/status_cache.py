@@ -0,0 +1,114 @@
+"""
+Estado en ejecución de clientes y puertos, alimentado por el colector en segundo plano.
+
+Se guarda una entrada por servidor con TTL (CLIENT_STATUS_TTL). Las vistas solo leen
+de la caché: nunca consultan a los servidores remotos durante la petición.
+Con varios procesos (colector + workers web) la caché debe ser compartida.
+"""
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import cache as versions
+
+RUNNING = 'running'
+STOPPED = 'stopped'
+UNKNOWN = 'unknown'
+
+
+def _key(server_pk) -> str:
+    return f'status:server:{server_pk}'
+
+
+def normalize_listing(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Convierte el listado remoto a {cliente: {'state': ..., 'ports': {puerto: estado}}}.
+    Formato esperado: {"clients": [{"client": "x", "running": true,
+                                     "ports": [{"port": 9000, "running": true}]}]}
+    """
+    clients = {}
+    for item in data.get('clients', []):
+        name = item.get('client') or item.get('name')
+        if not name:
+            continue
+        ports = {}
+        for port in item.get('ports', []):
+            if isinstance(port, dict):
+                ports[int(port['port'])] = RUNNING if port.get('running') else STOPPED
+            else:
+                ports[int(port)] = RUNNING if item.get('running') else STOPPED
+        clients[name] = {
+            'state': RUNNING if item.get('running') else STOPPED,
+            'ports': ports,
+        }
+    return clients
+
+
+def _bump_if_changed(server_pk, reachable: bool, clients: Dict[str, Dict[str, Any]]) -> None:
+    """Invalida las páginas que muestran el estado solo si este cambió (ETag de las vistas)"""
+    previous = get_server_status(server_pk)
+    if previous is None or previous['reachable'] != reachable or previous['clients'] != clients:
+        versions.bump_version('status', versions.status_scope(server_pk))
+
+
+def store_server_status(server_pk, clients: Dict[str, Dict[str, Any]]) -> None:
+    _bump_if_changed(server_pk, True, clients)
+    cache.set(_key(server_pk), {
+        'reachable': True,
+        'collected_at': time.time(),
+        'clients': clients,
+    }, settings.CLIENT_STATUS_TTL)
+
+
+def store_server_error(server_pk, error: str) -> None:
+    _bump_if_changed(server_pk, False, {})
+    cache.set(_key(server_pk), {
+        'reachable': False,
+        'collected_at': time.time(),
+        'error': error,
+        'clients': {},
+    }, settings.CLIENT_STATUS_TTL)
+
+
+def get_server_status(server_pk) -> Optional[Dict[str, Any]]:
+    return cache.get(_key(server_pk))
+
+
+def get_servers_status(server_pks: Iterable) -> Dict[Any, Dict[str, Any]]:
+    """Estado de varios servidores en una sola lectura de caché"""
+    server_pks = set(server_pks)
+    found = cache.get_many([_key(pk) for pk in server_pks])
+    return {pk: found[_key(pk)] for pk in server_pks if _key(pk) in found}
+
+
+async def aget_servers_status(server_pks: Iterable) -> Dict[Any, Dict[str, Any]]:
+    """Versión asíncrona de get_servers_status para vistas async"""
+    server_pks = set(server_pks)
+    found = await cache.aget_many([_key(pk) for pk in server_pks])
+    return {pk: found[_key(pk)] for pk in server_pks if _key(pk) in found}
+
+
+def _client_status(client, servers) -> Dict[str, Any]:
+    server_status = servers.get(client.server_id)
+    if server_status and server_status['reachable']:
+        return server_status['clients'].get(client.username, {'state': STOPPED, 'ports': {}})
+    return {'state': UNKNOWN, 'ports': {}}
+
+
+def get_clients_status(clients: Iterable) -> Dict[str, Dict[str, Any]]:
+    """
+    Estado de cada cliente: {'state': running|stopped|unknown, 'ports': {puerto: estado}}.
+    'unknown' si no hay datos recientes o el servidor no respondió.
+    """
+    clients = list(clients)
+    servers = get_servers_status(c.server_id for c in clients if c.server_id)
+    return {client.username: _client_status(client, servers) for client in clients}
+
+
+async def aget_clients_status(clients: Iterable) -> Dict[str, Dict[str, Any]]:
+    """Versión asíncrona de get_clients_status para vistas async"""
+    clients = list(clients)
+    servers = await aget_servers_status(c.server_id for c in clients if c.server_id)
+    return {client.username: _client_status(client, servers) for client in clients}
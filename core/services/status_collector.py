@@ -0,0 +1,32 @@
+import logging
+from typing import Dict, Iterable
+
+from core.models import Server
+from core.services import backends, bulk_actions, status_cache
+
+logger = logging.getLogger(__name__)
+
+
+def collect_status(servers: Iterable[Server] = None) -> Dict[str, int]:
+    """
+    Consulta el listado de clientes de cada servidor en paralelo y actualiza la caché de estado.
+
+    Returns:
+        dict: cantidad de servidores 'ok' y con 'error'
+    """
+    servers = list(servers if servers is not None else Server.objects.all())
+    outcomes = bulk_actions.run_per_server(
+        ((server, backends.get_backend(server).list_clients) for server in servers),
+        per_server_limit=1,
+    )
+
+    summary = {'ok': 0, 'error': 0}
+    for server, outcome in zip(servers, outcomes):
+        if outcome['ok']:
+            clients = status_cache.normalize_listing(outcome['result']['data'])
+            status_cache.store_server_status(server.pk, clients)
+            summary['ok'] += 1
+        else:
+            status_cache.store_server_error(server.pk, str(outcome['error']))
+            summary['error'] += 1
+    return summary
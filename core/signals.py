@@ -0,0 +1,61 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import cache
+from core.models import Server, User
+from core.services import (
+    async_client_api_service,
+    async_client_ssh_service,
+    backends,
+    client_api_service,
+    client_ssh_service,
+    port_allocator,
+)
+
+
+def _invalidate_connections(server, hosts):
+    """Descarta los backends cacheados y las conexiones HTTP y SSH abiertas hacia el servidor"""
+    backends.invalidate(server.pk)
+    client_api_service.invalidate_sessions(server.pk)
+    async_client_api_service.invalidate_clients(server.pk)
+    for host in hosts:
+        client_ssh_service.invalidate_connections(host)
+        async_client_ssh_service.invalidate_connections(host)
+
+
+@receiver(post_save, sender=Server)
+def server_saved(sender, instance, created, **kwargs):
+    """Invalida solo lo que depende de los campos que cambiaron"""
+    cache.bump_version('servers')
+    if created:
+        return
+
+    changed = instance.get_changed_fields()
+    if changed & {'host', 'initial_port', 'final_port'}:
+        # Las tarjetas del dashboard muestran host y rango del servidor
+        cache.bump_version(cache.server_scope(instance.pk))
+    if changed & set(Server.CONNECTION_FIELDS):
+        # Cambiar solo el transporte o el soporte de lotes reconstruye el backend sin cerrar las conexiones
+        backends.invalidate(instance.pk)
+    if changed & (set(Server.CONNECTION_FIELDS) - set(Server.BACKEND_ONLY_FIELDS)):
+        previous_host = getattr(instance, '_loaded_values', {}).get('host', instance.host)
+        _invalidate_connections(instance, {previous_host, instance.host})
+    if changed & {'initial_port', 'final_port'}:
+        port_allocator.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=Server)
+def server_deleted(sender, instance, **kwargs):
+    cache.bump_version('servers', 'clients', 'ports', cache.server_scope(instance.pk))
+    _invalidate_connections(instance, {instance.host})
+    port_allocator.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Iniciar sesión guarda last_login (y la contraseña si se rehashea): no cambia ninguna página
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    # Borrar un cliente elimina en cascada sus puertos asignados
+    cache.bump_version('clients', 'ports', cache.client_scope(instance.pk))
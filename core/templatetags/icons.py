@@ -0,0 +1,36 @@
+"""
+Iconos SVG de templates/icons/ para las plantillas.
+
+{% icon 'refresh' size=16 class='mr-1' %} produce el mismo SVG que
+{% include 'icons/refresh_icon.html' with size="16" class="mr-1" %}, pero cada combinación
+(icono, tamaño, clase) se renderiza una sola vez por proceso y después se sirve desde memoria,
+sin resolver ni renderizar una plantilla por cada botón de cada fila.
+"""
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+@lru_cache(maxsize=512)
+def _render(name, size, css_class):
+    context = {}
+    if size:
+        context['size'] = size
+    if css_class:
+        context['class'] = css_class
+    return mark_safe(render_to_string(f'icons/{name}_icon.html', context).strip())
+
+
+@register.simple_tag
+def icon(name, size='', **kwargs):
+    """Uso: {% icon 'users' size=20 class='text-blue-600 mr-2' %}"""
+    css_class = kwargs.get('class', '')
+    if settings.DEBUG:
+        # En desarrollo se renderiza siempre para ver los cambios en los SVG al momento
+        return _render.__wrapped__(name, str(size), css_class)
+    return _render(name, str(size), css_class)
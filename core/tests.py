@@ -1,3 +1,1241 @@
-from django.test import TestCase
+from datetime import timedelta
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import cache, middleware
+from core.fakes import FakeFleet
+from core.models import Job, PortServer, Server, User
+from core.services import (
+    async_client_api_service,
+    async_client_ssh_service,
+    backends,
+    bulk_actions,
+    bulk_import,
+    client_api_service,
+    client_ssh_service,
+    jobs,
+    metrics,
+    passwords,
+    placement,
+    port_allocator,
+    reconciliation,
+    resilience,
+    status_cache,
+    status_collector,
+)
+from core.services.client_api_service import APIException
+from core.templatetags import icons
+
+
+def _reset_server_state(server_pk):
+    """Estado por proceso asociado a un servidor (bitmaps, backends, sesiones, circuitos)"""
+    port_allocator.invalidate(server_pk)
+    backends.invalidate(server_pk)
+    client_api_service.invalidate_sessions(server_pk)
+    resilience._breakers.pop(server_pk, None)
+    for key in [k for k in resilience._latencies if k[0] == server_pk]:
+        del resilience._latencies[key]
+
+
+class ServerTestMixin:
+    def make_server(self, host='srv.local', initial_port=1000, final_port=1009, **extra):
+        server = Server.objects.create(host=host, initial_port=initial_port, final_port=final_port, **extra)
+        _reset_server_state(server.pk)
+        self.addCleanup(_reset_server_state, server.pk)
+        return server
+
+    def make_client(self, username, server, ports=()):
+        client = User.objects.create(username=username, role='client', server=server)
+        PortServer.objects.bulk_create(
+            PortServer(server=server, port_number=port, assigned_client=client) for port in ports
+        )
+        return client
+
+
+class APISessionPoolTests(ServerTestMixin, TestCase):
+    def test_services_of_a_server_share_one_session(self):
+        server = self.make_server()
+
+        session = client_api_service.ClientAPIService(server).session
+
+        self.assertIs(client_api_service.ClientAPIService(server).session, session)
+        self.assertEqual(session.headers['X-API-Key'], server.api_key)
+        self.assertEqual(session.headers['Connection'], 'keep-alive')
+
+    def test_new_api_key_gets_a_new_session(self):
+        server = self.make_server(api_key='vieja')
+        session = client_api_service.get_session(server)
+
+        server.api_key = 'nueva'
+        server.save()
+
+        self.assertIsNot(client_api_service.get_session(server), session)
+        self.assertEqual(client_api_service.get_session(server).headers['X-API-Key'], 'nueva')
+
+    def test_invalidate_closes_the_sessions_of_the_server(self):
+        server = self.make_server()
+        session = client_api_service.get_session(server)
+
+        with mock.patch.object(session, 'close') as close:
+            client_api_service.invalidate_sessions(server.pk)
+
+        close.assert_called_once_with()
+        self.assertIsNot(client_api_service.get_session(server), session)
+
+
+class AsyncBackendTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        self.fleet = FakeFleet()
+        self.server = self.make_server()
+        self.fleet.apply(self.server.host, 'create', 'c1', [1000])
+
+        def build_client(api_key):
+            def handle(request):
+                path = request.url.path[len('/api'):]
+                body = json.loads(request.content) if request.content else {}
+                status, payload = self.fleet.handle_http(self.server.host, request.method, path, body)
+                return httpx.Response(status, json=payload)
+            return httpx.AsyncClient(transport=httpx.MockTransport(handle), headers={'X-API-Key': api_key})
+
+        patcher = mock.patch.object(async_client_api_service, '_build_client', build_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_async_backend_runs_actions_and_reports_errors(self):
+        service = backends.get_async_backend(self.server)
+
+        self.assertIn('stop c1', (await service.stop_client('c1'))['message'])
+        self.assertFalse(self.fleet.clients[self.server.host]['c1']['running'])
+        with self.assertRaisesMessage(APIException, 'no existe'):
+            await service.restart_client('nope')
+
+    def test_client_action_view(self):
+        self.make_client('c1', self.server, [1000])
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+
+        response = self.client.post(reverse('client_action', args=['c1', 'stop']))
+
+        self.assertRedirects(response, reverse('client_list'), fetch_redirect_response=False)
+        self.assertFalse(self.fleet.clients[self.server.host]['c1']['running'])
+
+
+class _FakeSSHClient:
+    def __init__(self):
+        self.transport = SimpleNamespace(active=True, is_active=lambda: self.transport.active,
+                                         set_keepalive=lambda interval: None)
+        self.closed = False
+
+    def get_transport(self):
+        return self.transport
+
+    def close(self):
+        self.closed = True
+        self.transport.active = False
+
+
+class SSHTransportPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.clients = []
+
+        def connect(service):
+            self.clients.append(_FakeSSHClient())
+            return self.clients[-1]
+
+        patcher = mock.patch.object(client_ssh_service.ClientSSHService, '_get_connection', connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(client_ssh_service.invalidate_connections, 'ssh.local')
+
+    def service(self, password='secreto'):
+        server = SimpleNamespace(pk=1, host='ssh.local', ssh_port=22, ssh_username='root', ssh_password=password)
+        return client_ssh_service.ClientSSHService(server)
+
+    def test_transport_is_reused_and_reconnected_when_dead(self):
+        service = self.service()
+        transport = service._get_transport()
+
+        self.assertIs(self.service()._get_transport(), transport)
+        self.clients[0].transport.active = False
+        self.assertIsNot(service._get_transport(), transport)
+        self.assertEqual(len(self.clients), 2)
+        self.assertTrue(self.clients[0].closed)
+
+    def test_new_password_opens_a_new_transport(self):
+        first = self.service('vieja')._get_transport()
+
+        self.assertIsNot(self.service('nueva')._get_transport(), first)
+
+    @override_settings(CLIENT_SSH_IDLE_TIMEOUT=60)
+    def test_idle_transports_are_reaped_with_their_connect_lock(self):
+        service = self.service()
+        service._get_transport()
+        key = service._pool_key()
+        client_ssh_service._pool[key].last_used -= 120
+
+        client_ssh_service._reap_idle_transports()
+
+        self.assertTrue(self.clients[0].closed)
+        self.assertNotIn(key, client_ssh_service._pool)
+        self.assertNotIn(key, client_ssh_service._connect_locks)
+
+
+class BulkActionsTests(SimpleTestCase):
+    def setUp(self):
+        self.servers = [SimpleNamespace(pk=pk, host=f'srv{pk}.local') for pk in (1, 2)]
+        self.lock = threading.Lock()
+        self.running = {pk: 0 for pk in (1, 2)}
+        self.peak = {pk: 0 for pk in (1, 2)}
+        self.calls = []
+
+    def task(self, server, value):
+        def fn():
+            with self.lock:
+                self.calls.append(value)
+                self.running[server.pk] += 1
+                self.peak[server.pk] = max(self.peak[server.pk], self.running[server.pk])
+            time.sleep(0.005)
+            with self.lock:
+                self.running[server.pk] -= 1
+            if value == 'falla':
+                raise ValueError('sin respuesta')
+            return value
+        return server, fn
+
+    def test_results_keep_task_order_and_failures(self):
+        tasks = [self.task(self.servers[0], 'a'), self.task(self.servers[1], 'falla'), self.task(self.servers[0], 'b')]
+
+        results = bulk_actions.run_per_server(tasks, max_workers=4, per_server_limit=1)
+
+        self.assertEqual(results[0], {'ok': True, 'result': 'a'})
+        self.assertFalse(results[1]['ok'])
+        self.assertIsInstance(results[1]['error'], ValueError)
+        self.assertEqual(results[2], {'ok': True, 'result': 'b'})
+
+    def test_per_server_limit(self):
+        tasks = [self.task(server, index) for index in range(10) for server in self.servers]
+
+        bulk_actions.run_per_server(tasks, max_workers=8, per_server_limit=2)
+
+        self.assertLessEqual(max(self.peak.values()), 2)
+        self.assertEqual(len(self.calls), 20)
+
+    def test_abandoned_iteration_submits_no_more_tasks(self):
+        tasks = [self.task(self.servers[0], index) for index in range(10)]
+
+        iterator = bulk_actions.iter_per_server(tasks, max_workers=2, per_server_limit=1)
+        next(iterator)
+        iterator.close()
+
+        self.assertLessEqual(len(self.calls), 2)
+
+
+class ClientBatchTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        self.fleet = FakeFleet()
+
+    def server(self, **extra):
+        server = self.make_server(**extra)
+        self.fleet.mount(server)
+        for name in ('a', 'b', 'c'):
+            self.fleet.apply(server.host, 'create', name, [])
+        return server
+
+    def requests(self, service):
+        """Cuenta las peticiones HTTP del servicio (cada operación de un lote pasa por el doble)"""
+        return mock.patch.object(service, '_make_request', wraps=service._make_request)
+
+    def restart_all(self, service, names=('a', 'b', 'c')):
+        with service.batch() as batch:
+            results = [batch.restart_client(name) for name in names]
+        return results
+
+    def test_batch_is_one_request_when_the_server_supports_it(self):
+        service = backends.get_backend(self.server(supports_batch=True))
+
+        with self.requests(service) as request:
+            results = self.restart_all(service, ('a', 'b', 'nope'))
+
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual([result.ok for result in results], [True, True, False])
+
+    def test_batch_falls_back_to_single_requests(self):
+        service = backends.get_backend(self.server())
+
+        with self.requests(service) as request:
+            results = self.restart_all(service)
+
+        self.assertEqual(request.call_count, 3)
+        self.assertTrue(all(result.ok for result in results))
+
+    def test_results_that_do_not_match_the_operations_fail_the_batch(self):
+        service = backends.get_backend(self.server(supports_batch=True))
+        response = {'status': 'success', 'message': '', 'data': {'results': [{'success': True}]}}
+
+        with mock.patch.object(service, '_make_request', return_value=response):
+            results = self.restart_all(service)
+
+        self.assertFalse(any(result.ok for result in results))
+        self.assertIn('1 resultados para 3 operaciones', str(results[0].error))
+
+    @override_settings(CLIENT_BATCH_WINDOW=5)
+    def test_batched_transport_sends_a_lone_operation_at_once(self):
+        service = backends.get_backend(self.server(transport=Server.TRANSPORT_BATCHED, supports_batch=True))
+
+        started = time.monotonic()
+        service.restart_client('a')
+
+        self.assertLess(time.monotonic() - started, 1)
+
+    @override_settings(CLIENT_BATCH_WINDOW=0.2)
+    def test_batched_transport_groups_concurrent_operations(self):
+        service = backends.get_backend(self.server(transport=Server.TRANSPORT_BATCHED, supports_batch=True))
+        names = ['a', 'b', 'c'] * 4
+
+        with self.requests(service) as request:
+            threads = [threading.Thread(target=service.restart_client, args=(name,)) for name in names]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertLess(request.call_count, len(names))
+
+    def test_batched_transport_without_batch_support_sends_single_requests(self):
+        service = backends.get_backend(self.server(transport=Server.TRANSPORT_BATCHED))
+
+        with self.requests(service) as request:
+            service.restart_client('a')
+
+        request.assert_called_once_with('POST', '/clients/a/restart', action='restart')
+
+
+class BackendRegistryTests(ServerTestMixin, TestCase):
+    def test_transport_selects_the_backend_class(self):
+        expected = {
+            Server.TRANSPORT_REST: (client_api_service.ClientAPIService, async_client_api_service.AsyncClientAPIService),
+            Server.TRANSPORT_BATCHED: (client_api_service.BatchedClientAPIService,
+                                       async_client_api_service.AsyncClientAPIService),
+            Server.TRANSPORT_SSH: (client_ssh_service.ClientSSHService, async_client_ssh_service.AsyncClientSSHService),
+            Server.TRANSPORT_REST_LEGACY: (client_api_service.LegacyClientAPIService,
+                                           async_client_api_service.AsyncLegacyClientAPIService),
+        }
+        self.assertEqual(set(backends.transports()), set(expected))
+        for transport, (sync_class, async_class) in expected.items():
+            server = self.make_server(f'{transport}.local', ssh_username='root', ssh_password='x', transport=transport)
+            self.assertIs(type(backends.get_backend(server)), sync_class)
+            self.assertIs(type(backends.get_async_backend(server)), async_class)
+
+    def test_instances_are_rebuilt_only_when_the_connection_changes(self):
+        server = self.make_server()
+        backend = backends.get_backend(server)
+
+        server.final_port = 1099
+        self.assertIs(backends.get_backend(server), backend)
+
+        server.api_key = 'otra'
+        self.assertIsNot(backends.get_backend(server), backend)
+
+    def test_saving_a_new_transport_switches_the_backend(self):
+        server = self.make_server()
+        backends.get_backend(server)
+
+        server.transport = Server.TRANSPORT_REST_LEGACY
+        server.save()
+
+        self.assertIsInstance(backends.get_backend(Server.objects.get(pk=server.pk)),
+                              client_api_service.LegacyClientAPIService)
+
+    def test_unknown_transport(self):
+        with self.assertRaises(backends.UnknownTransport):
+            backends.get_backend(SimpleNamespace(pk=None, transport='telnet', CONNECTION_FIELDS=('transport',)))
+
+
+class PortStorageTests(ServerTestMixin, TestCase):
+    def test_only_assigned_ports_are_stored(self):
+        server = self.make_server(final_port=1999)
+
+        self.assertFalse(PortServer.objects.filter(server=server).exists())
+        self.assertEqual(server.total_ports, 1000)
+        self.assertEqual(port_allocator.free_count(server), 1000)
+
+    def test_deleting_a_client_frees_its_ports(self):
+        server = self.make_server()
+        client = self.make_client('c1', server, [1000, 1001])
+        self.assertEqual(server.check_ports_availability([1001, 1002]), (False, "El puerto 1001 ya está ocupado."))
+
+        client.delete()
+
+        self.assertEqual(server.check_ports_availability([1001, 1002]), (True, None))
+
+    def test_ports_outside_the_range_are_not_available(self):
+        server = self.make_server()
+
+        ok, message = server.check_ports_availability([1010])
+
+        self.assertFalse(ok)
+        self.assertIn('fuera del rango permitido (1000-1009)', message)
+
+
+class ServerRangeTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        self.server = self.make_server()
+        self.make_client('c1', self.server, [1000, 1008])
+
+    def test_shrinking_over_assigned_ports_is_rejected(self):
+        self.server.final_port = 1005
+
+        with self.assertRaisesMessage(ValidationError, 'hay 1 puertos asignados fuera del nuevo rango (1008)'):
+            self.server.clean()
+
+    def test_widening_frees_more_ports(self):
+        self.assertEqual(port_allocator.free_count(self.server), 8)
+
+        self.server.final_port = 1019
+        self.server.clean()
+        self.server.save()
+
+        self.assertEqual(port_allocator.free_count(self.server), 18)
+
+    def test_editing_without_a_range_change_does_not_query_ports(self):
+        server = Server.objects.get(pk=self.server.pk)
+        server.api_key = 'nueva'
+
+        self.assertEqual(server.get_changed_fields(), {'api_key'})
+        with self.assertNumQueries(0):
+            server.clean()
+
+
+class PortAllocatorTests(ServerTestMixin, TestCase):
+    def test_takes_lowest_free_ports(self):
+        server = self.make_server()
+        self.make_client('ocupado', server, [1000, 1002])
+        client = self.make_client('nuevo', server)
+
+        ports = port_allocator.allocate_ports(server, client, 3)
+
+        self.assertEqual(ports, [1001, 1003, 1004])
+        self.assertEqual(
+            sorted(PortServer.objects.filter(assigned_client=client).values_list('port_number', flat=True)), ports
+        )
+
+    def test_contiguous_skips_fragmented_gaps(self):
+        server = self.make_server()
+        self.make_client('ocupado', server, [1001, 1003])
+        client = self.make_client('nuevo', server)
+
+        self.assertEqual(port_allocator.allocate_ports(server, client, 3, contiguous=True), [1004, 1005, 1006])
+
+    def test_contiguous_without_block_allocates_nothing(self):
+        server = self.make_server(final_port=1004)
+        self.make_client('ocupado', server, [1002])
+        client = self.make_client('nuevo', server)
+
+        with self.assertRaises(port_allocator.PortAllocationError):
+            port_allocator.allocate_ports(server, client, 3, contiguous=True)
+        self.assertEqual(port_allocator.free_count(server), 4)
+        self.assertFalse(PortServer.objects.filter(assigned_client=client).exists())
+
+    def test_batch_is_all_or_nothing(self):
+        server = self.make_server(final_port=1004)
+        first, second = self.make_client('a', server), self.make_client('b', server)
+
+        with self.assertRaises(port_allocator.PortAllocationError):
+            port_allocator.allocate_batch(server, [(first, 3), (second, 3)])
+        self.assertEqual(port_allocator.free_count(server), 5)
+        self.assertFalse(PortServer.objects.filter(server=server).exists())
+
+    def test_conflict_with_another_process_rebuilds_bitmap(self):
+        server = self.make_server()
+        client = self.make_client('nuevo', server)
+        self.assertEqual(port_allocator.free_count(server), 10)  # bitmap construido
+        # Otro proceso asigna puertos que este bitmap todavía cree libres
+        self.make_client('otro', server, [1000, 1001])
+
+        ports = port_allocator.allocate_ports(server, client, 2)
+
+        self.assertEqual(ports, [1002, 1003])
+        self.assertEqual(port_allocator.free_count(server), 6)
+
+
+LOCMEM_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'tests-{alias}'}
+    for alias in ('default', 'fragments')
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SERVER_STATS_CACHE_TTL=30)
+class ServerUsageTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.first = self.make_server('a.local')
+        self.second = self.make_server('b.local', 2000, 2099)
+        self.make_client('c1', self.first, [1000, 1001])
+        self.make_client('c2', self.first, [1002])
+        self.make_client('c3', self.second)
+
+    def test_with_usage_counts_clients_and_ports_in_one_query(self):
+        with self.assertNumQueries(1):
+            usage = {server.host: (server.clients_count, server.used_ports_count) for server in Server.objects.with_usage()}
+
+        self.assertEqual(usage, {'a.local': (2, 3), 'b.local': (1, 0)})
+
+    def test_stats_are_cached_until_ports_change(self):
+        stats = cache.get_server_stats()
+        self.assertEqual(stats[self.second.pk], {'clients_count': 1, 'used_ports_count': 0, 'total_ports': 100})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get_server_stats(), stats)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            port_allocator.allocate_ports(self.second, User.objects.get(username='c3'), 2)
+
+        self.assertEqual(cache.get_server_stats()[self.second.pk]['used_ports_count'], 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ListQueryCountTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        self.servers = [self.make_server(f'srv{index}.local', 1000, 1099) for index in range(2)]
+
+    def add_clients(self, start, count):
+        for index in range(start, start + count):
+            server = self.servers[index % 2]
+            self.make_client(f'c{index:03d}', server, [1000 + index * 2, 1001 + index * 2])
+
+    def get(self, url):
+        # Caché fría: los fragmentos de fila no ocultan consultas por fila
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def assert_constant_queries(self, url):
+        self.add_clients(0, 2)
+        with CaptureQueriesContext(connection) as baseline:
+            self.get(url)
+        self.add_clients(2, 10)
+        self.make_server('srv2.local', 1000, 1099)
+
+        with self.assertNumQueries(len(baseline)):
+            self.get(url)
+
+    def test_client_list_queries_do_not_grow_with_clients(self):
+        self.assert_constant_queries(reverse('client_list'))
+
+    def test_server_list_queries_do_not_grow_with_servers(self):
+        self.assert_constant_queries(reverse('server_list'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StatusCacheTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.fleet = FakeFleet()
+        self.up = self.make_server('up.local')
+        self.down = self.make_server('down.local')
+        self.fleet.apply('up.local', 'create', 'activo', [1000, 1001])
+        self.fleet.apply('up.local', 'create', 'parado', [1002])
+        self.fleet.apply('up.local', 'stop', 'parado')
+
+    def list_or_fail(self, service):
+        if service.server.pk == self.down.pk:
+            raise APIException('sin respuesta')
+        _, listing = self.fleet.apply('up.local', 'list')
+        return {'status': 'success', 'message': '', 'data': listing}
+
+    def test_normalize_listing_accepts_port_objects_and_numbers(self):
+        clients = status_cache.normalize_listing({'clients': [
+            {'client': 'a', 'running': True, 'ports': [{'port': '9000', 'running': False}]},
+            {'name': 'b', 'running': True, 'ports': [9001]},
+            {'running': True},
+        ]})
+
+        self.assertEqual(clients, {
+            'a': {'state': status_cache.RUNNING, 'ports': {9000: status_cache.STOPPED}},
+            'b': {'state': status_cache.RUNNING, 'ports': {9001: status_cache.RUNNING}},
+        })
+
+    def test_collector_feeds_the_client_status(self):
+        clients = [
+            self.make_client('activo', self.up), self.make_client('parado', self.up),
+            self.make_client('nuevo', self.up), self.make_client('caido', self.down),
+        ]
+
+        with mock.patch.object(client_api_service.ClientAPIService, 'list_clients', autospec=True,
+                               side_effect=self.list_or_fail):
+            self.assertEqual(status_collector.collect_status(), {'ok': 1, 'error': 1})
+
+        statuses = status_cache.get_clients_status(clients)
+        self.assertEqual(statuses['activo'], {'state': 'running', 'ports': {1000: 'running', 1001: 'running'}})
+        self.assertEqual(statuses['parado']['state'], 'stopped')
+        self.assertEqual(statuses['nuevo'], {'state': 'stopped', 'ports': {}})
+        self.assertEqual(statuses['caido'], {'state': 'unknown', 'ports': {}})
+        self.assertFalse(status_cache.get_server_status(self.down.pk)['reachable'])
+
+    def test_status_version_only_changes_with_the_status(self):
+        clients = {'a': {'state': status_cache.RUNNING, 'ports': {}}}
+        with self.captureOnCommitCallbacks(execute=True):
+            status_cache.store_server_status(self.up.pk, clients)
+        version = cache.get_versions('status')
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            status_cache.store_server_status(self.up.pk, clients)
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            status_cache.store_server_error(self.up.pk, 'timeout')
+        self.assertGreater(cache.get_versions('status'), version)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, DASHBOARD_CACHE_TTL=300, CLIENT_PICKER_PAGE_SIZE=2)
+class DashboardCacheTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.server = self.make_server('srv.local', 1000, 1009)
+        self.owner = self.make_client('cliente', self.server, [1001, 1000])
+
+    def test_client_ports_are_served_from_cache(self):
+        ports = cache.get_client_ports(self.owner)
+        self.assertEqual([port['port_number'] for port in ports], [1000, 1001])
+        self.assertEqual(ports[1]['mobile_index'], 2)
+        self.assertEqual(ports[0]['server_name'], 'srv.local (1000-1009)')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get_client_ports(self.owner), ports)
+
+    def test_port_changes_invalidate_the_client_entry(self):
+        cache.get_client_ports(self.owner)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            port_allocator.allocate_ports(self.server, self.owner, 1)
+
+        self.assertEqual(len(cache.get_client_ports(self.owner)), 3)
+
+    def test_server_range_changes_invalidate_the_cards(self):
+        cache.get_client_ports(self.owner)
+
+        self.server.final_port = 1019
+        with self.captureOnCommitCallbacks(execute=True):
+            self.server.save()
+
+        self.assertEqual(cache.get_client_ports(self.owner)[0]['server_name'], 'srv.local (1000-1019)')
+
+    def test_home_shows_the_client_ports(self):
+        self.client.force_login(self.owner)
+
+        response = self.client.get(reverse('home'))
+
+        self.assertEqual([port['port_number'] for port in response.context['ports_info']], [1000, 1001])
+        self.assertEqual(response.context['ports_info'][0]['status'], 'unknown')
+
+    def test_client_picker_paginates_and_filters(self):
+        for name in ('otro1', 'otro2'):
+            self.make_client(name, self.server)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+
+        first = self.client.get(reverse('client_picker')).json()
+        second = self.client.get(reverse('client_picker'), {'page': 2}).json()
+        filtered = self.client.get(reverse('client_picker'), {'q': 'OTRO'}).json()
+
+        self.assertEqual([row['username'] for row in first['results']], ['cliente', 'otro1'])
+        self.assertTrue(first['has_next'])
+        self.assertEqual([row['username'] for row in second['results']], ['otro2'])
+        self.assertFalse(second['has_next'])
+        self.assertEqual([row['username'] for row in filtered['results']], ['otro1', 'otro2'])
+
+    def test_client_picker_is_admin_only(self):
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(reverse('client_picker')).status_code, 403)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CLIENT_STATUS_TTL=60)
+class ConditionalGetTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        self.make_server()
+
+    def get(self, url):
+        # La primera visita emite la cookie CSRF, que forma parte del ETag
+        self.client.get(url)
+        return self.client.get(url)
+
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_page_is_not_rendered_again(self):
+        url = reverse('server_list')
+        first = self.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertIn('private', first['Cache-Control'])
+
+        second = self.revalidate(url, first)
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.templates, [])
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_data_changes_produce_a_new_etag(self):
+        url = reverse('server_list')
+        first = self.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_server('otro.local')
+
+        second = self.revalidate(url, first)
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+    def test_querystring_is_part_of_the_etag(self):
+        url = reverse('server_list')
+        first = self.get(url)
+
+        self.assertEqual(self.revalidate(url, first, page=2).status_code, 200)
+
+    def test_status_pages_expire_with_the_status_ttl(self):
+        url = reverse('client_list')
+        with mock.patch('core.views.mixins.time.time', return_value=6000.0):
+            first = self.get(url)
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        with mock.patch('core.views.mixins.time.time', return_value=6060.0):
+            self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STATUS_STREAM_INTERVAL=0.01, STATUS_STREAM_MAX_AGE=0.1)
+class StatusStreamTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.server = self.make_server()
+        self.own = self.make_client('propio', self.server, [1000])
+        self.other = self.make_client('ajeno', self.server, [1001])
+        status_cache.store_server_status(self.server.pk, {
+            'propio': {'state': status_cache.RUNNING, 'ports': {1000: status_cache.RUNNING}},
+        })
+
+    async def events(self, user, query=''):
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(reverse('status_stream') + query)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = [chunk.decode() async for chunk in response.streaming_content]
+        return [json.loads(chunk.split('data: ', 1)[1]) for chunk in chunks if chunk.startswith('event: status')]
+
+    async def test_client_receives_only_its_own_status_once(self):
+        events = await self.events(self.own)
+
+        self.assertEqual(events, [{'clients': {'propio': {'state': 'running', 'ports': {'1000': 'running'}}}}])
+
+    async def test_admin_chooses_the_clients(self):
+        admin = await User.objects.acreate(username='admin', is_staff=True, is_superuser=True)
+
+        events = await self.events(admin, f'?client_id={self.other.pk}')
+
+        self.assertEqual(list(events[0]['clients']), ['ajeno'])
+
+    async def test_other_users_are_forbidden(self):
+        await self.async_client.aforce_login(await User.objects.acreate(username='otro'))
+
+        response = await self.async_client.get(reverse('status_stream'))
+
+        self.assertEqual(response.status_code, 403)
+
+
+class BulkImportTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        self.small = self.make_server('dup.local', 1000, 1004)
+        self.large = self.make_server('dup.local', 2000, 2099)
+        self.unique = self.make_server('unico.local', 3000, 3009)
+
+    def import_rows(self, *rows):
+        rows = [
+            {'line': line, 'username': username, 'server': server, 'num_ports': num_ports, 'password': 'x'}
+            for line, (username, server, num_ports) in enumerate(rows, start=1)
+        ]
+        return list(bulk_import.import_clients(rows, remote=False))
+
+    def test_parse_rows(self):
+        rows = bulk_import.parse_rows(io.StringIO("username,server,num_ports\n a ,unico.local,2\n"), 'csv')
+        self.assertEqual(rows, [{'line': 1, 'username': 'a', 'server': 'unico.local', 'num_ports': '2', 'password': ''}])
+
+        rows = bulk_import.parse_rows(io.StringIO('{"clients": [{"username": "b", "server": 1, "num_ports": 1}]}'), 'json')
+        self.assertEqual(rows[0]['server'], '1')
+
+        with self.assertRaises(bulk_import.BulkImportError):
+            bulk_import.parse_rows(io.StringIO('{"clients": '), 'json')
+
+    def test_servers_resolve_by_id_label_or_unique_host(self):
+        events = self.import_rows(
+            ('a', str(self.small.pk), 1), ('b', str(self.large), 1), ('c', 'unico.local', 1), ('d', 'dup.local', 1),
+        )
+
+        created = {event['username']: event['server'] for event in events if event['event'] == 'created'}
+        self.assertEqual(created, {'a': 'dup.local', 'b': 'dup.local', 'c': 'unico.local'})
+        self.assertEqual(User.objects.get(username='b').server, self.large)
+        error, = [event for event in events if event['event'] == 'error']
+        self.assertEqual((error['username'], error['line']), ('d', 4))
+        self.assertIn('varios servidores', error['message'])
+
+    def test_invalid_rows_are_reported(self):
+        self.make_client('existente', self.unique)
+
+        events = self.import_rows(('', 'unico.local', 1), ('existente', 'unico.local', 1),
+                                  ('nuevo', 'otro.local', 1), ('nuevo2', 'unico.local', 'x'))
+
+        self.assertEqual([event['line'] for event in events if event['event'] == 'error'], [1, 2, 3, 4])
+        self.assertEqual(events[-1]['errors'], 4)
+
+    def test_rows_that_do_not_fit_are_rejected_one_by_one(self):
+        events = self.import_rows(('a', str(self.small.pk), 3), ('b', str(self.small.pk), 3), ('c', str(self.small.pk), 2))
+
+        self.assertEqual([(event['event'], event['username']) for event in events[:-1]],
+                         [('error', 'b'), ('created', 'a'), ('created', 'c')])
+        self.assertEqual(events[-1]['queued'], 2)
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_PENDING).count(), 2)
+        self.assertEqual(port_allocator.free_count(self.small), 0)
+
+
+class ClientPasswordTests(SimpleTestCase):
+    def test_client_passwords_use_the_client_hasher(self):
+        password_hash = passwords.hash_client_password('secreto')
+
+        self.assertTrue(password_hash.startswith('client_scrypt$'))
+        self.assertTrue(check_password('secreto', password_hash))
+        self.assertTrue(make_password('secreto').startswith('pbkdf2_sha256$'))
+
+    @override_settings(PASSWORD_HASH_POOL_THRESHOLD=3, PASSWORD_HASH_WORKERS=2)
+    def test_only_large_batches_use_the_process_pool(self):
+        with mock.patch.object(passwords, '_get_pool') as get_pool:
+            get_pool.return_value.map.side_effect = lambda fn, items, chunksize: map(fn, items)
+
+            self.assertEqual(len(passwords.hash_client_passwords(['a', 'b'])), 2)
+            get_pool.assert_not_called()
+
+            hashes = passwords.hash_client_passwords(['a', 'b', 'c'])
+            get_pool.assert_called_once_with()
+
+        self.assertTrue(all(check_password(raw, password_hash) for raw, password_hash in zip('abc', hashes)))
+
+
+class IconTagTests(SimpleTestCase):
+    def setUp(self):
+        icons._render.cache_clear()
+
+    def render(self, source):
+        return Template('{% load icons %}' + source).render(Context())
+
+    def test_matches_the_included_template(self):
+        self.assertEqual(
+            self.render("{% icon 'refresh' size=16 class='mr-1' %}"),
+            self.render("{% include 'icons/refresh_icon.html' with size='16' class='mr-1' %}").strip(),
+        )
+        self.assertIn('class="w-5 h-5"', self.render("{% icon 'refresh' %}"))
+
+    @override_settings(DEBUG=False)
+    def test_each_combination_is_rendered_once(self):
+        with mock.patch.object(icons, 'render_to_string', wraps=icons.render_to_string) as render:
+            for _ in range(3):
+                self.render("{% icon 'refresh' size=16 %}{% icon 'edit' size=16 %}")
+            self.render("{% icon 'refresh' size=20 %}")
+
+        self.assertEqual(render.call_count, 3)
+
+    @override_settings(DEBUG=True)
+    def test_debug_renders_every_time(self):
+        with mock.patch.object(icons, 'render_to_string', wraps=icons.render_to_string) as render:
+            for _ in range(2):
+                self.render("{% icon 'refresh' %}")
+
+        self.assertEqual(render.call_count, 2)
+
+
+class MetricsTests(TestCase):
+    def test_histogram_exposition(self):
+        histogram = metrics.Histogram('prueba_seconds', "Prueba", ('server',))
+        histogram.observe(0.02, server='srv"1')
+        histogram.observe(7, server='srv"1')
+
+        lines = histogram.samples()
+
+        self.assertIn('prueba_seconds_bucket{server="srv\\"1",le="0.01"} 0', lines)
+        self.assertIn('prueba_seconds_bucket{server="srv\\"1",le="0.025"} 1', lines)
+        self.assertIn('prueba_seconds_bucket{server="srv\\"1",le="10"} 2', lines)
+        self.assertIn('prueba_seconds_bucket{server="srv\\"1",le="+Inf"} 2', lines)
+        self.assertIn('prueba_seconds_count{server="srv\\"1"} 2', lines)
+
+    def test_track_counts_errors_and_calls_in_flight(self):
+        server = SimpleNamespace(host='metricas.local')
+        errors = ('api', 'metricas.local', 'start', 'APIException')
+        before = metrics.REMOTE_ERRORS._values.get(errors, 0)
+
+        with self.assertRaises(APIException):
+            with metrics.track('api', server, 'start'):
+                self.assertEqual(metrics.REMOTE_IN_FLIGHT._values[('api', 'metricas.local')], 1)
+                raise APIException('caído')
+
+        self.assertEqual(metrics.REMOTE_ERRORS._values[errors], before + 1)
+        self.assertEqual(metrics.REMOTE_IN_FLIGHT._values[('api', 'metricas.local')], 0)
+        self.assertIn('# TYPE remote_call_errors_total counter', metrics.render())
+
+    @override_settings(METRICS_TOKEN='secreto')
+    def test_view_requires_token_or_admin(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_serve_refuses_public_address_without_token(self):
+        with self.assertRaises(ValueError):
+            metrics.serve(0, address='0.0.0.0')
+
+    def test_serve_checks_the_token(self):
+        server = metrics.serve(0, token='secreto')
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+
+        self.assertEqual(httpx.get(url).status_code, 403)
+        response = httpx.get(url, headers={'Authorization': 'Bearer secreto'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# HELP remote_call_duration_seconds', response.text)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PROFILING_SAMPLE_RATE=1,
+                   PROFILING_BUDGETS={'*': {'wall_ms': 60000}, 'ServerListView': {'db_queries': 0}})
+class RequestProfilingTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(self.admin)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dump_dir = directory.name
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_profiled(self):
+        with self.assertNoLogs('core.profiling'):
+            self.client.get(reverse('server_list'))
+
+    def test_exceeded_budget_is_logged_and_counted(self):
+        key = ('ServerListView', 'db_queries')
+        before = metrics.VIEW_BUDGET_VIOLATIONS._values.get(key, 0)
+
+        with self.assertLogs('core.profiling', 'WARNING') as logs:
+            self.client.get(reverse('server_list'))
+
+        record = logs.records[0]
+        self.assertEqual(record.exceeded, ['db_queries'])
+        self.assertGreater(record.db_queries, 0)
+        self.assertEqual(metrics.VIEW_BUDGET_VIOLATIONS._values[key], before + 1)
+
+    def test_unresolved_requests_do_not_use_the_path_as_view(self):
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            self.client.get('/no-existe/../etc')
+
+        self.assertEqual(logs.records[0].view, middleware.UNRESOLVED_VIEW)
+
+    def test_admin_profile_dump(self):
+        with override_settings(PROFILING_DUMP_DIR=self.dump_dir), self.assertLogs('core.profiling', 'INFO') as logs:
+            self.client.get(reverse('server_list'), {'_profile': 1})
+
+        path = logs.records[0].profile_path
+        self.assertEqual(os.path.dirname(path), os.path.realpath(self.dump_dir))
+        self.assertTrue(os.path.getsize(path))
+
+    def test_clients_cannot_request_a_dump(self):
+        self.client.force_login(User.objects.create(username='cliente', role='client'))
+
+        with override_settings(PROFILING_DUMP_DIR=self.dump_dir, PROFILING_SAMPLE_RATE=0):
+            self.client.get(reverse('home'), {'_profile': 1})
+
+        self.assertEqual(os.listdir(self.dump_dir), [])
+
+    def test_dump_path_stays_in_the_dump_dir(self):
+        with override_settings(PROFILING_DUMP_DIR=self.dump_dir):
+            for view in ('../../etc/passwd', '..', ''):
+                path = middleware.RequestProfilingMiddleware._dump_path(view)
+                self.assertEqual(os.path.dirname(path), os.path.realpath(self.dump_dir))
+
+
+class JobQueueTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        self.fleet = FakeFleet()
+        self.server = self.make_server()
+        self.fleet.mount(self.server)
+
+    def enqueue(self, action, client, ports=()):
+        return jobs.enqueue(action, client, self.server, {'ports': list(ports)} if ports else {})
+
+    def test_jobs_of_a_client_run_one_at_a_time_in_order(self):
+        first = self.make_client('c1', self.server)
+        second = self.make_client('c2', self.server)
+        create = self.enqueue(Job.ACTION_CREATE, first, [1000])
+        extend = self.enqueue(Job.ACTION_EXTEND, first, [1001])
+        other = self.enqueue(Job.ACTION_CREATE, second, [1002])
+
+        self.assertIsNone(jobs.claim(extend.pk, 'w1'))
+        self.assertEqual(jobs.claim_next('w1').pk, create.pk)
+        # La extensión espera a la creación en curso; el otro cliente no
+        self.assertEqual(jobs.claim_next('w2').pk, other.pk)
+        self.assertIsNone(jobs.claim_next('w3'))
+
+        self.assertTrue(jobs.run_job(Job.objects.get(pk=create.pk)))
+        job = jobs.claim_next('w3')
+        self.assertEqual(job.pk, extend.pk)
+        self.assertTrue(jobs.run_job(job))
+        self.assertEqual(self.fleet.clients['srv.local']['c1']['ports'], [1000, 1001])
+
+    def test_retry_keeps_later_jobs_of_the_client_waiting(self):
+        client = self.make_client('c1', self.server)
+        # El servidor ya tiene un c1 con otros puertos: la creación falla y no cuenta como aplicada
+        self.fleet.apply('srv.local', 'create', 'c1', [1009])
+        create = self.enqueue(Job.ACTION_CREATE, client, [1000])
+        extend = self.enqueue(Job.ACTION_EXTEND, client, [1001])
+
+        self.assertFalse(jobs.run_job(jobs.claim_next('w1')))
+
+        create.refresh_from_db()
+        self.assertEqual(create.status, Job.STATUS_PENDING)
+        self.assertGreater(create.run_at, timezone.now())
+        self.assertIn('ya existe', create.last_error)
+        self.assertIsNone(jobs.claim_next('w1'))
+        self.assertIsNone(jobs.claim(extend.pk, 'w1'))
+
+        Job.objects.filter(pk=create.pk).update(run_at=timezone.now())
+        self.assertEqual(jobs.claim_next('w1').pk, create.pk)
+
+    def test_create_applied_by_a_lost_attempt_counts_as_done(self):
+        client = self.make_client('c1', self.server)
+        create = self.enqueue(Job.ACTION_CREATE, client, [1000, 1001])
+        # Un intento anterior llegó al servidor pero su respuesta se perdió
+        self.fleet.apply('srv.local', 'create', 'c1', [1000, 1001])
+
+        self.assertTrue(jobs.run_job(jobs.claim_next('w1')))
+        create.refresh_from_db()
+        self.assertEqual(create.status, Job.STATUS_DONE)
+
+    def test_delete_cancels_pending_create(self):
+        client = self.make_client('c1', self.server)
+        create = self.enqueue(Job.ACTION_CREATE, client, [1000])
+
+        delete = jobs.enqueue(Job.ACTION_DELETE, client)
+
+        create.refresh_from_db()
+        self.assertEqual(create.status, Job.STATUS_CANCELLED)
+        job = jobs.claim_next('w1')
+        self.assertEqual(job.pk, delete.pk)
+        # El cliente nunca llegó al servidor: eliminarlo ya está aplicado
+        self.assertTrue(jobs.run_job(job))
+
+    def test_requeue_stale_returns_abandoned_jobs(self):
+        client = self.make_client('c1', self.server)
+        create = self.enqueue(Job.ACTION_CREATE, client, [1000])
+        jobs.claim_next('muerto')
+        Job.objects.filter(pk=create.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.claim_next('w1').pk, create.pk)
+
+
+@override_settings(
+    REMOTE_RETRIES=0, ADAPTIVE_TIMEOUT_MIN=0.01, ADAPTIVE_TIMEOUT_MULTIPLIER=4,
+    CIRCUIT_MIN_CALLS=5, CIRCUIT_WINDOW=20, CIRCUIT_FAILURE_RATE=0.5, CIRCUIT_OPEN_SECONDS=30,
+)
+class ResilienceTests(SimpleTestCase):
+    def setUp(self):
+        self.server = SimpleNamespace(pk=f'test-{self._testMethodName}', host='srv.local')
+        self.addCleanup(_reset_server_state, self.server.pk)
+
+    def call(self, action='restart', fail=False, max_timeout=1.0):
+        seen = []
+
+        def fn(timeout):
+            seen.append(timeout)
+            if fail:
+                raise TimeoutError('sin respuesta')
+            return 'ok'
+
+        try:
+            resilience.call(self.server, action, fn, (TimeoutError,), max_timeout)
+        except TimeoutError:
+            pass
+        return seen[0] if seen else None
+
+    @override_settings(CIRCUIT_FAILURE_RATE=2)
+    def test_timeout_widens_after_timeouts_until_the_maximum(self):
+        for _ in range(5):
+            self.call()
+        self.assertEqual(self.call(), 0.01)
+
+        timeouts = [self.call(fail=True) for _ in range(40)]
+
+        self.assertEqual(timeouts[-1], 1.0)
+        self.assertEqual(timeouts, sorted(timeouts))
+        self.assertGreater(len(set(timeouts)), 2)
+
+    def test_non_idempotent_actions_use_the_maximum_timeout(self):
+        for _ in range(5):
+            self.call()
+            self.call('create')
+        self.assertEqual(self.call('create', max_timeout=3.0), 3.0)
+        self.assertEqual(self.call(max_timeout=3.0), 0.01)
+
+    def test_circuit_recovers_after_the_open_period(self):
+        for _ in range(5):
+            self.call(fail=True)
+        breaker = resilience.get_breaker(self.server)
+        self.assertEqual(breaker.state, resilience.OPEN)
+        with self.assertRaises(resilience.CircuitOpenError):
+            resilience.call(self.server, 'restart', lambda timeout: 'ok', (TimeoutError,), 1.0)
+
+        breaker.opened_at -= 30
+        self.assertEqual(self.call(), 1.0)
+        self.assertEqual(breaker.state, resilience.CLOSED)
+
+    def test_interrupted_trial_frees_the_half_open_circuit(self):
+        for _ in range(5):
+            self.call(fail=True)
+        breaker = resilience.get_breaker(self.server)
+        breaker.opened_at -= 30
+
+        def interrupted(timeout):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            resilience.call(self.server, 'restart', interrupted, (TimeoutError,), 1.0)
+        self.assertEqual(breaker.state, resilience.HALF_OPEN)
+        self.call()
+        self.assertEqual(breaker.state, resilience.CLOSED)
+
+
+class ReconciliationDiffTests(SimpleTestCase):
+    server = Server(pk=1, host='srv.local', initial_port=1000, final_port=1009)
+
+    def diff(self, listing, users, ports, busy=()):
+        remote = status_cache.normalize_listing({'clients': listing})
+        local = {'users': dict.fromkeys(users, 1), 'ports': ports, 'busy': set(busy)}
+        return reconciliation.diff_server(self.server, remote, local)
+
+    def test_in_sync(self):
+        report = self.diff([{'client': 'a', 'ports': [1000, 1001]}], ['a'], {1000: 'a', 1001: 'a'})
+        self.assertFalse(reconciliation.has_drift(report))
+
+    def test_orphans_missing_and_port_drift(self):
+        report = self.diff(
+            [
+                {'client': 'huerfano', 'ports': [1008]},
+                {'client': 'a', 'ports': [1000, 1002, 1003, 2000]},
+            ],
+            ['a', 'b', 'ausente'],
+            {1000: 'a', 1001: 'a', 1003: 'b', 1005: 'ausente'},
+        )
+
+        self.assertEqual(report['orphans'], ['huerfano'])
+        self.assertEqual(report['missing'], ['ausente', 'b'])
+        self.assertEqual(report['missing_ports'], {'ausente': [1005], 'b': [1003]})
+        self.assertEqual(report['leaked_ports'], {'a': [1001]})
+        self.assertEqual(report['untracked_ports'], {'a': [1002]})
+        self.assertEqual(report['conflicts'], [
+            {'port': 1003, 'remote': 'a', 'local': 'b'},
+            {'port': 2000, 'remote': 'a', 'local': None},
+        ])
+
+    def test_clients_with_pending_jobs_are_skipped(self):
+        report = self.diff([{'client': 'nuevo', 'ports': [1000]}], ['borrado'], {1001: 'borrado'},
+                           busy=['nuevo', 'borrado'])
+        self.assertFalse(reconciliation.has_drift(report))
+
+    def test_listing_without_ports_never_releases_local_ports(self):
+        report = self.diff([{'client': 'a'}, {'client': 'b', 'ports': []}], ['a', 'b'], {1000: 'a', 1001: 'b'})
+
+        self.assertEqual(report['leaked_ports'], {})
+        self.assertEqual(report['unknown_ports'], ['a', 'b'])
+
+
+class ReconcileTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        self.server = self.make_server()
+        self.fleet = FakeFleet()
+        self.fleet.mount(self.server)
+
+    def test_leaked_port_reassigned_before_the_fix_is_kept(self):
+        first = self.make_client('a', self.server, [1000, 1001])
+        second = self.make_client('b', self.server)
+        self.fleet.apply(self.server.host, 'create', 'a', [1000])
+        self.fleet.apply(self.server.host, 'create', 'b', [])
+        report = reconciliation.reconcile([self.server])[0]
+        self.assertEqual(report['leaked_ports'], {'a': [1001]})
+
+        PortServer.objects.filter(port_number=1001).update(assigned_client=second)
+        reconciliation._fix_local(self.server, report, {'a': first.pk, 'b': second.pk})
+
+        self.assertTrue(PortServer.objects.filter(port_number=1001, assigned_client=second).exists())
+        self.assertEqual(report['fixed_ports']['released'], 0)
+
+    def test_client_enqueued_while_listing_is_not_an_orphan(self):
+        fetch = reconciliation._fetch_listings
+
+        def create_during_listing(servers):
+            client = self.make_client('nuevo', self.server, [1005])
+            jobs.enqueue(Job.ACTION_CREATE, client, payload={'ports': [1005]})
+            self.fleet.apply(self.server.host, 'create', 'nuevo', [1005])
+            return fetch(servers)
+
+        with mock.patch.object(reconciliation, '_fetch_listings', create_during_listing):
+            report = reconciliation.reconcile([self.server])[0]
+
+        self.assertFalse(reconciliation.has_drift(report))
+
+
+@override_settings(SERVER_STATS_CACHE_TTL=0, PLACEMENT_USE_STATUS=True)
+class PlacementRankTests(ServerTestMixin, TestCase):
+    def setUp(self):
+        self.empty = self.make_server('vacio.local', 1000, 1009)
+        self.half = self.make_server('medio.local', 2000, 2009)
+        self.full = self.make_server('lleno.local', 3000, 3003)
+        self.make_client('m', self.half, range(2000, 2005))
+        self.make_client('l', self.full, range(3000, 3003))
+
+    def test_least_loaded_prefers_the_emptiest_server(self):
+        self.assertEqual(placement.rank(1, 'least_loaded'), [self.empty.pk, self.half.pk, self.full.pk])
+
+    def test_bin_packing_prefers_the_fullest_server_that_fits(self):
+        self.assertEqual(placement.rank(1, 'bin_packing'), [self.full.pk, self.half.pk, self.empty.pk])
+        self.assertEqual(placement.rank(2, 'bin_packing'), [self.half.pk, self.empty.pk])
+
+    def test_affinity_keeps_the_preferred_server_while_it_fits(self):
+        self.assertEqual(placement.rank(1, 'affinity', prefer=self.full.pk)[0], self.full.pk)
+        self.assertEqual(placement.rank(2, 'affinity', prefer=self.full.pk), [self.empty.pk, self.half.pk])
+
+    def test_unreachable_and_too_small_servers_are_excluded(self):
+        status_cache.store_server_error(self.empty.pk, 'timeout')
+
+        self.assertEqual(placement.rank(3), [self.half.pk])
+        self.assertEqual(placement.rank(6), [])
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            placement.rank(1, 'aleatoria')
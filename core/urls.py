@@ -1,24 +1,34 @@
 from django.urls import path
 from .views import (
     HomeView,
+    ClientPickerView,
     ClientListView,
     ClientCreateView,
+    ClientImportView,
     ClientUpdateView,
     ClientDeleteView,
     ClientActionView,
+    ClientBulkActionView,
     PortRestartView,
     ServerListView,
     ServerCreateView,
     ServerUpdateView,
     ServerDeleteView,
+    StatusStreamView,
+    MetricsView,
 )
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
+    path('clients/picker/', ClientPickerView.as_view(), name='client_picker'),
+    path('status/stream/', StatusStreamView.as_view(), name='status_stream'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
     path('clients/', ClientListView.as_view(), name='client_list'),
     path('clients/add/', ClientCreateView.as_view(), name='client_add'),
+    path('clients/import/', ClientImportView.as_view(), name='client_import'),
     path('clients/<int:pk>/edit/', ClientUpdateView.as_view(), name='client_edit'),
     path('clients/<int:pk>/delete/', ClientDeleteView.as_view(), name='client_delete'),
+    path('clients/bulk/<str:action>/', ClientBulkActionView.as_view(), name='client_bulk_action'),
     path('clients/<str:client_name>/action/<str:action>/', ClientActionView.as_view(), name='client_action'),
     path('clients/<str:client_name>/ports/<int:port>/restart/', PortRestartView.as_view(), name='port_restart'),
 
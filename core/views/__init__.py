@@ -1,10 +1,12 @@
-from .home import HomeView
+from .home import HomeView, ClientPickerView
 from .clients import (
     ClientListView,
     ClientCreateView,
+    ClientImportView,
     ClientUpdateView,
     ClientDeleteView,
     ClientActionView,
+    ClientBulkActionView,
     PortRestartView
 )
 from .servers import (
@@ -13,3 +15,5 @@ from .servers import (
     ServerUpdateView,
     ServerDeleteView
 )
+from .status import StatusStreamView
+from .metrics import MetricsView
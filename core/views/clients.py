@@ -1,33 +1,70 @@
+from django.conf import settings
 from django.views.generic import CreateView, UpdateView, DeleteView, ListView, View
 from django.urls import reverse_lazy
 from django.db import transaction
+from django.db.models import Prefetch
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.shortcuts import redirect
-from django.http import HttpResponseRedirect
+from django.shortcuts import redirect, render
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+import json
 import logging
 
-from core.models import User
-from core.forms import ClientCreateForm, ClientUpdateForm
-# from core.services import client_ssh_service
-from core.services import client_api_service
+from core.models import Job, PortServer, Server, User
+from core.forms import ClientCreateForm, ClientImportForm, ClientUpdateForm
+from core.services import backends, bulk_actions, bulk_import, jobs, passwords, port_allocator, status_cache
+from .mixins import AsyncLoginRequiredMixin, ConditionalGetMixin
 
 logger = logging.getLogger(__name__)
 
 
-class ClientListView(LoginRequiredMixin, ListView):
+class ClientListView(LoginRequiredMixin, ConditionalGetMixin, ListView):
     model = User
     template_name = 'core/client_list.html'
     context_object_name = 'clients'
+    paginate_by = settings.CLIENT_LIST_PAGE_SIZE
+
+    def get_version_scopes(self):
+        return ('clients', 'ports', 'servers', 'status')
 
     def get_queryset(self):
-        return User.objects.filter(role='client').select_related('server').prefetch_related('assigned_ports')
+        # Los puertos llegan ya ordenados en un único prefetch para toda la página
+        ordered_ports = PortServer.objects.order_by('port_number').only('port_number', 'assigned_client_id')
+        queryset = (
+            User.objects.filter(role='client')
+            .select_related('server')
+            .prefetch_related(Prefetch('assigned_ports', queryset=ordered_ports, to_attr='ordered_ports'))
+            .order_by('username')
+        )
+
+        query = self.request.GET.get('q', '').strip()
+        if query:
+            queryset = queryset.filter(username__icontains=query)
+
+        server_id = self.request.GET.get('server', '')
+        if server_id.isdigit():
+            queryset = queryset.filter(server_id=server_id)
+
+        return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Procesar la lista de puertos para cada cliente desde assigned_ports
+        # Estado en ejecución desde la caché del colector (sin llamadas remotas)
+        statuses = status_cache.get_clients_status(context['clients'])
         for client in context['clients']:
-            client.ports_parsed = list(client.assigned_ports.order_by('port_number').values_list('port_number', flat=True))
+            client.status = statuses[client.username]
+            client.ports_parsed = [
+                {'number': port.port_number, 'state': client.status['ports'].get(port.port_number, client.status['state'])}
+                for port in client.ordered_ports
+            ]
+
+        filters = self.request.GET.copy()
+        filters.pop('page', None)
+        context['filters'] = filters.urlencode()
+        context['query'] = self.request.GET.get('q', '')
+        context['selected_server'] = self.request.GET.get('server', '')
+        context['servers'] = Server.objects.order_by('host').only('pk', 'host')
         return context
 
 
@@ -39,15 +76,16 @@ class ClientCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         try:
+            username = form.cleaned_data['username']
+            server = form.cleaned_data.get('server')
+            # El hash es CPU puro: se calcula antes de abrir la transacción
+            password_hash = passwords.hash_client_password(form.cleaned_data['password'])
+
             with transaction.atomic():
                 # 1. Crear usuario con rol de cliente
-                username = form.cleaned_data['username']
-                password = form.cleaned_data['password']
-                server = form.cleaned_data.get('server')
-
-                self.object = User.objects.create_user(
-                    username=username,
-                    password=password,
+                self.object = User.objects.create(
+                    username=User.normalize_username(username),
+                    password=password_hash,
                     role='client',
                     server=server
                 )
@@ -56,46 +94,100 @@ class ClientCreateView(LoginRequiredMixin, CreateView):
                 num_ports = form.cleaned_data['num_ports']
 
                 if server:
-                    # LOCK & FETCH PORTS
-                    # Select N available ports ensuring concurrency safety
-                    available_ports = list(server.ports.filter(is_available=True).select_for_update().order_by('port_number')[:num_ports])
-
-                    if len(available_ports) < num_ports:
-                        raise ValueError(f"No hay suficientes puertos disponibles. Solicitados: {num_ports}, Disponibles: {len(available_ports)}")
-
-                    # EXTRACT NUMBERS
-                    ports = [p.port_number for p in available_ports]
-
-                    # ASSIGN PORTS IN DB
-                    for port_obj in available_ports:
-                        port_obj.is_available = False
-                        port_obj.assigned_client = self.object
-                        port_obj.save()
-
-                    # EXECUTE API
-                    api_service = client_api_service.get_api_service(server)
-                    response = api_service.create_client(self.object.username, ports)
-                    logger.info(f"API Response for create client: {response}")
-                    
-                    messages.success(self.request, f"Cliente {self.object.username} creado exitosamente con {len(ports)} puertos")
+                    # ASSIGN PORTS (bitmap en memoria + un solo UPDATE en BD)
+                    server, ports = self._allocate(form, server, num_ports)
+
+                    # La creación remota la ejecuta un worker: la transacción no espera a la API
+                    jobs.enqueue(Job.ACTION_CREATE, self.object, server, {'ports': ports})
+
+                    messages.success(
+                        self.request,
+                        f"Cliente {self.object.username} creado con {len(ports)} puertos en {server.host}. "
+                        f"El aprovisionamiento en el servidor está en curso."
+                    )
                 else:
                     logger.warning(f"Cliente {self.object.username} creado sin servidor asignado. No se generaron puertos.")
                     messages.success(self.request, f"Cliente {self.object.username} creado exitosamente sin servidor")
 
-                return super().form_valid(form)
+                # El usuario ya fue creado arriba: no llamar a form.save() (crearía un segundo User vacío)
+                return HttpResponseRedirect(self.get_success_url())
 
         except ValueError as ve:
+            self._discard_allocation(form)
             messages.error(self.request, f"Error de validación: {str(ve)}")
             return self.form_invalid(form)
 
-        except client_api_service.APIException as e:
-            messages.error(self.request, f"Error al crear cliente via API: {str(e)}")
-            return self.form_invalid(form)
         except Exception as e:
+            self._discard_allocation(form)
             logger.exception("Error creating client")
             messages.error(self.request, f"Error interno: {str(e)}")
             return self.form_invalid(form)
 
+    def _allocate(self, form, server, num_ports):
+        """
+        Asigna los puertos en el servidor elegido. Con ubicación automática, si no hay
+        bloque consecutivo o lo ganó otro proceso, prueba los siguientes del ranking.
+        """
+        candidates = [server, *form.fallback_servers]
+        for index, candidate in enumerate(candidates):
+            try:
+                ports = port_allocator.allocate_ports(
+                    candidate,
+                    self.object,
+                    num_ports,
+                    contiguous=form.cleaned_data.get('contiguous_ports', False),
+                )
+            except port_allocator.PortAllocationError:
+                if index == len(candidates) - 1:
+                    raise
+                continue
+            if candidate.pk != self.object.server_id:
+                self.object.server = candidate
+                self.object.save(update_fields=['server'])
+            return candidate, ports
+
+    def _discard_allocation(self, form):
+        """La transacción se revirtió: el bitmap en memoria ya no refleja la BD"""
+        for server in [form.cleaned_data.get('server'), *form.fallback_servers]:
+            if server:
+                port_allocator.invalidate(server.pk)
+
+
+class ClientImportView(AsyncLoginRequiredMixin, View):
+    """
+    Alta masiva desde un CSV o JSON.
+    El POST responde con un stream NDJSON (un evento por línea) que la página muestra
+    a medida que se crean los clientes en la BD y en los servidores.
+    """
+    template_name = 'core/client_import.html'
+
+    async def get(self, request):
+        return await sync_to_async(render)(request, self.template_name, {'form': ClientImportForm()})
+
+    async def post(self, request):
+        form = ClientImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            events = bulk_import.import_clients(form.rows, contiguous=form.cleaned_data['contiguous_ports'])
+            status = 200
+        else:
+            message = ' '.join(error for errors in form.errors.values() for error in errors)
+            events = iter([{'event': 'invalid', 'message': message}])
+            status = 400
+
+        response = StreamingHttpResponse(self._stream(events), content_type='application/x-ndjson', status=status)
+        # Evitar que nginx acumule el stream en su buffer
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def _stream(self, events):
+        # La importación es síncrona (ORM y llamadas remotas): cada paso corre en el hilo de sync_to_async
+        done = object()
+        while True:
+            event = await sync_to_async(next)(events, done)
+            if event is done:
+                return
+            yield json.dumps(event) + '\n'
+
 
 class ClientUpdateView(LoginRequiredMixin, UpdateView):
     model = User
@@ -124,65 +216,40 @@ class ClientDeleteView(LoginRequiredMixin, DeleteView):
         success_url = self.get_success_url()
 
         try:
-            # 1. Llamar a API para eliminar
-            if self.object.server:
-                # Liberar puertos en DB
-                self.object.assigned_ports.update(is_available=True, assigned_client=None)
-
-                api_service = client_api_service.get_api_service(self.object.server)
-                api_service.delete_client(username)
-            else:
-                logger.warning("Eliminando cliente sin servidor asignado, omitiendo API.")
-
-            # 2. Eliminar de BD local
-            try:
-                with transaction.atomic():
-                    if User.objects.filter(pk=self.object.pk).exists():
-                        self.object.delete()
-                        logger.info(f"Usuario {username} eliminado exitosamente.")
-
-                messages.success(self.request, f"Cliente {username} eliminado correctamente.")
-                return HttpResponseRedirect(success_url)
-
-            except Exception as local_e:
-                logger.exception("Error eliminando localmente")
-                messages.error(self.request, f"Error eliminando localmente: {str(local_e)}")
-                return HttpResponseRedirect(success_url)
-
-        except client_api_service.APIException as e:
-            messages.warning(self.request, f"Advertencia: El cliente fue eliminado localmente, pero hubo un error en el servidor remoto: {str(e)}")
-            logger.error(f"Error API al eliminar {username}: {str(e)}")
-
-            try:
-                with transaction.atomic():
-                    if User.objects.filter(pk=self.object.pk).exists():
-                        self.object.delete()
+            with transaction.atomic():
+                if self.object.server:
+                    # Liberar puertos en DB y encolar la eliminación remota
+                    port_allocator.release_client_ports(self.object)
+                    jobs.enqueue(Job.ACTION_DELETE, self.object)
+                else:
+                    logger.warning("Eliminando cliente sin servidor asignado, omitiendo API.")
 
-                return HttpResponseRedirect(success_url)
-            except Exception as local_e:
-                messages.error(self.request, f"Error eliminando localmente: {str(local_e)}")
-                return HttpResponseRedirect(success_url)
+                self.object.delete()
+                logger.info(f"Usuario {username} eliminado exitosamente.")
 
+            messages.success(self.request, f"Cliente {username} eliminado correctamente.")
         except Exception as e:
+            logger.exception("Error eliminando cliente")
             messages.error(self.request, f"Error interno al eliminar: {str(e)}")
-            return HttpResponseRedirect(success_url)
 
+        return HttpResponseRedirect(success_url)
 
-class ClientActionView(LoginRequiredMixin, View):
-    def post(self, request, client_name, action):
+
+class ClientActionView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, client_name, action):
         try:
-            client = User.objects.get(username=client_name, role='client')
+            client = await User.objects.select_related('server').aget(username=client_name, role='client')
             if client.server:
-                api_service = client_api_service.get_api_service(client.server)
+                api_service = backends.get_async_backend(client.server)
 
                 if action == 'start':
-                    api_service.start_client(client_name)
+                    await api_service.start_client(client_name)
                     messages.success(request, f"Cliente {client_name} iniciado.")
                 elif action == 'stop':
-                    api_service.stop_client(client_name)
+                    await api_service.stop_client(client_name)
                     messages.success(request, f"Cliente {client_name} detenido.")
                 elif action == 'restart':
-                    api_service.restart_client(client_name)
+                    await api_service.restart_client(client_name)
                     messages.success(request, f"Cliente {client_name} reiniciado.")
                 else:
                     messages.error(request, f"Acción desconocida: {action}")
@@ -195,13 +262,52 @@ class ClientActionView(LoginRequiredMixin, View):
         return redirect('client_list')
 
 
-class PortRestartView(LoginRequiredMixin, View):
-    def post(self, request, client_name, port):
+class ClientBulkActionView(LoginRequiredMixin, View):
+    """
+    Ejecuta start/stop/restart sobre varios clientes en paralelo.
+    Recibe una lista de 'client_names' o un 'server_id' (todos los clientes del servidor).
+    """
+
+    def post(self, request, action):
+        if action not in bulk_actions.BULK_ACTIONS:
+            messages.error(request, f"Acción desconocida: {action}")
+            return redirect('client_list')
+
+        clients = User.objects.filter(role='client').select_related('server')
+        client_names = request.POST.getlist('client_names')
+        server_id = request.POST.get('server_id')
+
+        if client_names:
+            clients = clients.filter(username__in=client_names)
+        elif server_id:
+            clients = clients.filter(server_id=server_id)
+        else:
+            messages.warning(request, "No se seleccionó ningún cliente.")
+            return redirect('client_list')
+
+        results = bulk_actions.bulk_client_action(clients, action)
+        succeeded = [r for r in results if r['status'] == 'success']
+        failed = [r for r in results if r['status'] == 'error']
+        skipped = [r for r in results if r['status'] == 'skipped']
+
+        if succeeded:
+            messages.success(request, f"Acción '{action}' ejecutada en {len(succeeded)} clientes.")
+        for result in failed:
+            messages.error(request, f"{result['client']} ({result['server']}): {result['message']}")
+        if skipped:
+            names = ', '.join(r['client'] for r in skipped)
+            messages.warning(request, f"Clientes sin servidor asignado omitidos: {names}")
+
+        return redirect('server_list' if server_id and not client_names else 'client_list')
+
+
+class PortRestartView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, client_name, port):
         try:
-            client = User.objects.get(username=client_name, role='client')
+            client = await User.objects.select_related('server').aget(username=client_name, role='client')
             if client.server:
-                api_service = client_api_service.get_api_service(client.server)
-                api_service.restart_port(client_name, port)
+                api_service = backends.get_async_backend(client.server)
+                await api_service.restart_port(client_name, port)
                 messages.success(request, f"Puerto {port} de {client_name} reiniciado.")
             else:
                 messages.warning(request, "El cliente no tiene servidor asignado.")
@@ -210,4 +316,3 @@ class PortRestartView(LoginRequiredMixin, View):
             messages.error(request, f"Error al reiniciar puerto: {str(e)}")
 
         return redirect('client_list')
-
@@ -1,11 +1,22 @@
-from django.views.generic import TemplateView
+from django.conf import settings
+from django.views.generic import TemplateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import HttpResponseForbidden, JsonResponse
+from core import cache
 from core.models import User
+from core.services import status_cache
+from .mixins import ConditionalGetMixin
 
 
-class HomeView(LoginRequiredMixin, TemplateView):
+class HomeView(LoginRequiredMixin, ConditionalGetMixin, TemplateView):
     template_name = 'index.html'
 
+    def get_version_scopes(self):
+        user = self.request.user
+        if user.is_staff:
+            return ('clients', 'ports', 'servers', 'status')
+        return (cache.client_scope(user.pk), cache.server_scope(user.server_id), cache.status_scope(user.server_id))
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
@@ -15,57 +26,69 @@ class HomeView(LoginRequiredMixin, TemplateView):
         context['is_admin'] = is_admin
 
         if is_admin:
-            # Lógica para administradores
-            clients = User.objects.filter(role='client').select_related('server').all()
-            context['clients'] = clients
-
-            # Obtener cliente seleccionado desde parámetro GET
-            selected_client_id = self.request.GET.get('client_id')
+            # Lógica para administradores: el selector busca clientes vía ClientPickerView
+            selected_client_id = self.request.GET.get('client_id', '')
             selected_client = None
             ports_info = []
 
-            if selected_client_id:
-                try:
-                    selected_client = User.objects.select_related('server').get(pk=selected_client_id, role='client')
-                    ports_info = self._get_ports_info(selected_client)
-                except User.DoesNotExist:
-                    pass
+            if selected_client_id.isdigit():
+                selected_client = (
+                    User.objects.filter(pk=selected_client_id, role='client')
+                    .only('pk', 'username', 'server_id')
+                    .first()
+                )
+                ports_info = self._get_ports_info(selected_client)
 
             context['selected_client'] = selected_client
             context['ports_info'] = ports_info
 
         else:
-            # Lógica para clientes
-            try:
-                client = User.objects.select_related('server').get(pk=user.pk, role='client')
-                context['client'] = client
-                context['ports_info'] = self._get_ports_info(client)
-            except User.DoesNotExist:
-                context['client'] = None
-                context['ports_info'] = []
+            # Lógica para clientes: request.user ya está cargado, sin consultas extra
+            client = user if user.is_client else None
+            context['client'] = client
+            context['ports_info'] = self._get_ports_info(client)
 
         return context
 
     def _get_ports_info(self, client):
         """
         Obtiene la información de puertos de un cliente para mostrar en las tarjetas.
-        Retorna una lista de diccionarios con la información necesaria para la conexión SRT.
+        Las tarjetas salen de la caché (cache.get_client_ports); solo el estado se añade por petición.
         """
-        if not client or not client.server:
+        if not client or not client.server_id:
             return []
 
-        ports_info = []
-        # Obtener puertos asignados desde la relación assigned_ports
-        assigned_ports = client.assigned_ports.select_related('server').order_by('port_number')
-
-        for index, port in enumerate(assigned_ports, start=1):
-            ports_info.append({
-                'port_number': port.port_number,
-                'host': port.server.host,
-                'client_name': client.username,
-                'is_available': port.is_available,
-                'server_name': str(port.server),
-                'mobile_index': index,  # movil1, movil2, movil3, etc.
-            })
-
-        return ports_info
+        # Estado en ejecución desde la caché del colector ('unknown' si no hay datos)
+        status = status_cache.get_clients_status([client])[client.username]
+        return [
+            {**port, 'status': status['ports'].get(port['port_number'], status['state'])}
+            for port in cache.get_client_ports(client)
+        ]
+
+
+class ClientPickerView(LoginRequiredMixin, View):
+    """
+    Búsqueda paginada de clientes para el selector del dashboard de administradores.
+    GET ?q=texto&page=n -> {"results": [{"id", "username"}], "has_next": bool}
+    """
+
+    def get(self, request):
+        if not request.user.is_staff:
+            return HttpResponseForbidden()
+
+        page_size = settings.CLIENT_PICKER_PAGE_SIZE
+        page = request.GET.get('page', '1')
+        page = max(int(page), 1) if page.isdigit() else 1
+        offset = (page - 1) * page_size
+
+        queryset = User.objects.filter(role='client').order_by('username')
+        query = request.GET.get('q', '').strip()
+        if query:
+            queryset = queryset.filter(username__icontains=query)
+
+        # Se pide una fila de más para saber si hay otra página sin hacer COUNT
+        rows = list(queryset.values_list('pk', 'username')[offset:offset + page_size + 1])
+        return JsonResponse({
+            'results': [{'id': pk, 'username': username} for pk, username in rows[:page_size]],
+            'has_next': len(rows) > page_size,
+        })
@@ -0,0 +1,21 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.generic import View
+
+from core.services import metrics
+
+
+class MetricsView(View):
+    """
+    Métricas de las llamadas remotas en formato de texto de Prometheus.
+    Acceso: administradores con sesión o `Authorization: Bearer <METRICS_TOKEN>` (scraper).
+    """
+
+    def get(self, request):
+        token = settings.METRICS_TOKEN
+        authorization = request.headers.get('Authorization', '')
+        if not (token and hmac.compare_digest(authorization, f'Bearer {token}')) and not request.user.is_staff:
+            return HttpResponseForbidden()
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,88 @@
+import functools
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.mixins import AccessMixin
+from django.contrib.auth.views import redirect_to_login
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from core import cache
+
+
+class AsyncLoginRequiredMixin(AccessMixin):
+    """
+    Equivalente de LoginRequiredMixin para vistas con handlers async.
+    Resuelve el usuario con request.auser() para no consultar la BD desde el event loop.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), self.get_login_url(), self.get_redirect_field_name())
+        return await super().dispatch(request, *args, **kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def _templates_stamp() -> str:
+    """Última modificación de las plantillas: un despliegue con cambios invalida los ETag"""
+    latest = 0
+    for directory in settings.TEMPLATES[0]['DIRS']:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if d != 'node_modules']
+            for name in files:
+                if name.endswith('.html'):
+                    latest = max(latest, os.stat(os.path.join(root, name)).st_mtime)
+    return str(int(latest))
+
+
+class ConditionalGetMixin:
+    """
+    Responde 304 sin renderizar la plantilla cuando los datos de la página no cambiaron.
+
+    El ETag combina los sellos de versión de caché de lo que muestra la vista
+    (get_version_scopes) con lo que varía por petición: usuario, querystring y secreto CSRF
+    (los formularios llevan el token). Last-Modified es el último cambio de esos ámbitos.
+
+    El estado de los clientes caduca sin que nada cambie su sello (el colector deja de
+    escribirlo): las vistas con ámbito 'status' añaden un tramo de CLIENT_STATUS_TTL segundos.
+    """
+
+    def get_version_scopes(self) -> tuple:
+        return ()
+
+    def get(self, request, *args, **kwargs):
+        if len(messages.get_messages(request)):
+            # Los mensajes pendientes se muestran una sola vez: hay que renderizar
+            response = super().get(request, *args, **kwargs)
+        else:
+            scopes = self.get_version_scopes()
+            versions, last_modified = cache.get_stamps(*scopes)
+            if any(scope == 'status' or scope.startswith('status:') for scope in scopes):
+                bucket = int(time.time() // settings.CLIENT_STATUS_TTL)
+                versions = (*versions, f'ttl{bucket}')
+                last_modified = max(last_modified or 0, bucket * settings.CLIENT_STATUS_TTL)
+            parts = [
+                type(self).__name__,
+                str(request.user.pk),
+                request.GET.urlencode(),
+                request.META.get('CSRF_COOKIE', ''),
+                _templates_stamp(),
+                *(str(version) for version in versions),
+            ]
+            etag = '"%s"' % hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = super().get(request, *args, **kwargs)
+            response.headers['ETag'] = etag
+            if last_modified:
+                response.headers['Last-Modified'] = http_date(last_modified)
+
+        # El navegador guarda la página pero revalida siempre con el ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+        return response
@@ -3,17 +3,39 @@ from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 
+from core import cache
 from core.models import Server
 from core.forms import ServerForm
+from .mixins import ConditionalGetMixin
 
 
-class ServerListView(LoginRequiredMixin, ListView):
+class ServerListView(LoginRequiredMixin, ConditionalGetMixin, ListView):
     model = Server
     template_name = 'core/server_list.html'
     context_object_name = 'servers'
 
+    def get_version_scopes(self):
+        return ('servers', 'clients', 'ports')
+
+    def get_queryset(self):
+        return Server.objects.order_by('host')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Conteos de clientes y puertos desde la caché de estadísticas (una consulta agregada)
+        stats = cache.get_server_stats()
+        for server in context['servers']:
+            usage = stats.get(server.pk, {'clients_count': 0, 'used_ports_count': 0})
+            server.clients_count = usage['clients_count']
+            server.used_ports_count = usage['used_ports_count']
+        # Capacidad de la flota para el planificador de ubicación
+        total = sum(usage['total_ports'] for usage in stats.values())
+        used = sum(usage['used_ports_count'] for usage in stats.values())
+        context['fleet_capacity'] = {
+            'total': total,
+            'free': total - used,
+            'usage_percent': int(used / total * 100) if total else 0,
+        }
         return context
 
 
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.http import HttpResponseForbidden, StreamingHttpResponse
+from django.views.generic import View
+
+from core.models import User
+from core.services import status_cache
+from .mixins import AsyncLoginRequiredMixin
+
+
+class StatusStreamView(AsyncLoginRequiredMixin, View):
+    """
+    Canal Server-Sent Events con el estado en ejecución de clientes y puertos.
+    Un dashboard mantiene una sola conexión y recibe un evento 'status' cada vez que
+    cambia el estado de alguno de sus clientes (en lugar de un temporizador por tarjeta).
+
+    - Clientes: solo reciben su propio estado.
+    - Administradores: reciben el estado de los clientes indicados en ?client_id=1,2,...
+    """
+
+    async def get(self, request):
+        user = await request.auser()
+        clients = await self._get_clients(request, user)
+        if clients is None:
+            return HttpResponseForbidden()
+
+        response = StreamingHttpResponse(self._stream(clients), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Evitar que nginx acumule el stream en su buffer
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def _get_clients(self, request, user):
+        queryset = User.objects.filter(role='client').only('pk', 'username', 'server_id')
+        if user.is_staff:
+            ids = [pk for pk in request.GET.get('client_id', '').split(',') if pk.isdigit()]
+            queryset = queryset.filter(pk__in=ids)
+        elif user.is_client:
+            queryset = queryset.filter(pk=user.pk)
+        else:
+            return None
+        return [client async for client in queryset]
+
+    async def _stream(self, clients):
+        # El navegador reconecta solo (EventSource) tras cerrar el stream por antigüedad
+        yield f"retry: {settings.STATUS_STREAM_RETRY_MS}\n\n"
+
+        started = time.monotonic()
+        last_sent = None
+        last_write = started
+
+        while time.monotonic() - started < settings.STATUS_STREAM_MAX_AGE:
+            statuses = await status_cache.aget_clients_status(clients)
+            if statuses != last_sent:
+                payload = json.dumps({'clients': statuses})
+                yield f"event: status\ndata: {payload}\n\n"
+                last_sent = statuses
+                last_write = time.monotonic()
+            elif time.monotonic() - last_write >= settings.STATUS_STREAM_HEARTBEAT:
+                yield ": ping\n\n"
+                last_write = time.monotonic()
+
+            await asyncio.sleep(settings.STATUS_STREAM_INTERVAL)
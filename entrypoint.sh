@@ -7,11 +7,18 @@ while ! nc -z db 5432; do
 done
 echo "PostgreSQL está listo!"
 
-echo "Ejecutando migraciones..."
-python manage.py migrate --noinput
+# Solo el servicio web prepara la aplicación; worker y collector arrancan sin tocar
+# migraciones ni estáticos (RUN_SETUP vacío)
+if [ "${RUN_SETUP:-0}" = "1" ]; then
+  echo "Ejecutando migraciones..."
+  python manage.py migrate --noinput
 
-echo "Recolectando archivos estáticos..."
-python manage.py collectstatic --noinput --clear
+  echo "Creando la tabla de caché compartida..."
+  python manage.py createcachetable
 
-echo "Iniciando servidor..."
+  echo "Recolectando archivos estáticos..."
+  python manage.py collectstatic --noinput --clear
+fi
+
+echo "Iniciando $1..."
 exec "$@"